@@ -0,0 +1,443 @@
+"""
+Drill Analysis Engine
+Server-side surf drill coaching on the landmarks returned by pose detection
+
+Port of the webcam coaching functions in training/test_pose_estimation.py.
+The demo kept drill progress (pop-up stage, rep count, pumping phase,
+previous hip position) in module globals; here it lives in a DrillSession
+per client session, so /detect can return feedback and rep counts with each
+frame and clients do not re-run the kinematics themselves.
+
+Landmarks are the dicts built by pose_detection.extract_landmarks
+({'leftHip': {'x', 'y', 'z', 'visibility'}, ...}). Feedback lines use the
+severities of the app's drill rules engine: success, error, warning, info.
+"""
+
+import math
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+from kinematics import (
+    BACK_ARCH, LEFT_ELBOW, LEFT_HIP, LEFT_KNEE, RIGHT_ELBOW, RIGHT_HIP, RIGHT_KNEE,
+    joint_angles, landmarks_to_array,
+)
+
+# Sessions idle for longer than this are dropped; at most this many are kept
+DRILL_SESSION_TTL = float(os.environ.get('DRILL_SESSION_TTL', 300))
+DRILL_MAX_SESSIONS = int(os.environ.get('DRILL_MAX_SESSIONS', 1000))
+
+VISIBILITY_THRESHOLD = 0.5   # Landmarks below this count as not visible
+
+# Stance & Pop-Up 'UP' stage
+STANCE_KNEE_MIN, STANCE_KNEE_MAX = 90, 140
+STANCE_HIP_MIN, STANCE_HIP_MAX = 140, 170
+# Pop-Up Stages
+PUSH_ELBOW_MAX = 100
+DOWN_HIP_MIN = 160
+POPUP_SUCCESS_HOLD_SECONDS = 2   # Success message shown this long before the next rep
+# Paddling
+PADDLE_ARCH_MAX = 165
+# Bottom Turn
+TURN_KNEE_MAX = 120  # Deeper bend than stance
+TURN_SHOULDER_WIDTH_MAX = 0.15  # Shoulders look narrower when rotated
+# Pumping
+PUMP_KNEE_LOW_MAX = 110
+PUMP_KNEE_HIGH_MIN = 140
+# Tube Stance
+TUBE_KNEE_MAX = 90
+TUBE_HIP_MAX = 100
+# Falling (normalized image coordinates)
+FALL_HIP_DX_MIN = 0.06
+FALL_HIP_DY_MIN = 0.05
+HEAD_COVER_DISTANCE_MAX = 0.12
+# Cutback
+CUTBACK_ROTATION_MIN = 10  # degrees between shoulder and hip lines
+CUTBACK_NOSE_LEAD_MIN = 0.05
+
+# ============================================================================
+# GEOMETRY
+# ============================================================================
+
+def get_points(landmarks: Dict, *names: str) -> Optional[List[List[float]]]:
+    """[x, y] of each named landmark, or None if any is missing or not visible"""
+    points = []
+    for name in names:
+        lm = landmarks.get(name)
+        if not lm or lm.get('visibility', 0.0) < VISIBILITY_THRESHOLD:
+            return None
+        points.append([lm['x'], lm['y']])
+    return points
+
+def _line(text: str, severity: str) -> Dict:
+    return {'text': text, 'severity': severity}
+
+def _average(angles, left: int, right: int) -> float:
+    return float(angles[left] + angles[right]) / 2
+
+# ============================================================================
+# COACHES
+# ============================================================================
+# Each coach takes the frame's landmarks, its joint-angle vector (computed
+# once per frame by kinematics.joint_angles), the session's drill state and
+# the frame time, and returns (feedback lines, metrics). State is only changed
+# by the stateful drills (popup, pumping, falling).
+
+def coach_stance_drill(landmarks: Dict, angles, state: Dict, now: float):
+    """Analyzes surfing stance"""
+    lines = [_line("Goal: Hold a balanced surf stance.", 'info')]
+    if not get_points(landmarks, 'leftShoulder', 'leftHip', 'leftKnee', 'leftAnkle',
+                      'rightShoulder', 'rightHip', 'rightKnee', 'rightAnkle'):
+        lines.append(_line("Ensure full body is visible", 'error'))
+        return lines, {}
+
+    avg_knee_angle = _average(angles, LEFT_KNEE, RIGHT_KNEE)
+    avg_hip_angle = _average(angles, LEFT_HIP, RIGHT_HIP)
+
+    knee_correct = STANCE_KNEE_MIN < avg_knee_angle < STANCE_KNEE_MAX
+    hip_correct = STANCE_HIP_MIN < avg_hip_angle < STANCE_HIP_MAX
+
+    lines.append(_line(f"Knee Bend (Avg): {int(avg_knee_angle)}", 'success' if knee_correct else 'error'))
+    lines.append(_line(f"Hip Hinge (Avg): {int(avg_hip_angle)}", 'success' if hip_correct else 'error'))
+    if knee_correct and hip_correct:
+        lines.append(_line("GREAT STANCE!", 'success'))
+    return lines, {'kneeAngle': avg_knee_angle, 'hipAngle': avg_hip_angle}
+
+def coach_popup_drill(landmarks: Dict, angles, state: Dict, now: float):
+    """Coaches the multi-stage pop-up: DOWN -> PUSH -> UP, one rep per landing"""
+    lines = [_line(f"Reps: {state['repCount']}", 'success')]
+    if not get_points(landmarks, 'leftShoulder', 'leftHip', 'leftKnee', 'leftElbow', 'leftWrist', 'leftAnkle',
+                      'rightShoulder', 'rightHip', 'rightKnee', 'rightElbow', 'rightWrist', 'rightAnkle'):
+        lines.append(_line("Ensure full body is visible", 'error'))
+        return lines, {}
+    metrics = {}
+
+    if state['stage'] == 'DOWN':
+        lines.append(_line("Stage: Lie Down (Press Up Position)", 'info'))
+        hip_angle = metrics['hipAngle'] = float(angles[LEFT_HIP])
+        if hip_angle > DOWN_HIP_MIN:
+            lines.append(_line("Good start! Now PUSH UP!", 'success'))
+            state['stage'] = 'PUSH'
+        else:
+            lines.append(_line("Straighten your body.", 'error'))
+    elif state['stage'] == 'PUSH':
+        lines.append(_line("Stage: PUSH UP!", 'info'))
+        l_elbow_angle = metrics['leftElbowAngle'] = float(angles[LEFT_ELBOW])
+        r_elbow_angle = metrics['rightElbowAngle'] = float(angles[RIGHT_ELBOW])
+        if l_elbow_angle < PUSH_ELBOW_MAX and r_elbow_angle < PUSH_ELBOW_MAX:
+            lines.append(_line("Now JUMP to your feet!", 'success'))
+            state['stage'] = 'UP'
+        else:
+            lines.append(_line("Push with your arms!", 'error'))
+    elif state['stage'] == 'UP':
+        lines.append(_line("Stage: Land in Surf Stance", 'info'))
+        avg_knee_angle = metrics['kneeAngle'] = _average(angles, LEFT_KNEE, RIGHT_KNEE)
+        if STANCE_KNEE_MIN < avg_knee_angle < STANCE_KNEE_MAX:
+            if state['feedbackTime'] is None:
+                state['feedbackTime'] = now
+                state['repCount'] += 1
+            lines.append(_line("POP-UP SUCCESS!", 'success'))
+            if now - state['feedbackTime'] > POPUP_SUCCESS_HOLD_SECONDS:
+                state['stage'] = 'DOWN'
+                state['feedbackTime'] = None
+        else:
+            lines.append(_line("Bend your knees more!", 'error'))
+    return lines, metrics
+
+def coach_paddling_drill(landmarks: Dict, angles, state: Dict, now: float):
+    """Coaches paddling posture"""
+    lines = [_line("Goal: Arch back & look forward.", 'info')]
+    points = get_points(landmarks, 'leftShoulder', 'rightShoulder', 'nose', 'leftEar', 'leftHip')
+    if not points:
+        lines.append(_line("Ensure torso and head visible", 'error'))
+        return lines, {}
+    l_shoulder, r_shoulder, nose = points[:3]
+
+    back_arch_angle = float(angles[BACK_ARCH])
+    back_is_arched = back_arch_angle < PADDLE_ARCH_MAX
+    shoulder_y = (l_shoulder[1] + r_shoulder[1]) / 2
+    head_is_up = nose[1] < shoulder_y
+
+    lines.append(_line(f"Back Arch Angle: {int(back_arch_angle)}", 'success' if back_is_arched else 'error'))
+    lines.append(_line("Head Position: " + ("UP" if head_is_up else "DOWN"), 'success' if head_is_up else 'error'))
+    if back_is_arched and head_is_up:
+        lines.append(_line("GOOD PADDLE POSTURE!", 'success'))
+    elif not back_is_arched:
+        lines.append(_line("Lift your chest and head!", 'error'))
+    else:
+        lines.append(_line("Look forward!", 'error'))
+    return lines, {'backArchAngle': back_arch_angle, 'headUp': head_is_up}
+
+def coach_bottom_turn_drill(landmarks: Dict, angles, state: Dict, now: float):
+    """Coaches the compressed and rotated posture for a bottom turn"""
+    lines = [_line("Goal: Compress & Rotate (Bottom Turn Prep).", 'info')]
+    points = get_points(landmarks, 'leftShoulder', 'rightShoulder', 'leftHip', 'leftKnee', 'leftAnkle',
+                        'rightHip', 'rightKnee', 'rightAnkle')
+    if not points:
+        lines.append(_line("Ensure full body is visible", 'error'))
+        return lines, {}
+    l_shoulder, r_shoulder = points[:2]
+
+    avg_knee_angle = _average(angles, LEFT_KNEE, RIGHT_KNEE)
+    # Check rotation by comparing the horizontal distance between shoulders
+    shoulder_width = abs(l_shoulder[0] - r_shoulder[0])
+
+    knees_compressed = avg_knee_angle < TURN_KNEE_MAX
+    shoulders_rotated = shoulder_width < TURN_SHOULDER_WIDTH_MAX
+
+    lines.append(_line(f"Knee Bend (Avg): {int(avg_knee_angle)}", 'success' if knees_compressed else 'error'))
+    lines.append(_line(f"Shoulder Rotation: {'YES' if shoulders_rotated else 'NO'}",
+                       'success' if shoulders_rotated else 'error'))
+    if knees_compressed and shoulders_rotated:
+        lines.append(_line("GOOD TURN POSTURE!", 'success'))
+    elif not knees_compressed:
+        lines.append(_line("Bend knees DEEPER!", 'error'))
+    else:
+        lines.append(_line("Rotate shoulders more!", 'error'))
+    return lines, {'kneeAngle': avg_knee_angle, 'shoulderWidth': shoulder_width}
+
+def coach_pumping_drill(landmarks: Dict, angles, state: Dict, now: float):
+    """Coaches the up/down motion of pumping; a full compress + extend counts as a rep"""
+    lines = [_line("Goal: Practice Pumping Motion (Up/Down).", 'info'),
+             _line(f"Current State: {state['stage']}", 'info')]
+    points = get_points(landmarks, 'leftHip', 'leftKnee', 'leftAnkle', 'rightHip', 'rightKnee', 'rightAnkle')
+    if not points:
+        lines.append(_line("Ensure legs are visible", 'error'))
+        return lines, {}
+
+    avg_knee_angle = _average(angles, LEFT_KNEE, RIGHT_KNEE)
+
+    if state['stage'] == 'HIGH':
+        lines.append(_line("Action: Compress DOWN!", 'warning'))
+        if avg_knee_angle < PUMP_KNEE_LOW_MAX:
+            state['stage'] = 'LOW'
+            lines.append(_line("Good Compression!", 'success'))
+    elif state['stage'] == 'LOW':
+        lines.append(_line("Action: Extend UP!", 'warning'))
+        if avg_knee_angle > PUMP_KNEE_HIGH_MIN:
+            state['stage'] = 'HIGH'
+            state['repCount'] += 1
+            lines.append(_line("Good Extension!", 'success'))
+
+    lines.append(_line(f"Knee Angle (Avg): {int(avg_knee_angle)}", 'info'))
+    return lines, {'kneeAngle': avg_knee_angle}
+
+def coach_tube_stance_drill(landmarks: Dict, angles, state: Dict, now: float):
+    """Coaches the deep crouch for a tube stance"""
+    lines = [_line("Goal: Hold deep crouch (Tube Stance).", 'info')]
+    if not get_points(landmarks, 'leftShoulder', 'leftHip', 'leftKnee', 'leftAnkle',
+                      'rightShoulder', 'rightHip', 'rightKnee', 'rightAnkle'):
+        lines.append(_line("Ensure full body is visible", 'error'))
+        return lines, {}
+
+    avg_knee_angle = _average(angles, LEFT_KNEE, RIGHT_KNEE)
+    avg_hip_angle = _average(angles, LEFT_HIP, RIGHT_HIP)
+
+    knees_low = avg_knee_angle < TUBE_KNEE_MAX
+    hips_low = avg_hip_angle < TUBE_HIP_MAX
+
+    lines.append(_line(f"Knee Bend (Avg): {int(avg_knee_angle)}", 'success' if knees_low else 'error'))
+    lines.append(_line(f"Hip Hinge (Avg): {int(avg_hip_angle)}", 'success' if hips_low else 'error'))
+    if knees_low and hips_low:
+        lines.append(_line("GREAT TUBE STANCE!", 'success'))
+    elif not knees_low:
+        lines.append(_line("Get LOWER! Bend knees more!", 'error'))
+    else:
+        lines.append(_line("Crouch! Bring chest to knees!", 'error'))
+    return lines, {'kneeAngle': avg_knee_angle, 'hipAngle': avg_hip_angle}
+
+def coach_falling_drill(landmarks: Dict, angles, state: Dict, now: float):
+    """Coaches falling and head-covering motion from frame-to-frame hip movement"""
+    lines = [_line("Goal: Fall safely & cover your head.", 'info')]
+    points = get_points(landmarks, 'leftHip', 'rightHip', 'leftWrist', 'rightWrist', 'nose')
+    if not points:
+        lines.append(_line("Ensure hips, hands and head are visible", 'error'))
+        return lines, {}
+    l_hip, r_hip, l_wrist, r_wrist, nose = points
+
+    hip_mid = [(l_hip[0] + r_hip[0]) / 2.0, (l_hip[1] + r_hip[1]) / 2.0]
+    prev_hip_mid = state['prevHipMid']
+
+    falling_detected = False
+    if prev_hip_mid is not None:
+        dx = abs(hip_mid[0] - prev_hip_mid[0])
+        dy = hip_mid[1] - prev_hip_mid[1]
+        falling_detected = dx > FALL_HIP_DX_MIN or dy > FALL_HIP_DY_MIN
+
+    # Head cover check: both wrists close to nose
+    left_dist = math.dist(l_wrist, nose)
+    right_dist = math.dist(r_wrist, nose)
+    hands_cover = left_dist < HEAD_COVER_DISTANCE_MAX and right_dist < HEAD_COVER_DISTANCE_MAX
+
+    if falling_detected:
+        lines.append(_line("Falling motion detected", 'warning'))
+    else:
+        lines.append(_line("No falling motion detected", 'error'))
+    if hands_cover:
+        lines.append(_line("Hands covering head", 'success'))
+    else:
+        lines.append(_line("Cover your head!", 'error'))
+    if falling_detected and hands_cover:
+        lines.append(_line("Safe fall: GOOD", 'success'))
+
+    state['prevHipMid'] = hip_mid
+    return lines, {'fallingDetected': falling_detected, 'handsCoverHead': hands_cover}
+
+def coach_cutback_drill(landmarks: Dict, angles, state: Dict, now: float):
+    """Coaches the cutback: lead with head/shoulders and maintain stance"""
+    lines = [_line("Goal: Lead turn with head & shoulders, keep stance.", 'info')]
+    points = get_points(landmarks, 'leftShoulder', 'rightShoulder', 'leftHip', 'rightHip', 'nose',
+                        'leftKnee', 'rightKnee', 'leftAnkle', 'rightAnkle')
+    if not points:
+        lines.append(_line("Ensure shoulders, hips, head and legs are visible", 'error'))
+        return lines, {}
+    l_shoulder, r_shoulder, l_hip, r_hip, nose = points[:5]
+
+    # Shoulder and hip line angles
+    shoulder_line = math.atan2(r_shoulder[1] - l_shoulder[1], r_shoulder[0] - l_shoulder[0])
+    hip_line = math.atan2(r_hip[1] - l_hip[1], r_hip[0] - l_hip[0])
+    rotation = abs((shoulder_line - hip_line) * 180.0 / math.pi)
+
+    # Nose ahead of hip midpoint horizontally
+    hip_mid_x = (l_hip[0] + r_hip[0]) / 2.0
+    nose_ahead = abs(nose[0] - hip_mid_x) > CUTBACK_NOSE_LEAD_MIN
+
+    avg_knee_angle = _average(angles, LEFT_KNEE, RIGHT_KNEE)
+    stance_ok = STANCE_KNEE_MIN < avg_knee_angle < STANCE_KNEE_MAX
+
+    if rotation < CUTBACK_ROTATION_MIN:
+        lines.append(_line("Turn head and shoulders first!", 'error'))
+    else:
+        lines.append(_line(f"Shoulder-Hip rotation: {int(rotation)}deg", 'success'))
+    if not nose_ahead:
+        lines.append(_line("Lead with head toward the turn!", 'error'))
+    if stance_ok:
+        lines.append(_line("Stance OK", 'success'))
+    else:
+        lines.append(_line("Stay low and balanced!", 'error'))
+    if rotation >= CUTBACK_ROTATION_MIN and nose_ahead and stance_ok:
+        lines.append(_line("GOOD CUTBACK!", 'success'))
+    return lines, {'rotationDegrees': rotation, 'kneeAngle': avg_knee_angle}
+
+# Drill ids match the app's drill rules engine
+DRILL_COACHES = {
+    'stance': coach_stance_drill,
+    'popup': coach_popup_drill,
+    'paddling': coach_paddling_drill,
+    'bottom_turn': coach_bottom_turn_drill,
+    'pumping': coach_pumping_drill,
+    'tube_stance': coach_tube_stance_drill,
+    'falling': coach_falling_drill,
+    'cutback': coach_cutback_drill,
+}
+
+# Starting stage of the drills that have stages
+INITIAL_STAGES = {'popup': 'DOWN', 'pumping': 'HIGH'}
+
+# ============================================================================
+# SESSIONS
+# ============================================================================
+
+class DrillSession:
+    """One client's progress through a drill"""
+
+    def __init__(self, drill_id: str):
+        self.lock = threading.Lock()
+        self.last_seen = time.monotonic()
+        self.reset(drill_id)
+
+    def reset(self, drill_id: str):
+        """Start the drill over (also used when the client switches drills)"""
+        self.drill_id = drill_id
+        self.state = {
+            'stage': INITIAL_STAGES.get(drill_id),
+            'repCount': 0,
+            'feedbackTime': None,
+            'prevHipMid': None,
+        }
+
+    def analyze(self, landmarks: Optional[Dict], now: float = None, angles=None) -> Dict:
+        """
+        Run the drill's coach on one frame
+
+        Args:
+            landmarks: Landmarks from pose detection, or None if no pose was found
+            now: Frame time in seconds (defaults to the monotonic clock;
+                 replays pass recorded timestamps)
+            angles: The frame's joint-angle vector if already computed (replays
+                    compute a whole recording in one kinematics call)
+
+        Returns:
+            Dict with drillId, supported, feedback lines, metrics, stage and repCount
+        """
+        now = time.monotonic() if now is None else now
+        coach = DRILL_COACHES.get(self.drill_id)
+        metrics = {}
+        if coach is None:
+            feedback = [_line("Selected drill not implemented", 'error')]
+        elif not landmarks:
+            feedback = [_line("No pose detected", 'error')]
+        else:
+            try:
+                if angles is None:
+                    angles = joint_angles(landmarks_to_array(landmarks))
+                feedback, metrics = coach(landmarks, angles, self.state, now)
+            except Exception:
+                feedback = [_line("Ensure body is fully visible", 'error')]
+
+        return {
+            'drillId': self.drill_id,
+            'supported': coach is not None,
+            'feedback': feedback,
+            'metrics': {k: round(v, 2) if isinstance(v, float) else v for k, v in metrics.items()},
+            'stage': self.state['stage'],
+            'repCount': self.state['repCount'],
+        }
+
+_drill_sessions: Dict[str, DrillSession] = {}
+_sessions_lock = threading.Lock()
+
+def _evict_sessions(now: float):
+    """Drop idle sessions, then the least recently seen ones over the cap"""
+    for key in [k for k, s in _drill_sessions.items() if now - s.last_seen > DRILL_SESSION_TTL]:
+        del _drill_sessions[key]
+    if len(_drill_sessions) > DRILL_MAX_SESSIONS:
+        by_age = sorted(_drill_sessions, key=lambda k: _drill_sessions[k].last_seen)
+        for key in by_age[:len(_drill_sessions) - DRILL_MAX_SESSIONS]:
+            del _drill_sessions[key]
+
+def get_drill_session(session_id: str, drill_id: str) -> DrillSession:
+    """Get or create the drill state of a client session"""
+    now = time.monotonic()
+    with _sessions_lock:
+        session = _drill_sessions.get(session_id)
+        if session is None:
+            session = _drill_sessions[session_id] = DrillSession(drill_id)
+            _evict_sessions(now)
+        session.last_seen = now
+    return session
+
+def analyze_drill_frame(drill_id: str, landmarks: Optional[Dict], session_id: str = None) -> Dict:
+    """
+    Drill feedback for one detected frame
+
+    Without a session id the frame is analyzed on its own: posture drills
+    work as usual, but stage-based drills (pop-up, pumping, falling) cannot
+    progress across frames.
+    """
+    if not session_id:
+        return DrillSession(drill_id).analyze(landmarks)
+    session = get_drill_session(session_id, drill_id)
+    with session.lock:
+        if session.drill_id != drill_id:
+            session.reset(drill_id)  # Switching drills starts the new one over
+        return session.analyze(landmarks)
+
+def reset_drill_session(session_id: str) -> bool:
+    """Forget a session's drill progress; returns whether it existed"""
+    with _sessions_lock:
+        return _drill_sessions.pop(session_id, None) is not None
+
+def drill_session_count() -> int:
+    return len(_drill_sessions)
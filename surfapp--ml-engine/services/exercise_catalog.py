@@ -0,0 +1,266 @@
+# exercise_catalog.py
+"""
+Compact Exercise Catalog
+Array-backed storage for the exercise database: integer-coded enums in
+contiguous NumPy columns, with read-only record views for dict-style access
+"""
+
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+# ============================================================================
+# ENUM CODES
+# ============================================================================
+
+# Ordered levels: a higher code means more skill / more equipment / harder
+SKILL_LEVELS = ('Beginner', 'Intermediate', 'Pro')
+EQUIPMENT_LEVELS = ('None', 'Kettlebell', 'Gym')
+INTENSITY_LEVELS = ('low', 'medium', 'high', 'very_high')
+IMPACT_LEVELS = ('low', 'medium', 'high', 'very_high')
+
+MAX_LIMITATIONS = 64  # Limitation sets are stored as one uint64 bitmask per exercise
+
+# ============================================================================
+# RECORD VIEW
+# ============================================================================
+
+class ExerciseRecord:
+    """
+    Read-only view of one catalog row.
+
+    Supports the same item access as the original exercise dicts
+    (record['duration'], record.get('impact'), 'rest' in record), so code
+    written against EXERCISES_DB keeps working.
+    """
+
+    __slots__ = ('_catalog', '_index')
+
+    FIELDS = ('category', 'duration', 'sets', 'rest', 'intensity', 'equipment',
+              'exclude_limitations', 'skill_min', 'impact')
+
+    def __init__(self, catalog: 'ExerciseCatalog', index: int):
+        object.__setattr__(self, '_catalog', catalog)
+        object.__setattr__(self, '_index', index)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('ExerciseRecord is read-only')
+
+    @property
+    def name(self) -> str:
+        return self._catalog.names[self._index]
+
+    def __getitem__(self, field: str):
+        if field not in self.FIELDS:
+            raise KeyError(field)
+        return self._catalog.field_value(field, self._index)
+
+    def get(self, field: str, default=None):
+        return self[field] if field in self.FIELDS else default
+
+    def __contains__(self, field) -> bool:
+        return field in self.FIELDS
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.FIELDS)
+
+    def keys(self) -> Tuple[str, ...]:
+        return self.FIELDS
+
+    def items(self) -> List[Tuple[str, object]]:
+        return [(field, self[field]) for field in self.FIELDS]
+
+    def to_dict(self) -> Dict:
+        """Plain dict in the original EXERCISES_DB layout"""
+        return dict(self.items())
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, ExerciseRecord):
+            return self._catalog is other._catalog and self._index == other._index
+        return isinstance(other, dict) and self.to_dict() == other
+
+    def __hash__(self) -> int:
+        return hash((id(self._catalog), self._index))
+
+    def __repr__(self) -> str:
+        return f"ExerciseRecord({self.name!r}, {self.to_dict()})"
+
+# ============================================================================
+# CATALOG
+# ============================================================================
+
+class ExerciseCatalog:
+    """
+    Struct-of-arrays exercise catalog.
+
+    Every field is one NumPy column indexed by exercise position; string enums
+    are stored as small integer codes and exclusion lists as a bitmask over the
+    limitation vocabulary. Filtering and time calculations run as array
+    operations over all exercises at once. Also behaves as a read-only mapping
+    of exercise name -> ExerciseRecord.
+    """
+
+    def __init__(self, exercises: Dict[str, Dict]):
+        """
+        Args:
+            exercises: Exercise name -> dict in the EXERCISES_DB layout
+        """
+        rows = list(exercises.values())
+        self.names = list(exercises)
+        self.index = {name: i for i, name in enumerate(self.names)}
+
+        # Categories and limitations are open vocabularies, in first-seen order
+        self.categories = tuple(dict.fromkeys(d['category'] for d in rows))
+        self.limitations = tuple(dict.fromkeys(
+            lim for d in rows for lim in d['exclude_limitations']
+        ))
+        if len(self.limitations) > MAX_LIMITATIONS:
+            raise ValueError(
+                f"Catalog has {len(self.limitations)} limitations, at most {MAX_LIMITATIONS} are supported"
+            )
+        self._category_codes = {c: i for i, c in enumerate(self.categories)}
+        self._limitation_bits = {lim: 1 << i for i, lim in enumerate(self.limitations)}
+
+        self.category = np.array([self._category_codes[d['category']] for d in rows], dtype=np.int8)
+        self.category_bit = np.int64(1) << self.category.astype(np.int64)
+        self.duration = np.array([d['duration'] for d in rows], dtype=np.int32)
+        self.sets = np.array([d['sets'] for d in rows], dtype=np.int32)
+        self.rest = np.array([d['rest'] for d in rows], dtype=np.float64)
+        self.intensity = np.array([INTENSITY_LEVELS.index(d['intensity']) for d in rows], dtype=np.int8)
+        self.equipment = np.array([EQUIPMENT_LEVELS.index(d['equipment']) for d in rows], dtype=np.int8)
+        self.skill_min = np.array([SKILL_LEVELS.index(d['skill_min']) for d in rows], dtype=np.int8)
+        self.impact = np.array([IMPACT_LEVELS.index(d['impact']) for d in rows], dtype=np.int8)
+        self.exclude_mask = np.array(
+            [self.limitation_mask(d['exclude_limitations']) for d in rows], dtype=np.uint64
+        )
+
+        for column in (self.category, self.category_bit, self.duration, self.sets, self.rest, self.intensity,
+                       self.equipment, self.skill_min, self.impact, self.exclude_mask):
+            column.setflags(write=False)
+
+    # ------------------------------------------------------------------
+    # Encoding helpers
+    # ------------------------------------------------------------------
+
+    def limitation_mask(self, limitations: List[str]) -> np.uint64:
+        """Bitmask of the given limitations (names outside the vocabulary are ignored)"""
+        mask = 0
+        for lim in limitations:
+            mask |= self._limitation_bits.get(lim, 0)
+        return np.uint64(mask)
+
+    def category_mask(self, categories: List[str]) -> np.ndarray:
+        """Boolean column: exercise belongs to one of the given categories"""
+        bits = 0
+        for c in categories:
+            if c in self._category_codes:
+                bits |= 1 << self._category_codes[c]
+        return (self.category_bit & bits) != 0
+
+    def field_value(self, field: str, i: int):
+        """Decode one field of one exercise back to its original representation"""
+        if field == 'category':
+            return self.categories[self.category[i]]
+        if field == 'duration':
+            return int(self.duration[i])
+        if field == 'sets':
+            return int(self.sets[i])
+        if field == 'rest':
+            return int(self.rest[i])
+        if field == 'intensity':
+            return INTENSITY_LEVELS[self.intensity[i]]
+        if field == 'equipment':
+            return EQUIPMENT_LEVELS[self.equipment[i]]
+        if field == 'skill_min':
+            return SKILL_LEVELS[self.skill_min[i]]
+        if field == 'impact':
+            return IMPACT_LEVELS[self.impact[i]]
+        if field == 'exclude_limitations':
+            mask = int(self.exclude_mask[i])
+            return [lim for b, lim in enumerate(self.limitations) if mask >> b & 1]
+        raise KeyError(field)
+
+    # ------------------------------------------------------------------
+    # Array operations
+    # ------------------------------------------------------------------
+
+    def filter(
+        self,
+        skill_level: str,
+        equipment: str,
+        limitations: List[str],
+        categories: List[str]
+    ) -> np.ndarray:
+        """
+        Indices of exercises available to the user, in catalog order
+
+        Args:
+            skill_level: Beginner/Intermediate/Pro
+            equipment: None/Kettlebell/Gym (anything else counts as full gym access)
+            limitations: Physical limitations to exclude
+            categories: Exercise categories to keep
+
+        Returns:
+            int64 array of catalog indices
+        """
+        user_skill = SKILL_LEVELS.index(skill_level)
+        user_equipment = EQUIPMENT_LEVELS.index(equipment) if equipment in EQUIPMENT_LEVELS else len(EQUIPMENT_LEVELS) - 1
+
+        keep = (
+            (self.skill_min <= user_skill)
+            & (self.equipment <= user_equipment)
+            & ((self.exclude_mask & self.limitation_mask(limitations)) == 0)
+            & self.category_mask(categories)
+        )
+        return np.flatnonzero(keep)
+
+    def exercise_times(
+        self,
+        indices: np.ndarray,
+        rest_multiplier: float,
+        sets_adjustment: int
+    ) -> np.ndarray:
+        """
+        Total seconds per exercise: duration*sets + rest*(sets-1)
+        
+        rest_multiplier and sets_adjustment may also be (rows, 1) arrays, giving
+        one row of times per setting
+        """
+        sets = np.maximum(1, self.sets[indices].astype(np.int64) + sets_adjustment)
+        rest = (self.rest[indices] * rest_multiplier).astype(np.int64)
+        return self.duration[indices] * sets + rest * (sets - 1)
+
+    # ------------------------------------------------------------------
+    # Mapping interface
+    # ------------------------------------------------------------------
+
+    def record(self, i: int) -> ExerciseRecord:
+        return ExerciseRecord(self, int(i))
+
+    def __getitem__(self, name: str) -> ExerciseRecord:
+        return ExerciseRecord(self, self.index[name])
+
+    def get(self, name: str, default=None) -> Optional[ExerciseRecord]:
+        return self[name] if name in self.index else default
+
+    def __contains__(self, name) -> bool:
+        return name in self.index
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.names)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def keys(self) -> List[str]:
+        return list(self.names)
+
+    def values(self) -> List[ExerciseRecord]:
+        return [ExerciseRecord(self, i) for i in range(len(self.names))]
+
+    def items(self) -> List[Tuple[str, ExerciseRecord]]:
+        return [(name, ExerciseRecord(self, i)) for i, name in enumerate(self.names)]
+
+    def to_dict(self) -> Dict[str, Dict]:
+        """Plain nested dicts in the original EXERCISES_DB layout"""
+        return {name: ExerciseRecord(self, i).to_dict() for i, name in enumerate(self.names)}
@@ -0,0 +1,49 @@
+# fast_json.py
+"""
+Fast JSON Encoding
+orjson-backed encoding for API responses and caches, falling back to the
+standard library when orjson is not installed
+"""
+
+import json
+from typing import Any
+
+import numpy as np
+from fastapi.responses import Response
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
+
+def _default(obj: Any):
+    """Encode NumPy values the standard library does not understand"""
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def dumps(obj: Any) -> bytes:
+    """Serialize obj to compact UTF-8 JSON bytes (NumPy scalars and arrays allowed)"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(obj, default=_default, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+def loads(data: bytes) -> Any:
+    """Deserialize JSON bytes"""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def json_response(body: bytes, status_code: int = 200) -> Response:
+    """
+    Response for an already encoded JSON body
+
+    Returning a Response from a route skips FastAPI's response_model
+    validation and re-serialization, so callers must shape the body to
+    match the declared model themselves.
+    """
+    return Response(content=body, status_code=status_code, media_type='application/json')
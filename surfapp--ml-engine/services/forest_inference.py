@@ -0,0 +1,254 @@
+# forest_inference.py
+"""
+Compiled Forest Inference
+Flattens a trained scikit-learn RandomForestClassifier into plain NumPy node
+arrays and evaluates it without scikit-learn
+
+All trees share one set of node arrays (feature, threshold, children) with
+global node indices, and leaf class probabilities are stored sparsely
+(pure leaves hold a single class). Evaluation walks every (row, tree) pair
+one level per step, so a batch costs one pass over the forest depth and a
+single row skips scikit-learn's per-call validation and thread dispatch.
+
+Predictions match RandomForestClassifier.predict / predict_proba: inputs
+are compared in float32 like scikit-learn's trees, and probabilities are
+accumulated in tree order.
+"""
+
+import json
+import os
+from typing import Dict, Optional
+
+import numpy as np
+
+FORMAT_VERSION = 1
+META_FILE = 'meta.json'
+FOREST_DIR_NAME = 'recommender_forest'  # Saved next to recommender_model.joblib
+ARRAY_NAMES = (
+    'feature', 'threshold', 'left', 'missing_left',
+    'value_offsets', 'value_classes', 'value_weights', 'roots',
+)
+
+# ============================================================================
+# COMPILATION
+# ============================================================================
+
+def _sibling_order(children_left, children_right):
+    """
+    Breadth-first node order in which every right child directly follows
+    its left sibling
+
+    Returns:
+        (old node id per new position, new position per old node id)
+    """
+    n = len(children_left)
+    order = np.empty(n, dtype=np.int64)
+    new_ids = np.empty(n, dtype=np.int64)
+    order[0] = new_ids[0] = 0
+    filled = 1
+    for position in range(n):
+        old = order[position]
+        left = children_left[old]
+        if left != -1:
+            right = children_right[old]
+            order[filled], order[filled + 1] = left, right
+            new_ids[left], new_ids[right] = filled, filled + 1
+            filled += 2
+    return order, new_ids
+
+def compile_forest(model) -> 'CompiledForest':
+    """
+    Compile a fitted RandomForestClassifier (single output) into flat arrays
+
+    Args:
+        model: Fitted sklearn.ensemble.RandomForestClassifier
+
+    Returns:
+        CompiledForest
+    """
+    if getattr(model, 'n_outputs_', 1) != 1:
+        raise ValueError("Only single-output forests can be compiled")
+
+    features, thresholds, lefts, missing_lefts = [], [], [], []
+    offsets, value_classes, value_weights, roots = [np.zeros(1, dtype=np.int64)], [], [], []
+    base = 0
+    max_depth = 0
+
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        order, new_ids = _sibling_order(tree.children_left, tree.children_right)
+        old_left = tree.children_left[order]
+        is_leaf = old_left == -1
+
+        # Leaves are marked with feature -1; the right child is always left + 1
+        features.append(np.where(is_leaf, -1, tree.feature[order]).astype(np.int32))
+        thresholds.append(tree.threshold[order])
+        lefts.append(np.where(is_leaf, -1, new_ids[old_left] + base).astype(np.int32))
+        missing_left = getattr(tree, 'missing_go_to_left', None)
+        if missing_left is None:
+            missing_left = np.zeros(tree.node_count, dtype=bool)
+        missing_lefts.append(np.asarray(missing_left, dtype=bool)[order] & ~is_leaf)
+
+        # Normalized class distribution per leaf, as DecisionTreeClassifier.predict_proba
+        values = tree.value[order, 0, :].astype(np.float64)
+        values = values / values.sum(axis=1, keepdims=True)
+        values[~is_leaf] = 0.0
+        node_idx, class_idx = np.nonzero(values)
+        value_classes.append(class_idx.astype(np.int32))
+        value_weights.append(values[node_idx, class_idx])
+        offsets.append(offsets[-1][-1] + np.cumsum(np.bincount(node_idx, minlength=tree.node_count)))
+
+        roots.append(base)
+        base += tree.node_count
+        max_depth = max(max_depth, tree.max_depth)
+
+    arrays = {
+        'feature': np.concatenate(features),
+        'threshold': np.concatenate(thresholds).astype(np.float64),
+        'left': np.concatenate(lefts),
+        'missing_left': np.concatenate(missing_lefts),
+        'value_offsets': np.concatenate(offsets).astype(np.int64),
+        'value_classes': np.concatenate(value_classes),
+        'value_weights': np.concatenate(value_weights),
+        'roots': np.asarray(roots, dtype=np.int32),
+    }
+    meta = {
+        'formatVersion': FORMAT_VERSION,
+        'nFeatures': int(model.n_features_in_),
+        'nClasses': int(len(model.classes_)),
+        'maxDepth': int(max_depth),
+    }
+    return CompiledForest(arrays, np.asarray(model.classes_), meta)
+
+# ============================================================================
+# EVALUATION
+# ============================================================================
+
+class CompiledForest:
+    """Flat-array random forest with the predict / predict_proba interface"""
+
+    def __init__(self, arrays: Dict[str, np.ndarray], classes: np.ndarray, meta: Dict):
+        for name in ARRAY_NAMES:
+            setattr(self, name, arrays[name])
+        self.classes_ = classes
+        self.meta = meta
+        self.n_features_in_ = meta['nFeatures']
+        self.n_classes = meta['nClasses']
+        self.max_depth = meta['maxDepth']
+        self.n_trees = len(self.roots)
+
+    def apply(self, X) -> np.ndarray:
+        """
+        Leaf reached by every row in every tree
+
+        Returns:
+            (n_rows, n_trees) array of global node indices
+        """
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != self.n_features_in_:
+            raise ValueError(f"X has {X.shape[1]} features, but the forest expects {self.n_features_in_}")
+
+        n_rows, n_features = X.shape
+        flat_X = X.ravel()
+        has_missing = bool(np.isnan(flat_X).any())  # NaN follows each split's missing-value branch
+
+        # One walker per (row, tree); walkers that reach a leaf are retired
+        walkers = np.arange(n_rows * self.n_trees)
+        row_offsets = np.repeat(np.arange(n_rows) * n_features, self.n_trees)
+        nodes = np.tile(self.roots, n_rows)
+        leaves = np.empty(len(walkers), dtype=np.int32)
+
+        while walkers.size:
+            feature = self.feature[nodes]
+            at_leaf = feature < 0
+            if at_leaf.any():
+                leaves[walkers[at_leaf]] = nodes[at_leaf]
+                active = ~at_leaf
+                walkers, nodes, feature = walkers[active], nodes[active], feature[active]
+                if not walkers.size:
+                    break
+
+            x = flat_X[row_offsets[walkers] + feature]
+            go_right = ~(x <= self.threshold[nodes])
+            if has_missing:
+                go_right &= ~(np.isnan(x) & self.missing_left[nodes])
+            nodes = self.left[nodes] + go_right
+
+        return leaves.reshape(n_rows, self.n_trees)
+
+    def predict_proba(self, X) -> np.ndarray:
+        """Mean class probabilities over trees, shape (n_rows, n_classes)"""
+        leaves = self.apply(X)
+        n_rows = leaves.shape[0]
+
+        # Expand each (row, tree) leaf into its sparse class weights; bincount
+        # adds them in row-major (row, tree) order, i.e. tree order per cell
+        starts = self.value_offsets[leaves].ravel()
+        counts = self.value_offsets[leaves + 1].ravel() - starts
+        entry_rows = np.repeat(np.arange(n_rows).repeat(self.n_trees), counts)
+        entry_idx = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+
+        proba = np.bincount(
+            entry_rows * self.n_classes + self.value_classes[entry_idx],
+            weights=self.value_weights[entry_idx],
+            minlength=n_rows * self.n_classes,
+        ).reshape(n_rows, self.n_classes)
+        proba /= self.n_trees
+        return proba
+
+    def predict(self, X) -> np.ndarray:
+        """Most probable class per row (first class on ties, like scikit-learn)"""
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1))
+
+# ============================================================================
+# STORAGE
+# ============================================================================
+
+def save_compiled_forest(forest: CompiledForest, directory: str) -> str:
+    """
+    Write a compiled forest as one .npy file per array plus meta.json
+
+    Returns:
+        The directory written
+    """
+    os.makedirs(directory, exist_ok=True)
+    for name in ARRAY_NAMES:
+        np.save(os.path.join(directory, f'{name}.npy'), getattr(forest, name))
+    np.save(os.path.join(directory, 'classes.npy'), forest.classes_, allow_pickle=False)
+    with open(os.path.join(directory, META_FILE), 'w') as f:
+        json.dump(forest.meta, f, indent=2)
+    return directory
+
+def load_compiled_forest(directory: str, mmap_mode: Optional[str] = None) -> CompiledForest:
+    """
+    Load a compiled forest written by save_compiled_forest
+
+    Args:
+        directory: Forest directory
+        mmap_mode: Passed to np.load ('r' maps the arrays instead of reading them)
+    """
+    with open(os.path.join(directory, META_FILE)) as f:
+        meta = json.load(f)
+    if meta.get('formatVersion') != FORMAT_VERSION:
+        raise ValueError(f"Unsupported compiled forest format: {meta.get('formatVersion')}")
+
+    arrays = {name: np.load(os.path.join(directory, f'{name}.npy'), mmap_mode=mmap_mode) for name in ARRAY_NAMES}
+    classes = np.load(os.path.join(directory, 'classes.npy'), allow_pickle=False)
+    return CompiledForest(arrays, classes, meta)
+
+if __name__ == '__main__':
+    # Compile an existing model: python forest_inference.py recommender_model.joblib [output_dir]
+    import sys
+    import joblib
+
+    if len(sys.argv) < 2:
+        print("Usage: python forest_inference.py <model.joblib> [output_dir]")
+        sys.exit(1)
+
+    model_path = sys.argv[1]
+    output_dir = sys.argv[2] if len(sys.argv) > 2 else os.path.join(os.path.dirname(model_path), FOREST_DIR_NAME)
+    forest = compile_forest(joblib.load(model_path))
+    save_compiled_forest(forest, output_dir)
+    print(f"✅ Compiled {forest.n_trees} trees ({len(forest.feature)} nodes) to {output_dir}")
@@ -0,0 +1,116 @@
+"""
+Kinematics
+Vectorized joint angles over pose landmarks
+
+All joint angles a drill needs (knees, hips, elbows, shoulders and the
+paddling back arch, both sides) are computed in one NumPy pass over a
+landmark array, for a single frame or a whole batch of frames, instead of
+one calculate_angle call per joint triple.
+
+Landmark arrays have shape (..., len(LANDMARK_NAMES), 3) holding x, y and
+visibility in LANDMARK_NAMES order; joint_angles returns (..., len(JOINTS)).
+"""
+
+from typing import Dict, List, Optional
+
+import numpy as np
+
+try:
+    from pose_detection import LANDMARK_INDICES
+except ImportError:
+    # pose_detection from before it exported the table (e.g. an older tree
+    # replayed by replay_drills --baseline): the same MediaPipe indices
+    LANDMARK_INDICES = {
+        'nose': 0, 'leftEye': 1, 'rightEye': 4, 'leftEar': 7, 'rightEar': 8,
+        'leftShoulder': 11, 'rightShoulder': 12, 'leftElbow': 13, 'rightElbow': 14,
+        'leftWrist': 15, 'rightWrist': 16, 'leftHip': 23, 'rightHip': 24,
+        'leftKnee': 25, 'rightKnee': 26, 'leftAnkle': 27, 'rightAnkle': 28,
+    }
+
+LANDMARK_NAMES = tuple(LANDMARK_INDICES)
+LANDMARK_INDEX = {name: i for i, name in enumerate(LANDMARK_NAMES)}
+
+# Joint -> (a, b, c): the angle ABC at landmark b
+JOINTS = {
+    'leftKnee': ('leftHip', 'leftKnee', 'leftAnkle'),
+    'rightKnee': ('rightHip', 'rightKnee', 'rightAnkle'),
+    'leftHip': ('leftShoulder', 'leftHip', 'leftKnee'),
+    'rightHip': ('rightShoulder', 'rightHip', 'rightKnee'),
+    'leftElbow': ('leftShoulder', 'leftElbow', 'leftWrist'),
+    'rightElbow': ('rightShoulder', 'rightElbow', 'rightWrist'),
+    'leftShoulder': ('leftHip', 'leftShoulder', 'leftElbow'),
+    'rightShoulder': ('rightHip', 'rightShoulder', 'rightElbow'),
+    'backArch': ('leftEar', 'leftShoulder', 'leftHip'),
+}
+JOINT_NAMES = tuple(JOINTS)
+JOINT_INDEX = {name: i for i, name in enumerate(JOINT_NAMES)}
+
+# Positions in the angle vector
+LEFT_KNEE, RIGHT_KNEE = JOINT_INDEX['leftKnee'], JOINT_INDEX['rightKnee']
+LEFT_HIP, RIGHT_HIP = JOINT_INDEX['leftHip'], JOINT_INDEX['rightHip']
+LEFT_ELBOW, RIGHT_ELBOW = JOINT_INDEX['leftElbow'], JOINT_INDEX['rightElbow']
+LEFT_SHOULDER, RIGHT_SHOULDER = JOINT_INDEX['leftShoulder'], JOINT_INDEX['rightShoulder']
+BACK_ARCH = JOINT_INDEX['backArch']
+
+_A = np.array([LANDMARK_INDEX[a] for a, _, _ in JOINTS.values()])
+_B = np.array([LANDMARK_INDEX[b] for _, b, _ in JOINTS.values()])
+_C = np.array([LANDMARK_INDEX[c] for _, _, c in JOINTS.values()])
+_ABC = np.concatenate([_A, _B, _C])
+
+_MISSING = (np.nan, np.nan, 0.0)
+
+def landmarks_to_array(landmarks: Optional[Dict]) -> np.ndarray:
+    """
+    Landmark dict (as built by pose_detection.extract_landmarks) -> (N, 3) array
+
+    Missing landmarks become NaN coordinates with zero visibility.
+    """
+    if not landmarks:
+        landmarks = {}
+    rows = [
+        (lm['x'], lm['y'], lm.get('visibility', 0.5)) if lm else _MISSING
+        for lm in map(landmarks.get, LANDMARK_NAMES)
+    ]
+    return np.array(rows, dtype=np.float64)
+
+def frames_to_array(frames: List[Optional[Dict]]) -> np.ndarray:
+    """List of landmark dicts -> (frames, N, 3) array"""
+    if not frames:
+        return np.empty((0, len(LANDMARK_NAMES), 3))
+    return np.stack([landmarks_to_array(frame) for frame in frames])
+
+def joint_angles(landmarks: np.ndarray, visibility_threshold: float = None) -> np.ndarray:
+    """
+    Every joint angle of one frame or a batch of frames, in degrees (0-180)
+
+    Args:
+        landmarks: (..., N, 2) or (..., N, 3) array in LANDMARK_NAMES order
+        visibility_threshold: If set (needs the visibility channel), joints
+            with any landmark below it are NaN
+
+    Returns:
+        (..., len(JOINTS)) array in JOINT_NAMES order. A joint whose middle
+        point coincides with an end point is 0, like calculate_angle.
+    """
+    # One gather for all three points of every joint
+    points = landmarks[..., _ABC, :2]
+    n = len(JOINT_NAMES)
+    a, b, c = points[..., :n, :], points[..., n:2 * n, :], points[..., 2 * n:, :]
+    ba = a - b
+    bc = c - b
+
+    radians = np.arctan2(bc[..., 1], bc[..., 0]) - np.arctan2(ba[..., 1], ba[..., 0])
+    angles = np.abs(radians * 180.0 / np.pi)
+    angles = np.minimum(angles, 360.0 - angles)  # Reflex angles fold back to 0-180
+
+    # Overlapping points have no angle
+    overlap = ((ba[..., 0] == 0) & (ba[..., 1] == 0)) | ((bc[..., 0] == 0) & (bc[..., 1] == 0))
+    angles[overlap] = 0.0
+
+    if visibility_threshold is not None:
+        visibility = landmarks[..., 2]
+        hidden = ((visibility[..., _A] < visibility_threshold)
+                  | (visibility[..., _B] < visibility_threshold)
+                  | (visibility[..., _C] < visibility_threshold))
+        angles[hidden] = np.nan
+    return angles
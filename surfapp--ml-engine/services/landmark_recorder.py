@@ -0,0 +1,316 @@
+# landmark_recorder.py
+"""
+Landmark Session Recorder
+Optional append-only recording of each session's pose landmarks to compact
+fixed-record binary files that can be memory-mapped later
+
+Enabled by setting POSE_RECORDING_DIR. Every detection for a session appends
+one RECORD_DTYPE record to <POSE_RECORDING_DIR>/<session>.lmk:
+
+    header   16 bytes: magic, record size, landmark count, joint count
+    records  timestamp, landmarks (x, y, z, visibility in LANDMARK_NAMES
+             order), joint angles (JOINT_NAMES order), stability, quality,
+             average visibility, drill rep count, person detected
+
+Records are buffered per session and written in batches (every
+POSE_RECORDING_FLUSH_FRAMES frames or POSE_RECORDING_FLUSH_SECONDS seconds),
+so a frame only costs copying its values into a list; conversion to records
+and the joint angles are done for the whole batch at flush time. The age of
+a batch is checked when the session's next frame arrives and whenever a new
+session opens, so a session that goes quiet is flushed by either of those
+or when it is closed. A crash loses at most the unflushed batch, and readers
+ignore a trailing partial record.
+
+Reopening a session appends to its file when the header matches the current
+layout (after dropping any partial record); a file written with another
+layout is renamed to <session>.lmk.<unix time>.old and a new one is started.
+
+Reading:
+    records = open_recording(path)      # np.memmap of RECORD_DTYPE
+    records['landmarks']                # (frames, 17, 4) view
+    records['angles'][:, JOINT_INDEX['leftKnee']]
+"""
+
+import atexit
+import os
+import re
+import threading
+import time
+import zlib
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from kinematics import JOINT_NAMES, LANDMARK_NAMES, joint_angles
+
+POSE_RECORDING_DIR = os.environ.get('POSE_RECORDING_DIR', '')  # Empty disables recording
+POSE_RECORDING_FLUSH_FRAMES = int(os.environ.get('POSE_RECORDING_FLUSH_FRAMES', 64))
+POSE_RECORDING_FLUSH_SECONDS = float(os.environ.get('POSE_RECORDING_FLUSH_SECONDS', 2.0))
+RECORDING_IDLE_SECONDS = 300     # Sessions idle this long are flushed and closed
+MAX_OPEN_RECORDINGS = 256        # Open file handles kept at most
+
+RECORDING_SUFFIX = '.lmk'
+MAGIC = b'SURFLMK1'
+
+RECORD_DTYPE = np.dtype([
+    ('timestamp', '<f8'),                             # Unix time of the frame
+    ('landmarks', '<f4', (len(LANDMARK_NAMES), 4)),   # x, y, z, visibility; NaN when missing
+    ('angles', '<f4', (len(JOINT_NAMES),)),           # Joint angles in degrees
+    ('stability', '<f4'),
+    ('quality', '<f4'),
+    ('visibility', '<f4'),
+    ('repCount', '<i4'),                              # Drill reps so far, -1 without a drill
+    ('personDetected', 'u1'),
+])
+HEADER_DTYPE = np.dtype([
+    ('magic', 'S8'),
+    ('recordSize', '<u4'),
+    ('landmarkCount', '<u2'),
+    ('jointCount', '<u2'),
+])
+HEADER_SIZE = HEADER_DTYPE.itemsize
+
+_MISSING_LANDMARK = (np.nan, np.nan, np.nan, 0.0)
+
+def _header() -> bytes:
+    header = np.zeros(1, dtype=HEADER_DTYPE)
+    header[0] = (MAGIC, RECORD_DTYPE.itemsize, len(LANDMARK_NAMES), len(JOINT_NAMES))
+    return header.tobytes()
+
+def recording_filename(session_id: str) -> str:
+    """File name for a session (ids outside [A-Za-z0-9_-] get a checksum suffix)"""
+    safe = re.sub(r'[^A-Za-z0-9_-]', '_', session_id)[:100]
+    if safe != session_id:
+        safe = f"{safe}-{zlib.crc32(session_id.encode()):08x}"
+    return safe + RECORDING_SUFFIX
+
+# ============================================================================
+# WRITING
+# ============================================================================
+
+def _prepare_for_append(path: str) -> bool:
+    """
+    Check an existing recording before appending to it
+
+    Returns:
+        True when records can be appended to the file. A file with another
+        header is moved aside (never appended to); a trailing partial record
+        is cut so new records stay aligned.
+    """
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return False
+    with open(path, 'rb') as f:
+        header = f.read(HEADER_SIZE)
+    if header != _header():
+        stale = f"{path}.{int(time.time())}.old"
+        os.replace(path, stale)
+        print(f"⚠️  Recording layout changed; moved {path} to {stale}")
+        return False
+    partial = (os.path.getsize(path) - HEADER_SIZE) % RECORD_DTYPE.itemsize
+    if partial:
+        os.truncate(path, os.path.getsize(path) - partial)
+    return True
+
+class _SessionRecording:
+    """Buffered appender for one session's file"""
+
+    def __init__(self, path: str):
+        new_file = not _prepare_for_append(path)
+        self.file = open(path, 'ab')
+        if new_file:
+            self.file.write(_header())
+        self.pending = []  # Plain tuples; converted to records in one go at flush
+        self.last_flush = time.monotonic()
+        self.last_seen = self.last_flush
+        self.lock = threading.Lock()
+
+    def append(self, timestamp: float, result: Dict, rep_count: int):
+        landmarks = result.get('landmarks') or {}
+        flat = []
+        for lm in map(landmarks.get, LANDMARK_NAMES):
+            flat.extend((lm['x'], lm['y'], lm.get('z', 0.0), lm.get('visibility', 0.5)) if lm else _MISSING_LANDMARK)
+        self.pending.append((
+            timestamp,
+            flat,
+            result.get('stability_score') or 0.0,
+            result.get('detectionQuality') or 0.0,
+            result.get('averageVisibility') or 0.0,
+            rep_count,
+            bool(result.get('personDetected')),
+        ))
+
+    def flush(self):
+        if self.pending:
+            timestamps, landmarks, stability, quality, visibility, reps, detected = zip(*self.pending)
+            batch = np.zeros(len(self.pending), dtype=RECORD_DTYPE)
+            batch['timestamp'] = timestamps
+            batch['landmarks'] = np.array(landmarks, dtype=np.float32).reshape(len(self.pending), -1, 4)
+            batch['angles'] = joint_angles(batch['landmarks'])  # One kernel call per batch
+            batch['stability'] = stability
+            batch['quality'] = quality
+            batch['visibility'] = visibility
+            batch['repCount'] = reps
+            batch['personDetected'] = detected
+            self.file.write(batch.tobytes())
+            self.file.flush()
+            self.pending = []
+        self.last_flush = time.monotonic()
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+class LandmarkRecorder:
+    """Appends detection results to per-session recordings"""
+
+    def __init__(self, directory: str, flush_frames: int = POSE_RECORDING_FLUSH_FRAMES,
+                 flush_seconds: float = POSE_RECORDING_FLUSH_SECONDS):
+        self.directory = directory
+        self.flush_frames = max(1, flush_frames)
+        self.flush_seconds = flush_seconds
+        self._sessions: Dict[str, _SessionRecording] = {}
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _session(self, session_id: str) -> _SessionRecording:
+        with self._lock:
+            recording = self._sessions.get(session_id)
+            if recording is None:
+                self._close_idle()
+                path = os.path.join(self.directory, recording_filename(session_id))
+                recording = self._sessions[session_id] = _SessionRecording(path)
+            recording.last_seen = time.monotonic()
+            return recording
+
+    def _close_idle(self):
+        """
+        Close idle recordings, then the least recently used ones over the cap,
+        and flush the batches of the rest that are older than flush_seconds
+        """
+        now = time.monotonic()
+        idle = [k for k, r in self._sessions.items() if now - r.last_seen > RECORDING_IDLE_SECONDS]
+        if len(self._sessions) - len(idle) >= MAX_OPEN_RECORDINGS:
+            by_age = sorted(self._sessions, key=lambda k: self._sessions[k].last_seen)
+            idle = by_age[:len(self._sessions) - MAX_OPEN_RECORDINGS + 1]
+        for key in idle:
+            recording = self._sessions.pop(key)
+            with recording.lock:
+                recording.close()
+        for recording in self._sessions.values():
+            if recording.pending and now - recording.last_flush >= self.flush_seconds:
+                with recording.lock:
+                    if not recording.file.closed:
+                        recording.flush()
+
+    def record(self, session_id: str, result: Dict, timestamp: float = None, rep_count: int = -1):
+        """
+        Buffer one detection result for a session
+
+        Args:
+            session_id: Client session id (one file per session)
+            result: Detection result dict from pose_detection
+            timestamp: Frame time (defaults to now)
+            rep_count: Drill rep count at this frame, -1 without a drill
+        """
+        recording = self._session(session_id)
+        with recording.lock:
+            if recording.file.closed:
+                return  # Closed by eviction between lookup and append
+            recording.append(time.time() if timestamp is None else timestamp, result, rep_count)
+            if (len(recording.pending) >= self.flush_frames
+                    or time.monotonic() - recording.last_flush >= self.flush_seconds):
+                recording.flush()
+
+    def close_session(self, session_id: str) -> bool:
+        """Flush and close a session's recording; returns whether one was open"""
+        with self._lock:
+            recording = self._sessions.pop(session_id, None)
+        if recording:
+            with recording.lock:
+                recording.close()
+        return recording is not None
+
+    def close(self):
+        """Flush and close every open recording"""
+        with self._lock:
+            recordings, self._sessions = list(self._sessions.values()), {}
+        for recording in recordings:
+            with recording.lock:
+                recording.close()
+
+    def stats(self) -> Dict:
+        return {'directory': self.directory, 'openSessions': len(self._sessions)}
+
+def write_recording(path: str, records: np.ndarray, append: bool = False):
+    """
+    Write an array of RECORD_DTYPE records as a recording (for generated or
+    converted data; live sessions go through LandmarkRecorder)
+
+    Args:
+        path: Recording file path
+        records: RECORD_DTYPE array
+        append: Add to an existing recording instead of replacing it
+    """
+    if records.dtype != RECORD_DTYPE:
+        raise ValueError(f"Expected RECORD_DTYPE records, got {records.dtype}")
+    new_file = not append or not _prepare_for_append(path)
+    with open(path, 'wb' if new_file else 'ab') as f:
+        if new_file:
+            f.write(_header())
+        f.write(records.tobytes())
+
+# ============================================================================
+# READING
+# ============================================================================
+
+def open_recording(path: str, mode: str = 'r') -> np.ndarray:
+    """
+    Memory-map a recording
+
+    Returns:
+        np.memmap of RECORD_DTYPE records; fields are NumPy views into the
+        file. A trailing partial record (interrupted write) is ignored.
+
+    Raises:
+        ValueError: Not a recording, or written with a different layout
+    """
+    header = np.fromfile(path, dtype=HEADER_DTYPE, count=1)
+    if len(header) == 0 or header[0]['magic'] != MAGIC:
+        raise ValueError(f"Not a landmark recording: {path}")
+    expected = np.frombuffer(_header(), dtype=HEADER_DTYPE)[0]
+    if header[0] != expected:
+        raise ValueError(
+            f"Recording layout mismatch in {path}: record size {header[0]['recordSize']}, "
+            f"{header[0]['landmarkCount']} landmarks, {header[0]['jointCount']} joints"
+        )
+
+    count = (os.path.getsize(path) - HEADER_SIZE) // RECORD_DTYPE.itemsize
+    if count == 0:
+        return np.zeros(0, dtype=RECORD_DTYPE)
+    return np.memmap(path, dtype=RECORD_DTYPE, mode=mode, offset=HEADER_SIZE, shape=(count,))
+
+def list_recordings(directory: str = POSE_RECORDING_DIR) -> List[str]:
+    """Recording file paths in a directory, sorted by name"""
+    if not directory or not os.path.isdir(directory):
+        return []
+    return sorted(
+        os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(RECORDING_SUFFIX)
+    )
+
+def read_session(session_id: str, directory: str = POSE_RECORDING_DIR) -> np.ndarray:
+    """Memory-mapped records of one session"""
+    return open_recording(os.path.join(directory, recording_filename(session_id)))
+
+# ============================================================================
+# SINGLETON
+# ============================================================================
+
+_recorder = None
+
+def get_landmark_recorder() -> Optional[LandmarkRecorder]:
+    """Process-wide recorder, or None when POSE_RECORDING_DIR is not set"""
+    global _recorder
+    if _recorder is None and POSE_RECORDING_DIR:
+        _recorder = LandmarkRecorder(POSE_RECORDING_DIR)
+        atexit.register(_recorder.close)
+    return _recorder
@@ -0,0 +1,329 @@
+# model_registry.py
+"""
+Model Registry
+Versioned recommender artifacts with memory-mapped loading and atomic
+hot-swap
+
+Layout:
+    models/
+        ACTIVE                  name of the active version
+        versions/<version>/     recommender_model.joblib, *_encoder.joblib,
+                                recommender_forest/ (compiled forest)
+
+Without an ACTIVE file the artifacts directly in models/ are served as the
+'unversioned' version, so existing deployments keep working.
+
+Array data is memory-mapped (the compiled forest's .npy files, and any
+arrays joblib can map), so every worker process shares the same page-cache
+pages instead of holding its own copy. A new version is loaded completely
+before it replaces the old one with a single reference swap; requests that
+already hold the old bundle finish with it.
+
+Usage:
+    python model_registry.py list
+    python model_registry.py publish <training_output_dir> [--version NAME] [--activate]
+    python model_registry.py activate <version>
+"""
+
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+BASE_DIR = os.path.dirname(__file__)
+DEFAULT_MODEL_DIR = os.path.abspath(os.path.join(BASE_DIR, '..', 'models'))
+
+# Registry root and how often each worker checks ACTIVE for a new version (0 disables)
+MODEL_REGISTRY_DIR = os.environ.get('MODEL_REGISTRY_DIR', DEFAULT_MODEL_DIR)
+MODEL_WATCH_INTERVAL = float(os.environ.get('MODEL_WATCH_INTERVAL', 5))
+
+# Serve predictions from the compiled forest when a version has one;
+# set USE_COMPILED_FOREST=0 to always use the scikit-learn model
+USE_COMPILED_FOREST = os.environ.get('USE_COMPILED_FOREST', '1') == '1'
+
+ACTIVE_FILE = 'ACTIVE'
+VERSIONS_DIR = 'versions'
+UNVERSIONED = 'unversioned'
+ENCODER_FILES = {
+    'skill_encoder': 'skill_encoder.joblib',
+    'goal_encoder': 'goal_encoder.joblib',
+    'exercise_encoder': 'exercise_encoder.joblib',
+}
+MODEL_FILE = 'recommender_model.joblib'
+
+# ============================================================================
+# LOADING
+# ============================================================================
+
+def _load_joblib(path: str):
+    import joblib  # Deferred: pulls in scikit-learn
+
+    if not os.path.exists(path):
+        raise FileNotFoundError(path)
+    # mmap_mode only applies to arrays stored uncompressed; anything else loads normally
+    return joblib.load(path, mmap_mode='r')
+
+def load_bundle(directory: str, version: str) -> Dict:
+    """
+    Load one version's model and encoders
+
+    Returns:
+        Artifacts dict: model, engine, version, loadedAt and the three encoders
+    """
+    from forest_inference import FOREST_DIR_NAME, load_compiled_forest
+
+    forest_dir = os.path.join(directory, FOREST_DIR_NAME)
+    if USE_COMPILED_FOREST and os.path.isdir(forest_dir):
+        model, engine = load_compiled_forest(forest_dir, mmap_mode='r'), 'compiled-forest'
+    else:
+        model, engine = _load_joblib(os.path.join(directory, MODEL_FILE)), 'scikit-learn'
+
+    bundle = {
+        'model': model,
+        'engine': engine,
+        'version': version,
+        'loadedAt': datetime.utcnow().isoformat() + 'Z',
+    }
+    for key, filename in ENCODER_FILES.items():
+        bundle[key] = _load_joblib(os.path.join(directory, filename))
+
+    # Smoke test before the bundle can go live
+    n_features = getattr(model, 'n_features_in_', None)
+    if n_features:
+        model.predict([[0.0] * n_features])
+
+    return bundle
+
+# ============================================================================
+# REGISTRY
+# ============================================================================
+
+class ModelRegistry:
+    """Tracks the active model version and swaps it atomically"""
+
+    def __init__(self, root: str = MODEL_REGISTRY_DIR):
+        self.root = root
+        self._bundle = None
+        self._lock = threading.Lock()  # Serializes loads/swaps, never held by readers
+        self._watcher = None
+        self._stop = threading.Event()
+        self.last_error = None
+        self._failed_version = None  # Not retried by the watcher until ACTIVE changes again
+        self._load_error = None  # First-load failure of _failed_version, re-raised by current()
+
+    # --- Paths ---
+
+    def version_dir(self, version: str) -> str:
+        if version == UNVERSIONED:
+            return self.root
+        if not version or version.startswith('.') or os.sep in version or (os.altsep and os.altsep in version):
+            raise FileNotFoundError(f"Invalid model version name: {version!r}")
+        return os.path.join(self.root, VERSIONS_DIR, version)
+
+    def list_versions(self) -> List[str]:
+        versions_root = os.path.join(self.root, VERSIONS_DIR)
+        if not os.path.isdir(versions_root):
+            return []
+        return sorted(
+            name for name in os.listdir(versions_root)
+            if not name.startswith('.') and os.path.isdir(os.path.join(versions_root, name))
+        )
+
+    def active_version(self) -> str:
+        """Version named in ACTIVE, or 'unversioned' when there is none"""
+        try:
+            with open(os.path.join(self.root, ACTIVE_FILE)) as f:
+                return f.read().strip() or UNVERSIONED
+        except FileNotFoundError:
+            return UNVERSIONED
+
+    # --- Serving ---
+
+    def current(self) -> Dict:
+        """
+        The live bundle, loading the active version on first use
+
+        Callers should fetch it once per request and use that reference
+        throughout, so a concurrent swap never mixes two versions. A failed
+        first load is not retried until ACTIVE names another version; until
+        then each call raises a fresh RuntimeError carrying the cached message,
+        without touching the lock.
+        """
+        bundle = self._bundle
+        if bundle is None:
+            version = self.active_version()
+            error = self._load_error
+            if error is not None and version == self._failed_version:
+                raise RuntimeError(f"Model version {version} failed to load: {error}") from None
+            with self._lock:
+                if self._bundle is None:
+                    if self._load_error is not None and version == self._failed_version:
+                        raise RuntimeError(f"Model version {version} failed to load: {self._load_error}") from None
+                    try:
+                        self._bundle = load_bundle(self.version_dir(version), version)
+                    except Exception as e:
+                        self.last_error = str(e)
+                        self._failed_version, self._load_error = version, e
+                        raise
+                    self.last_error = None
+                    self._failed_version, self._load_error = None, None
+                    self.start_watcher()
+                bundle = self._bundle
+        return bundle
+
+    @property
+    def loaded_version(self) -> Optional[str]:
+        bundle = self._bundle
+        return bundle['version'] if bundle else None
+
+    def activate(self, version: str) -> Dict:
+        """
+        Load a version, make it live in this process and record it in ACTIVE
+        (other workers pick it up through their watchers)
+
+        Raises:
+            FileNotFoundError: Unknown version
+            Exception: The version failed to load; the previous one stays live
+        """
+        directory = self.version_dir(version)
+        if not os.path.isdir(directory):
+            raise FileNotFoundError(f"Model version not found: {version}")
+
+        with self._lock:
+            bundle = load_bundle(directory, version)
+            self._write_active(version)
+            self._bundle = bundle
+            self.last_error = None
+            self._failed_version, self._load_error = None, None
+        print(f"✅ Model version {version} is live ({bundle['engine']})")
+        return bundle
+
+    def reload_if_changed(self) -> bool:
+        """Swap to the version in ACTIVE if it differs from the loaded one"""
+        version = self.active_version()
+        if self._bundle is None or version in (self.loaded_version, self._failed_version):
+            return False
+
+        with self._lock:
+            if version == self.loaded_version:
+                return False
+            try:
+                self._bundle = load_bundle(self.version_dir(version), version)
+                self.last_error = None
+                self._failed_version = None
+            except Exception as e:
+                # Keep serving the current version; retry once ACTIVE changes again
+                self._failed_version = version
+                self.last_error = f"Failed to load version {version}: {e}"
+                print(f"⚠️  {self.last_error}")
+                return False
+        print(f"🔄 Switched to model version {version}")
+        return True
+
+    def _write_active(self, version: str):
+        # Write-then-rename so readers never see a partial file
+        path = os.path.join(self.root, ACTIVE_FILE)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(version + '\n')
+        os.replace(tmp_path, path)
+
+    # --- Watcher ---
+
+    def start_watcher(self, interval: float = MODEL_WATCH_INTERVAL):
+        """Poll ACTIVE in a daemon thread (no-op if disabled or already running)"""
+        if interval <= 0 or (self._watcher and self._watcher.is_alive()):
+            return
+
+        def watch():
+            while not self._stop.wait(interval):
+                try:
+                    self.reload_if_changed()
+                except Exception as e:
+                    self.last_error = str(e)
+
+        self._stop.clear()
+        self._watcher = threading.Thread(target=watch, name='model-registry-watcher', daemon=True)
+        self._watcher.start()
+
+    def stop_watcher(self):
+        self._stop.set()
+
+    # --- Publishing ---
+
+    def publish(self, source_dir: str, version: Optional[str] = None) -> str:
+        """
+        Copy a training output directory into the registry as a new version
+
+        The copy is staged under a hidden name and renamed into place, so a
+        watcher never sees a half-copied version.
+
+        Returns:
+            The version name
+        """
+        version = version or datetime.now().strftime('%Y%m%d-%H%M%S')
+        target = self.version_dir(version)
+        if os.path.exists(target):
+            raise FileExistsError(f"Model version already exists: {version}")
+
+        staging = os.path.join(self.root, VERSIONS_DIR, f".{version}.staging")
+        shutil.rmtree(staging, ignore_errors=True)
+        shutil.copytree(source_dir, staging)
+        os.rename(staging, target)
+        return version
+
+    def status(self) -> Dict:
+        bundle = self._bundle
+        return {
+            'activeVersion': self.active_version(),
+            'loadedVersion': bundle['version'] if bundle else None,
+            'engine': bundle['engine'] if bundle else None,
+            'loadedAt': bundle['loadedAt'] if bundle else None,
+            'versions': self.list_versions(),
+            'lastError': self.last_error,
+        }
+
+# ============================================================================
+# SINGLETON
+# ============================================================================
+
+_registry = None
+
+def get_model_registry() -> ModelRegistry:
+    """Get or create the process-wide model registry"""
+    global _registry
+    if _registry is None:
+        _registry = ModelRegistry()
+    return _registry
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Manage recommender model versions')
+    parser.add_argument('--root', default=MODEL_REGISTRY_DIR, help='Registry directory')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('list', help='List versions')
+    publish_parser = commands.add_parser('publish', help='Add a training output directory as a version')
+    publish_parser.add_argument('source_dir')
+    publish_parser.add_argument('--version')
+    publish_parser.add_argument('--activate', action='store_true')
+    activate_parser = commands.add_parser('activate', help='Make a version live')
+    activate_parser.add_argument('version')
+    args = parser.parse_args()
+
+    registry = ModelRegistry(args.root)
+    if args.command == 'list':
+        active = registry.active_version()
+        for version in registry.list_versions() or [UNVERSIONED]:
+            print(f"{'*' if version == active else ' '} {version}")
+    elif args.command == 'publish':
+        version = registry.publish(args.source_dir, args.version)
+        print(f"📦 Published {args.source_dir} as {version}")
+        if args.activate:
+            registry.activate(version)
+    elif args.command == 'activate':
+        start = time.perf_counter()
+        registry.activate(args.version)
+        print(f"   loaded and validated in {time.perf_counter() - start:.2f}s")
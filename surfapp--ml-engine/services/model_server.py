@@ -11,7 +11,12 @@ from typing import List, Optional, Dict
 import uvicorn
 
 # Import the smart template system
-from smart_workout_templates import generate_3_plan_variations, GOAL_CATEGORIES
+from smart_workout_templates import (
+    generate_3_plan_variations, get_bmi_category, GOAL_CATEGORIES, CATALOG_VERSION
+)
+from plan_cache import get_plan_cache, make_cache_key
+from plan_retrieval import get_plan_index, plan_index_stats
+from fast_json import dumps, json_response
 
 app = FastAPI(title="SurfApp Cardio ML Engine", version="2.0")
 
@@ -46,6 +51,7 @@ class PredictionRequest(BaseModel):
     limitations: Optional[List[str]] = None
     equipment: Optional[str] = "None"  # None/Kettlebell/Gym
     adaptiveAdjustments: Optional[AdaptiveAdjustments] = None
+    mode: Optional[str] = "generate"  # generate (templates) / retrieve (nearest corpus plans)
 
 class WorkoutPlan(BaseModel):
     planName: str
@@ -60,6 +66,27 @@ class WorkoutPlan(BaseModel):
 class PredictionResponse(BaseModel):
     recommendedPlans: List[WorkoutPlan]
 
+def build_prediction_payload(plans: List[Dict]) -> Dict:
+    """
+    Shape generated plans exactly like PredictionResponse would serialize them,
+    so the body can be encoded once and returned without model validation
+    """
+    return {
+        'recommendedPlans': [
+            {
+                'planName': str(plan['planName']),
+                'exercises': str(plan['exercises']),
+                'durationMinutes': int(plan['durationMinutes']),
+                'skillLevel': str(plan['skillLevel']),
+                'goal': str(plan['goal']),
+                'equipment': str(plan['equipment']),
+                'focus': str(plan['focus']),
+                'bmiCategory': plan.get('bmiCategory', 'normal')
+            }
+            for plan in plans
+        ]
+    }
+
 # ============================================================================
 # GOAL MAPPING
 # ============================================================================
@@ -97,10 +124,13 @@ def map_frontend_goals_to_quiz_goal(goals: List[str]) -> str:
 # ============================================================================
 
 @app.post("/predict", response_model=PredictionResponse)
-async def predict(request: PredictionRequest):
+def predict(request: PredictionRequest):
     """
     Generate 3 personalized workout plan variations
     Uses ALL quiz data: skill, goal, duration, BMI, limitations, equipment
+
+    A plain def on purpose: FastAPI runs it in its threadpool, so the SQLite
+    cache lookups and plan generation never block the event loop.
     """
     
     try:
@@ -143,6 +173,49 @@ async def predict(request: PredictionRequest):
         print(f"   BMI: height={height_cm}cm, weight={weight_kg}kg")
         print(f"   Limitations: {limitations}")
         print(f"   Adaptive: {adaptive_adjustments}")
+        print(f"   Mode: {request.mode}")
+        
+        # Retrieval mode: nearest plans from the generated corpus, no solver or cache
+        if request.mode == 'retrieve':
+            try:
+                plans = get_plan_index().search(
+                    skill_level=skill_level,
+                    goal=goals[0] if goals else 'Endurance',
+                    duration_range=duration_range,
+                    equipment=equipment,
+                    limitations=limitations,
+                    height_cm=height_cm,
+                    weight_kg=weight_kg
+                )
+            except Exception as e:
+                print(f"⚠️ Plan retrieval unavailable ({e}), generating instead")
+                plans = None
+            
+            if plans:
+                print(f"\n🔎 Retrieved {len(plans)} corpus plans:")
+                for i, plan in enumerate(plans, 1):
+                    print(f"   {i}. {plan['planName']} ({plan['durationMinutes']} min, distance {plan['distance']})")
+                return json_response(dumps(build_prediction_payload(plans)))
+            if plans is not None:
+                print("⚠️ No corpus plan fits these constraints, generating instead")
+        
+        # Plans only depend on the BMI category, so key the cache on that
+        cache = get_plan_cache()
+        cache_key = make_cache_key({
+            'skillLevel': skill_level,
+            'goal': quiz_goal,
+            'durationRange': duration_range,
+            'equipment': equipment,
+            'limitations': sorted(set(limitations)),
+            'bmiCategory': get_bmi_category(height_cm, weight_kg),
+            'adaptive': adaptive_adjustments
+        }, CATALOG_VERSION)
+        body = cache.get_raw(cache_key) if cache else None
+        
+        if body is not None:
+            # Cached bodies are stored pre-encoded, so a hit is a straight byte copy
+            print(f"\n♻️ Serving cached plans ({cache_key[:12]})")
+            return json_response(body)
         
         # Generate 3 truly different plan variations
         plans = generate_3_plan_variations(
@@ -156,27 +229,17 @@ async def predict(request: PredictionRequest):
             adaptive_adjustments=adaptive_adjustments
         )
         
-        # Convert to response format
-        workout_plans = [
-            WorkoutPlan(
-                planName=plan['planName'],
-                exercises=plan['exercises'],
-                durationMinutes=plan['durationMinutes'],
-                skillLevel=plan['skillLevel'],
-                goal=plan['goal'],
-                equipment=plan['equipment'],
-                focus=plan['focus'],
-                bmiCategory=plan.get('bmiCategory', 'normal')
-            )
-            for plan in plans
-        ]
+        print(f"\n✅ Generated {len(plans)} unique plans:")
+        for i, plan in enumerate(plans, 1):
+            print(f"   {i}. {plan['planName']} ({plan['durationMinutes']} min, solved in {plan.get('solveTimeMs', 0)} ms)")
+            print(f"      {plan['exercises'][:100]}...")
         
-        print(f"\n✅ Generated {len(workout_plans)} unique plans:")
-        for i, plan in enumerate(workout_plans, 1):
-            print(f"   {i}. {plan.planName} ({plan.durationMinutes} min)")
-            print(f"      {plan.exercises[:100]}...")
+        # Encode once; the same bytes are returned now and on every cache hit
+        body = dumps(build_prediction_payload(plans))
+        if cache:
+            cache.put_raw(cache_key, body)
         
-        return PredictionResponse(recommendedPlans=workout_plans)
+        return json_response(body)
     
     except Exception as e:
         print(f"\n❌ Error generating plans: {str(e)}")
@@ -189,19 +252,25 @@ async def predict(request: PredictionRequest):
 # ============================================================================
 
 @app.get("/health")
-async def health_check():
+def health_check():
     """Health check endpoint"""
+    cache = get_plan_cache()
     return {
         "status": "healthy",
         "version": "2.0",
         "service": "cardio-ml-engine",
+        "catalogVersion": CATALOG_VERSION,
+        "planCache": cache.stats() if cache else {"enabled": False},
+        "planIndex": plan_index_stats(),
         "features": [
             "Smart template generation",
             "BMI-based adjustments",
             "Equipment filtering",
             "Limitation filtering",
             "Adaptive learning",
-            "3 unique plan variations"
+            "3 unique plan variations",
+            "Persistent plan cache",
+            "Corpus plan retrieval (mode=retrieve)"
         ]
     }
 
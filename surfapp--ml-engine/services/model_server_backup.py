@@ -1,22 +1,24 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-import joblib
+from contextlib import asynccontextmanager
+import hmac
 import os
-import json
-import csv
+import threading
 from datetime import datetime
-import pandas as pd
 import sys
 
 # Add training directory to path for workout_templates
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'training'))
 from workout_templates import generate_3_plan_variations, get_exercise_pool_by_goal
+from model_registry import get_model_registry
 
 
-BASE_DIR = os.path.dirname(__file__)
-MODEL_DIR = os.path.abspath(os.path.join(BASE_DIR, '..', 'models'))
-CSV_PATH = os.path.abspath(os.path.join(BASE_DIR, '..', 'data', 'cardio_plans_1000.csv'))
+# X-Admin-Token required on the model admin endpoints; they answer 403 while unset
+MODEL_ADMIN_TOKEN = os.environ.get('MODEL_ADMIN_TOKEN')
+
+# Load the active model version at startup (set MODEL_PRELOAD=0 to load on the first ML request)
+MODEL_PRELOAD = os.environ.get('MODEL_PRELOAD', '1') != '0'
 
 
 class AdaptiveAdjustments(BaseModel):
@@ -37,7 +39,22 @@ class PredictRequest(BaseModel):
     adaptiveAdjustments: dict = None  # Adaptive adjustments from user history
 
 
-app = FastAPI(title='Surf AI Model Server')
+def _load_model_in_background():
+    try:
+        bundle = get_model_registry().current()
+        print(f"✅ Model version {bundle['version']} loaded ({bundle['engine']})")
+    except Exception as e:
+        # Recorded by the registry and surfaced on /health as modelError
+        print(f"⚠️  Model load failed: {e}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load off the event loop so /health and template plans answer while the model loads
+    if MODEL_PRELOAD:
+        threading.Thread(target=_load_model_in_background, name='model-preload', daemon=True).start()
+    yield
+
+app = FastAPI(title='Surf AI Model Server', lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -49,49 +66,67 @@ app.add_middleware(
 )
 
 
-def load_safe(filename):
-    path = os.path.join(MODEL_DIR, filename)
-    if not os.path.exists(path):
-        raise FileNotFoundError(path)
-    return joblib.load(path)
+# Artifacts come from the model registry: the active version is loaded in a
+# background thread at startup (or on the first request that needs it), not at
+# import, so the server process starts without paying for joblib/scikit-learn
+def get_artifacts():
+    """
+    Current model bundle (thread-safe; swapped atomically on activation)
+    
+    Returns:
+        (artifacts dict or None, load error message or None)
+    """
+    try:
+        return get_model_registry().current(), None
+    except Exception as e:
+        # If loading fails, we still serve template plans but raise on ML requests
+        return None, str(e)
+
+
+class ActivateModelRequest(BaseModel):
+    version: str
 
 
-# Load artifacts once at startup
-try:
-    model = load_safe('recommender_model.joblib')
-    skill_encoder = load_safe('skill_encoder.joblib')
-    goal_encoder = load_safe('goal_encoder.joblib')
-    exercise_encoder = load_safe('exercise_encoder.joblib')
-    
-    # Load CSV data for structured plan details
-    plans_df = None
-    if os.path.exists(CSV_PATH):
-        try:
-            plans_df = pd.read_csv(CSV_PATH)
-        except Exception as e:
-            print(f"Warning: Could not load CSV data: {e}")
-except Exception as e:
-    # If startup fails, we still create the app but raise on requests
-    model = None
-    skill_encoder = None
-    goal_encoder = None
-    exercise_encoder = None
-    plans_df = None
-    startup_error = str(e)
-else:
-    startup_error = None
+def check_admin_token(token):
+    if not MODEL_ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail={"error": "Model admin endpoints are disabled (MODEL_ADMIN_TOKEN not set)"})
+    if not token or not hmac.compare_digest(token.encode(), MODEL_ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail={"error": "Invalid admin token"})
 
 
 @app.get('/health')
 def health():
-    return {"status": "ok", "modelLoaded": model is not None}
+    status = get_model_registry().status()
+    return {
+        "status": "ok",
+        "modelLoaded": status['loadedVersion'] is not None,
+        "modelVersion": status['loadedVersion'],
+        "activeModelVersion": status['activeVersion'],
+        "modelEngine": status['engine'],
+        "modelError": status['lastError'],
+    }
+
+
+@app.get('/admin/models')
+def list_models(x_admin_token: str = Header(None)):
+    check_admin_token(x_admin_token)
+    return get_model_registry().status()
+
+
+@app.post('/admin/models/activate')
+def activate_model(req: ActivateModelRequest, x_admin_token: str = Header(None)):
+    check_admin_token(x_admin_token)
+    try:
+        bundle = get_model_registry().activate(req.version)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail={"error": "Unknown model version", "details": str(e)})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail={"error": "Model activation failed", "details": str(e)})
+    return {"modelVersion": bundle['version'], "modelEngine": bundle['engine'], "loadedAt": bundle['loadedAt']}
 
 
 @app.post('/predict')
 def predict(req: PredictRequest):
-    if startup_error:
-        raise HTTPException(status_code=500, detail={"error": "Model server startup error", "details": startup_error})
-
     try:
         # Use template-based generation if durationRange is provided
         if req.durationRange:
@@ -148,6 +183,14 @@ def predict(req: PredictRequest):
             }
         
         # Fallback to ML model if durationRange not provided (backward compatibility)
+        artifacts, startup_error = get_artifacts()
+        if startup_error:
+            raise HTTPException(status_code=500, detail={"error": "Model server startup error", "details": startup_error})
+        model = artifacts['model']
+        skill_encoder = artifacts['skill_encoder']
+        goal_encoder = artifacts['goal_encoder']
+        exercise_encoder = artifacts['exercise_encoder']
+        
         skill_encoded = skill_encoder.transform([req.skillLevel])[0]
         primary_goal = req.goal[0] if isinstance(req.goal, list) and len(req.goal) > 0 else req.goal
         all_goals = req.goal if isinstance(req.goal, list) else [req.goal]
@@ -203,7 +246,9 @@ def predict(req: PredictRequest):
         return {
             "recommendedPlans": recommended_plans,
             "recommendedExercises": recommended,
-            "meta": {"modelVersion": "v1.0", "timestamp": datetime.utcnow().isoformat() + 'Z', "usedFeatures": len(features), "method": "ml-based"}
+            "meta": {"modelVersion": "v1.0", "artifactVersion": artifacts['version'], "timestamp": datetime.utcnow().isoformat() + 'Z', "usedFeatures": len(features), "method": "ml-based"}
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail={"error": "Prediction failed", "details": str(e)})
@@ -0,0 +1,246 @@
+# plan_cache.py
+"""
+Persistent Plan Cache
+SQLite-backed cache of generated workout plans, shared by every model server
+worker on the host and kept across restarts and deploys. Values are stored as
+pre-encoded JSON bytes so a hit can be returned without re-serializing.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from fast_json import dumps, loads
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+PLAN_CACHE_ENABLED = os.environ.get('PLAN_CACHE_ENABLED', '1') != '0'
+PLAN_CACHE_DIR = os.environ.get(
+    'PLAN_CACHE_DIR',
+    os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'cache'))
+)
+PLAN_CACHE_MAX_ENTRIES = int(os.environ.get('PLAN_CACHE_MAX_ENTRIES', 50000))
+
+MEMORY_CACHE_SIZE = 256          # Hot entries kept in-process in front of SQLite
+TOUCH_INTERVAL_SECONDS = 60      # Refresh last_access at most this often per entry
+EVICTION_CHECK_EVERY = 100       # Writes between size checks
+EVICTION_FRACTION = 0.1          # Share of entries dropped when over the limit
+CACHE_SCHEMA_VERSION = 2         # Bump when the layout of cached values changes
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS plans (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    created REAL NOT NULL,
+    last_access REAL NOT NULL
+)
+"""
+
+# ============================================================================
+# KEYING
+# ============================================================================
+
+def make_cache_key(params: Dict, catalog_version: str) -> str:
+    """
+    Stable digest of a normalized plan request
+
+    Args:
+        params: Generator inputs (JSON-serializable, already normalized)
+        catalog_version: Version of the exercise catalog the plans come from
+
+    Returns:
+        Hex digest usable as cache key
+    """
+    payload = json.dumps(
+        {'schema': CACHE_SCHEMA_VERSION, 'catalog': catalog_version, 'params': params},
+        sort_keys=True
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+# ============================================================================
+# CACHE
+# ============================================================================
+
+class PlanCache:
+    """
+    Two-level plan cache: a small in-process LRU in front of a SQLite file.
+
+    The database runs in WAL mode so readers in other workers never block on
+    a writer. Entries are evicted least-recently-used once the table grows
+    past max_entries. Any SQLite error disables the disk layer for this
+    process instead of failing the request.
+    """
+
+    def __init__(self, directory: str = PLAN_CACHE_DIR, max_entries: int = PLAN_CACHE_MAX_ENTRIES):
+        self.path = os.path.join(directory, 'plans.sqlite3')
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._connections = []  # Every thread's connection, for close()
+        self._connections_lock = threading.Lock()
+        self._memory = OrderedDict()
+        self._memory_lock = threading.Lock()
+        self._writes = 0
+        self._writes_lock = threading.Lock()  # put_raw runs on threadpool threads
+        self._entries = None  # Row count as of the last size check, for stats()
+        self._disabled = False
+
+        try:
+            os.makedirs(directory, exist_ok=True)
+            conn = self._connection()
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(_SCHEMA)
+            conn.execute('CREATE INDEX IF NOT EXISTS plans_last_access ON plans (last_access)')
+            conn.commit()
+            (self._entries,) = conn.execute('SELECT COUNT(*) FROM plans').fetchone()
+        except (OSError, sqlite3.Error) as e:
+            self._disable(e)
+
+    def _connection(self) -> sqlite3.Connection:
+        """
+        One connection per thread; sqlite3 connections must not be shared.
+        check_same_thread is off only so close() can close them all.
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False)
+            conn.execute('PRAGMA busy_timeout=5000')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def close(self):
+        """Close every thread's connection; the disk layer stays off afterwards"""
+        self._disabled = True
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+
+    def _disable(self, error: Exception):
+        print(f"⚠️ Plan cache disabled ({self.path}): {error}")
+        self._disabled = True
+
+    def _remember(self, key: str, value: bytes):
+        with self._memory_lock:
+            self._memory[key] = value
+            self._memory.move_to_end(key)
+            while len(self._memory) > MEMORY_CACHE_SIZE:
+                self._memory.popitem(last=False)
+
+    def get_raw(self, key: str) -> Optional[bytes]:
+        """Cached bytes for key, or None on a miss"""
+        with self._memory_lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+                return value
+
+        if self._disabled:
+            return None
+
+        try:
+            conn = self._connection()
+            row = conn.execute(
+                'SELECT value, last_access FROM plans WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            value, last_access = row
+            now = time.time()
+            if now - last_access > TOUCH_INTERVAL_SECONDS:
+                conn.execute('UPDATE plans SET last_access = ? WHERE key = ?', (now, key))
+                conn.commit()
+        except sqlite3.Error as e:
+            self._disable(e)
+            return None
+
+        value = bytes(value)
+        self._remember(key, value)
+        return value
+
+    def put_raw(self, key: str, value: bytes):
+        """Store bytes under key in memory and on disk"""
+        self._remember(key, value)
+        if self._disabled:
+            return
+
+        try:
+            conn = self._connection()
+            now = time.time()
+            conn.execute(
+                'INSERT OR REPLACE INTO plans (key, value, created, last_access) VALUES (?, ?, ?, ?)',
+                (key, sqlite3.Binary(value), now, now)
+            )
+            conn.commit()
+
+            with self._writes_lock:
+                self._writes += 1
+                check_size = self._writes % EVICTION_CHECK_EVERY == 0
+            if check_size:
+                self._evict(conn)
+        except sqlite3.Error as e:
+            self._disable(e)
+
+    def _evict(self, conn: sqlite3.Connection):
+        """Drop the least recently used entries once the table is over its limit"""
+        (count,) = conn.execute('SELECT COUNT(*) FROM plans').fetchone()
+        self._entries = count
+        if count <= self.max_entries:
+            return
+
+        excess = count - self.max_entries + int(self.max_entries * EVICTION_FRACTION)
+        deleted = conn.execute(
+            'DELETE FROM plans WHERE key IN '
+            '(SELECT key FROM plans ORDER BY last_access ASC LIMIT ?)',
+            (excess,)
+        ).rowcount
+        conn.commit()
+        self._entries = count - deleted
+
+    def get(self, key: str) -> Optional[List[Dict]]:
+        """Cached plans for key, or None on a miss"""
+        value = self.get_raw(key)
+        return loads(value) if value is not None else None
+
+    def put(self, key: str, plans: List[Dict]):
+        """Cache generated plans under key"""
+        self.put_raw(key, dumps(plans))
+
+    def stats(self) -> Dict:
+        """
+        Entry counts for health reporting, without touching the database
+
+        'entries' is the row count at startup or at the last eviction check
+        (every EVICTION_CHECK_EVERY writes), so it lags recent writes,
+        including those of other workers.
+        """
+        return {
+            'enabled': not self._disabled,
+            'path': self.path,
+            'entries': self._entries if not self._disabled else None,
+            'memoryEntries': len(self._memory),
+            'maxEntries': self.max_entries
+        }
+
+# Process-wide cache instance (None when disabled by configuration)
+_plan_cache = None
+
+def get_plan_cache() -> Optional[PlanCache]:
+    """Get or create the process-wide plan cache (singleton pattern)"""
+    global _plan_cache
+    if _plan_cache is None and PLAN_CACHE_ENABLED:
+        _plan_cache = PlanCache()
+    return _plan_cache
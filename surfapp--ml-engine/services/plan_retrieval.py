@@ -0,0 +1,318 @@
+# plan_retrieval.py
+"""
+Plan Retrieval
+Nearest-neighbour search over the generated plan corpus
+
+The corpus is encoded once into a weighted, normalized float32 feature
+matrix (skill, goal, equipment, duration, impact) plus per-plan hard
+constraints: the union of the exercises' limitation exclusions as a bitmask,
+the equipment the plan needs and the minimum skill of its hardest exercise.
+Plans naming an exercise the catalog does not know are left out of the
+index, since nothing can be said about their limitations, equipment or skill
+(their names are reported in stats()). A request becomes a query vector; rows that violate a constraint are
+dropped and the rest ranked by squared distance with argpartition.
+
+Rows are bucketed by goal and sorted by duration inside each bucket, so by
+default only a duration window around the target is scored (widened until
+enough allowed plans are inside). Pass exact=True to score the whole bucket.
+"""
+
+import csv
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from exercise_catalog import EQUIPMENT_LEVELS, IMPACT_LEVELS, SKILL_LEVELS
+from smart_workout_templates import EXERCISES_DB, get_bmi_category, get_duration_target
+
+BASE_DIR = os.path.dirname(__file__)
+DEFAULT_CORPUS_PATH = os.path.abspath(os.path.join(BASE_DIR, '..', 'training', 'cardio_plans_professional_2000.csv'))
+PLAN_CORPUS_PATH = os.environ.get('PLAN_CORPUS_PATH', DEFAULT_CORPUS_PATH)
+
+CORPUS_GOALS = ('Endurance', 'Power', 'Stamina', 'Fat Loss')
+
+# Relative importance of each feature in the distance
+FEATURE_WEIGHTS = {
+    'skill': 1.0,
+    'goal': 2.0,
+    'equipment': 0.5,
+    'duration': 1.5,
+    'impact': 1.0,
+}
+MAX_DURATION_MINUTES = 30  # Durations are scaled by this before weighting
+
+# Preferred mean exercise impact (0 = low .. 1 = very high) per BMI category
+BMI_IMPACT_TARGETS = {
+    'underweight': 0.33,
+    'normal': 0.5,
+    'overweight': 0.2,
+    'obese': 0.0,
+}
+
+DURATION_WINDOW_MINUTES = 3  # Initial half-width of the scored duration window
+MIN_CANDIDATES = 64          # Widen the window until this many rows pass the filters
+OVERFETCH = 8                # Nearest rows considered per requested plan, for de-duplication
+
+# ============================================================================
+# CORPUS ENCODING
+# ============================================================================
+
+def _read_corpus_rows(path: str):
+    """Yield (planName, skillLevel, goal, equipment, durationMinutes, exercises) from CSV or Parquet"""
+    columns = ['planName', 'skillLevel', 'goal', 'equipment', 'durationMinutes', 'exercises']
+
+    if path.endswith('.parquet'):
+        import pyarrow.compute as pc
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(columns=columns):
+            data = batch.to_pydict()
+            exercises = pc.binary_join(batch.column('exercises'), ';').to_pylist()
+            yield from zip(data['planName'], data['skillLevel'], data['goal'], data['equipment'],
+                           data['durationMinutes'], exercises)
+        return
+
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            yield tuple(row[c] for c in columns)
+
+def _exercise_profile(exercises: str):
+    """
+    (limitation mask, equipment level, minimum skill, mean impact 0-1) of a
+    ';'-joined plan, or None when it names an exercise missing from the
+    catalog (its constraints are unknown, so it must not be served)
+    """
+    names = exercises.split(';')
+    if not all(name in EXERCISES_DB.index for name in names):
+        return None
+    indices = np.array([EXERCISES_DB.index[name] for name in names])
+    mask = int(np.bitwise_or.reduce(EXERCISES_DB.exclude_mask[indices]))
+    impact = float(EXERCISES_DB.impact[indices].mean()) / (len(IMPACT_LEVELS) - 1)
+    return mask, int(EXERCISES_DB.equipment[indices].max()), int(EXERCISES_DB.skill_min[indices].max()), impact
+
+def _level(levels, value, default=0):
+    return levels.index(value) if value in levels else default
+
+class PlanIndex:
+    """Encoded plan corpus with bucketed top-k retrieval"""
+
+    def __init__(self, path: str = PLAN_CORPUS_PATH):
+        start = time.perf_counter()
+        self.path = path
+
+        plan_names, plan_name_codes = [], {}
+        texts, text_codes, profiles = [], {}, []
+        skill, goal, equipment, duration, name_code, text_code = [], [], [], [], [], []
+        unknown_texts = set()
+        self.skipped_plans = 0
+
+        for name, skill_level, plan_goal, plan_equipment, minutes, exercises in _read_corpus_rows(path):
+            if exercises in unknown_texts:
+                self.skipped_plans += 1
+                continue
+            if exercises not in text_codes:
+                profile = _exercise_profile(exercises)
+                if profile is None:
+                    unknown_texts.add(exercises)
+                    self.skipped_plans += 1
+                    continue
+                text_codes[exercises] = len(texts)
+                texts.append(exercises)
+                profiles.append(profile)
+            if name not in plan_name_codes:
+                plan_name_codes[name] = len(plan_names)
+                plan_names.append(name)
+
+            skill.append(_level(SKILL_LEVELS, skill_level))
+            goal.append(_level(CORPUS_GOALS, plan_goal, -1))
+            equipment.append(_level(EQUIPMENT_LEVELS, plan_equipment or 'None'))
+            duration.append(int(float(minutes)))
+            name_code.append(plan_name_codes[name])
+            text_code.append(text_codes[exercises])
+
+        self.unknown_exercises = sorted({
+            name for text in unknown_texts for name in text.split(';') if name not in EXERCISES_DB.index
+        })
+        if self.unknown_exercises:
+            print(f"⚠️ Plan index: skipped {self.skipped_plans} plans with exercises missing from the catalog: "
+                  f"{', '.join(self.unknown_exercises[:10])}")
+        if not text_code:
+            raise ValueError(f"Plan corpus {path} is empty")
+
+        self.plan_names = plan_names
+        self.texts = texts
+        self.name_code = np.array(name_code, dtype=np.int32)
+        self.text_code = np.array(text_code, dtype=np.int32)
+        self.skill = np.array(skill, dtype=np.int8)
+        self.goal = np.array(goal, dtype=np.int8)
+        self.equipment = np.array(equipment, dtype=np.int8)
+        self.duration = np.array(duration, dtype=np.int16)
+
+        # Hard constraints come from the exercises, looked up per distinct plan text
+        masks, plan_equipment, plan_skill, plan_impact = zip(*profiles)
+        self.exclude_mask = np.array(masks, dtype=np.uint64)[self.text_code]
+        self.required_equipment = np.maximum(np.array(plan_equipment, dtype=np.int8)[self.text_code], self.equipment)
+        self.required_skill = np.array(plan_skill, dtype=np.int8)[self.text_code]
+        impact = np.array(plan_impact, dtype=np.float32)[self.text_code]
+
+        self.features = self._encode(self.skill, self.goal, self.equipment, self.duration, impact)
+
+        # Goal buckets (None = every row), each sorted by duration for windowed search
+        by_duration = np.argsort(self.duration, kind='stable')
+        self.buckets = {None: by_duration}
+        for code in range(len(CORPUS_GOALS)):
+            rows = by_duration[self.goal[by_duration] == code]
+            if len(rows):
+                self.buckets[code] = rows
+
+        self.build_ms = round((time.perf_counter() - start) * 1000, 1)
+        print(f"📚 Plan index: {len(self)} plans ({len(texts)} distinct) from {os.path.basename(path)} in {self.build_ms} ms")
+
+    def __len__(self) -> int:
+        return len(self.text_code)
+
+    @staticmethod
+    def _encode(skill, goal, equipment, duration, impact) -> np.ndarray:
+        """Weighted feature rows; squared distance between rows is the weighted distance"""
+        def column(values, scale, feature):
+            values = np.atleast_1d(np.asarray(values, dtype=np.float32))
+            return (values / scale * np.float32(np.sqrt(FEATURE_WEIGHTS[feature])))[:, None]
+
+        goal_one_hot = np.atleast_1d(goal)[:, None] == np.arange(len(CORPUS_GOALS))
+        return np.hstack([
+            column(skill, len(SKILL_LEVELS) - 1, 'skill'),
+            column(goal_one_hot, 1, 'goal').reshape(len(goal_one_hot), -1),
+            column(equipment, len(EQUIPMENT_LEVELS) - 1, 'equipment'),
+            column(np.minimum(duration, MAX_DURATION_MINUTES), MAX_DURATION_MINUTES, 'duration'),
+            column(impact, 1, 'impact'),
+        ])
+
+    # ------------------------------------------------------------------------
+    # SEARCH
+    # ------------------------------------------------------------------------
+
+    def _allowed(self, rows: np.ndarray, limitation_mask, equipment_code: int, skill_code: int) -> np.ndarray:
+        """Rows the user can do: no excluded exercise, equipment and skill within reach"""
+        return rows[
+            ((self.exclude_mask[rows] & limitation_mask) == 0)
+            & (self.required_equipment[rows] <= equipment_code)
+            & (self.required_skill[rows] <= skill_code)
+        ]
+
+    def _window(self, rows: np.ndarray, target_minutes: float, *constraints) -> np.ndarray:
+        """
+        Allowed rows of a duration-sorted bucket nearest the target duration,
+        widening the window until MIN_CANDIDATES are found (or the bucket ends)
+        """
+        durations = self.duration[rows]
+        half_width = DURATION_WINDOW_MINUTES
+        while True:
+            lo = np.searchsorted(durations, target_minutes - half_width, side='left')
+            hi = np.searchsorted(durations, target_minutes + half_width, side='right')
+            allowed = self._allowed(rows[lo:hi], *constraints)
+            if len(allowed) >= MIN_CANDIDATES or (lo == 0 and hi == len(rows)):
+                return allowed
+            half_width *= 2
+
+    def search(
+        self,
+        skill_level: str,
+        goal: str,
+        duration_range: str,
+        equipment: str = 'None',
+        limitations: Optional[List[str]] = None,
+        height_cm: float = 0,
+        weight_kg: float = 0,
+        k: int = 3,
+        exact: bool = False
+    ) -> List[Dict]:
+        """
+        Find the k nearest distinct plans the user can safely do
+
+        Args:
+            skill_level: Beginner/Intermediate/Pro
+            goal: Corpus goal (Endurance/Power/Stamina/Fat Loss); others match any goal
+            duration_range: '5-10 minutes', '10-20 minutes' or '20+ minutes'
+            equipment: Equipment available to the user (None/Kettlebell/Gym)
+            limitations: Physical limitations; plans with an excluded exercise are dropped
+            height_cm, weight_kg: Used for the BMI category, which sets the preferred impact
+            k: Number of plans
+            exact: Score every allowed row in the goal bucket, not just the duration window
+
+        Returns:
+            Plans in the generator's format, nearest first
+        """
+        skill_code = _level(SKILL_LEVELS, skill_level)
+        goal_code = _level(CORPUS_GOALS, goal, -1)
+        equipment_code = _level(EQUIPMENT_LEVELS, equipment)
+        target_minutes = get_duration_target(duration_range) / 60
+        bmi_category = get_bmi_category(height_cm, weight_kg)
+        limitation_mask = np.uint64(EXERCISES_DB.limitation_mask(limitations or []))
+
+        # Goal bucket (all rows for other goals), minus plans the user cannot do
+        rows = self.buckets.get(goal_code, self.buckets[None])
+        constraints = (limitation_mask, equipment_code, skill_code)
+        rows = self._allowed(rows, *constraints) if exact else self._window(rows, target_minutes, *constraints)
+        if not len(rows):
+            return []
+
+        query = self._encode(skill_code, goal_code, equipment_code, target_minutes, BMI_IMPACT_TARGETS[bmi_category])[0]
+        distance = np.square(self.features[rows] - query).sum(axis=1)
+
+        # Nearest few times k (all rows tied at the cutoff, so ties resolve by
+        # row order), then the first k distinct exercise lists
+        nearest = min(len(rows), k * OVERFETCH)
+        cutoff = np.partition(distance, nearest - 1)[nearest - 1]
+        top = np.flatnonzero(distance <= cutoff)
+        top = top[np.lexsort((rows[top], distance[top]))]
+        _, first = np.unique(self.text_code[rows[top]], return_index=True)
+        chosen = top[np.sort(first)[:k]]
+
+        return [
+            {
+                'planName': self.plan_names[self.name_code[i]],
+                'exercises': self.texts[self.text_code[i]],
+                'durationMinutes': int(self.duration[i]),
+                'skillLevel': SKILL_LEVELS[self.skill[i]],
+                'goal': CORPUS_GOALS[self.goal[i]] if self.goal[i] >= 0 else goal,
+                'equipment': EQUIPMENT_LEVELS[self.equipment[i]],
+                'focus': CORPUS_GOALS[self.goal[i]] if self.goal[i] >= 0 else goal,
+                'bmiCategory': bmi_category,
+                'distance': round(float(d), 4),
+            }
+            for i, d in zip(rows[chosen], distance[chosen])
+        ]
+
+    def stats(self) -> Dict:
+        return {
+            'path': self.path,
+            'plans': len(self),
+            'distinctPlans': len(self.texts),
+            'skippedPlans': self.skipped_plans,
+            'unknownExercises': self.unknown_exercises,
+            'buildMs': self.build_ms,
+            'featureBytes': int(self.features.nbytes),
+        }
+
+# ============================================================================
+# SINGLETON
+# ============================================================================
+
+_plan_index = None
+_plan_index_lock = threading.Lock()
+
+def get_plan_index() -> PlanIndex:
+    """Get or build the process-wide plan index (built on first use)"""
+    global _plan_index
+    if _plan_index is None:
+        with _plan_index_lock:
+            if _plan_index is None:
+                _plan_index = PlanIndex()
+    return _plan_index
+
+def plan_index_stats() -> Dict:
+    """Index stats without building it"""
+    return _plan_index.stats() if _plan_index else {'loaded': False}
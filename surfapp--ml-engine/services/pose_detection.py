@@ -1,47 +1,187 @@
 """
 Pose Detection Service
 Extracts MediaPipe pose landmarks from images for React Native app
+
+cv2, mediapipe and PIL are imported inside the functions that use them, so
+importing this module (and starting the server) does not pay for them.
 """
 
-import cv2
-import mediapipe as mp
 import numpy as np
 import base64
+import math
+import os
 import time
+import queue
+import threading
+from contextlib import contextmanager
 from typing import Dict, List, Optional, Tuple
 from io import BytesIO
-from PIL import Image
-
-# Initialize MediaPipe Pose (reusable instance)
-mp_pose = mp.solutions.pose
-mp_drawing = mp.solutions.drawing_utils
 
 # Configuration - Optimized for maximum detection sensitivity
 DETECTION_CONFIDENCE = 0.2  # Very low threshold for maximum sensitivity
 TRACKING_CONFIDENCE = 0.2   # Very low threshold for better tracking
 
-# Global pose detector instance (reused for performance)
-_pose_detector = None
+# Model tier and pool size are deployment settings
+POSE_MODEL_COMPLEXITY = int(os.environ.get('POSE_MODEL_COMPLEXITY', 2))  # 2 = maximum accuracy
+POSE_DETECTOR_POOL_SIZE = max(1, int(os.environ.get('POSE_DETECTOR_POOL_SIZE', 1)))
+WARMUP_INFERENCES = 2        # Dummy frames run through each detector before serving
+WARMUP_FRAME_SIZE = (256, 256)
+MODEL_TIERS = {0: 'lite', 1: 'full', 2: 'heavy'}
+
+# Pool of reusable detectors, checked out by one request at a time (MediaPipe
+# graphs are stateful in video mode and must not be shared between threads)
+_detector_pool = queue.Queue()
+_pool_lock = threading.Lock()
+_pool_state = {
+    'created': 0,      # Detectors built so far (never more than the pool size)
+    'waiting': 0,      # Requests queued for a free detector
+    'inFlight': 0,     # Requests currently running inference
+    'warm': set(),     # ids of detectors that have completed an inference
+    'warmupSeconds': None,
+    'warmupError': None
+}
 
 # Phase 5: Previous frame data for velocity tracking (stored per session)
 _previous_frame_data = {}
 
-def get_pose_detector():
-    """Get or create MediaPipe pose detector instance (singleton pattern)"""
-    global _pose_detector
-    if _pose_detector is None:
-        _pose_detector = mp_pose.Pose(
-            min_detection_confidence=DETECTION_CONFIDENCE,
-            min_tracking_confidence=TRACKING_CONFIDENCE,
-            model_complexity=2,  # Maximum accuracy (handles occlusions better)
-            static_image_mode=False,  # Video stream mode for better performance
-            enable_segmentation=False,  # Disable for performance
-            smooth_landmarks=True,  # Enable smoothing for stable tracking
-        )
-    return _pose_detector
+# Temporal stability: rolling window of hip/shoulder centres per session
+TEMPORAL_STABILITY_WINDOW = max(2, int(os.environ.get('TEMPORAL_STABILITY_WINDOW', 15)))  # Frames
+TEMPORAL_STABILITY_MIN_FRAMES = 3      # Frames in the window before a score is reported
+TEMPORAL_STABILITY_SCALE = 0.02        # Centre jitter (normalized units) that scores 1/e
+TEMPORAL_STABILITY_RESET_SECONDS = 2.0 # A gap this long between frames starts a new window
+TEMPORAL_STABILITY_MAX_SESSIONS = 1000
+_temporal_stability = {}               # session id -> TemporalStability, oldest first
+_temporal_lock = threading.Lock()
+
+def create_pose_detector():
+    """Build a new MediaPipe pose detector with the configured settings"""
+    import mediapipe as mp
+    
+    return mp.solutions.pose.Pose(
+        min_detection_confidence=DETECTION_CONFIDENCE,
+        min_tracking_confidence=TRACKING_CONFIDENCE,
+        model_complexity=POSE_MODEL_COMPLEXITY,  # Higher handles occlusions better
+        static_image_mode=False,  # Video stream mode for better performance
+        enable_segmentation=False,  # Disable for performance
+        smooth_landmarks=True,  # Enable smoothing for stable tracking
+    )
+
+def _create_pooled_detector():
+    """Build one more pool detector, or return None when the pool is already full"""
+    with _pool_lock:
+        if _pool_state['created'] >= POSE_DETECTOR_POOL_SIZE:
+            return None
+        _pool_state['created'] += 1
+    try:
+        return create_pose_detector()
+    except Exception:
+        with _pool_lock:
+            _pool_state['created'] -= 1
+        raise
+
+def _discard_pooled_detector(detector):
+    """Drop a detector that failed outside a request, freeing its pool slot"""
+    with _pool_lock:
+        _pool_state['created'] -= 1
+    try:
+        detector.close()
+    except Exception:
+        pass
+
+def _mark_warm(detector):
+    with _pool_lock:
+        _pool_state['warm'].add(id(detector))
+
+@contextmanager
+def acquire_pose_detector():
+    """
+    Check out a pooled detector for one inference
+    
+    Detectors are built lazily up to POSE_DETECTOR_POOL_SIZE; once all exist,
+    callers wait for one to be returned. Waiting and running requests are
+    counted for the readiness probe.
+    """
+    with _pool_lock:
+        _pool_state['waiting'] += 1
+    try:
+        try:
+            detector = _detector_pool.get_nowait()
+        except queue.Empty:
+            detector = _create_pooled_detector() or _detector_pool.get()
+    finally:
+        with _pool_lock:
+            _pool_state['waiting'] -= 1
+    
+    with _pool_lock:
+        _pool_state['inFlight'] += 1
+    try:
+        yield detector
+        _mark_warm(detector)
+    finally:
+        with _pool_lock:
+            _pool_state['inFlight'] -= 1
+        _detector_pool.put(detector)
+
+def warmup_detectors() -> float:
+    """
+    Build every pooled detector and run dummy inferences through it
+    
+    Graph construction and model loading happen here instead of inside the
+    first real requests. Safe to call from a background thread while the
+    server is already accepting requests.
+    
+    Returns:
+        Seconds spent warming up
+    """
+    start = time.perf_counter()
+    dummy_frame = np.zeros((*WARMUP_FRAME_SIZE, 3), dtype=np.uint8)
+    
+    try:
+        detector = _create_pooled_detector()
+        while detector is not None:
+            try:
+                for _ in range(WARMUP_INFERENCES):
+                    detector.process(dummy_frame)
+            except Exception:
+                # Never leave a slot counted without a detector in the pool,
+                # or acquire_pose_detector would wait for it forever
+                _discard_pooled_detector(detector)
+                raise
+            _mark_warm(detector)
+            _detector_pool.put(detector)
+            detector = _create_pooled_detector()
+    except Exception as e:
+        with _pool_lock:
+            _pool_state['warmupError'] = str(e)
+        print(f"❌ Pose detector warm-up failed: {e}")
+        raise
+    
+    elapsed = time.perf_counter() - start
+    with _pool_lock:
+        _pool_state['warmupSeconds'] = round(elapsed, 3)
+    return elapsed
+
+def get_readiness() -> Dict:
+    """Snapshot of detector pool state for the readiness probe"""
+    with _pool_lock:
+        warm = len(_pool_state['warm'])
+        return {
+            'ready': warm >= POSE_DETECTOR_POOL_SIZE,
+            'warmDetectors': warm,
+            'poolSize': POSE_DETECTOR_POOL_SIZE,
+            'queueDepth': _pool_state['waiting'],
+            'inFlight': _pool_state['inFlight'],
+            'modelComplexity': POSE_MODEL_COMPLEXITY,
+            'modelTier': MODEL_TIERS.get(POSE_MODEL_COMPLEXITY, 'custom'),
+            'warmupSeconds': _pool_state['warmupSeconds'],
+            'error': _pool_state['warmupError']
+        }
 
 def base64_to_image(base64_string: str) -> np.ndarray:
     """Convert base64 string to OpenCV image"""
+    import cv2
+    from PIL import Image
+    
     try:
         # Remove data URL prefix if present
         if ',' in base64_string:
@@ -67,6 +207,28 @@ def base64_to_image(base64_string: str) -> np.ndarray:
     except Exception as e:
         raise ValueError(f"Failed to decode base64 image: {str(e)}")
 
+# MediaPipe PoseLandmark indices for the landmarks the app uses
+# (fixed by the 33-point BlazePose topology, so no mediapipe import is needed)
+LANDMARK_INDICES = {
+    'nose': 0,            # NOSE
+    'leftEye': 1,         # LEFT_EYE_INNER
+    'rightEye': 4,        # RIGHT_EYE_INNER
+    'leftEar': 7,
+    'rightEar': 8,
+    'leftShoulder': 11,
+    'rightShoulder': 12,
+    'leftElbow': 13,
+    'rightElbow': 14,
+    'leftWrist': 15,
+    'rightWrist': 16,
+    'leftHip': 23,
+    'rightHip': 24,
+    'leftKnee': 25,
+    'rightKnee': 26,
+    'leftAnkle': 27,
+    'rightAnkle': 28,
+}
+
 def extract_landmarks(landmarks) -> Dict:
     """
     Extract MediaPipe landmarks and convert to JSON-serializable format
@@ -75,32 +237,11 @@ def extract_landmarks(landmarks) -> Dict:
     if not landmarks:
         return None
     
-    # Map MediaPipe landmarks to our format
-    landmark_map = {
-        'nose': mp_pose.PoseLandmark.NOSE,
-        'leftEye': mp_pose.PoseLandmark.LEFT_EYE_INNER,
-        'rightEye': mp_pose.PoseLandmark.RIGHT_EYE_INNER,
-        'leftEar': mp_pose.PoseLandmark.LEFT_EAR,
-        'rightEar': mp_pose.PoseLandmark.RIGHT_EAR,
-        'leftShoulder': mp_pose.PoseLandmark.LEFT_SHOULDER,
-        'rightShoulder': mp_pose.PoseLandmark.RIGHT_SHOULDER,
-        'leftElbow': mp_pose.PoseLandmark.LEFT_ELBOW,
-        'rightElbow': mp_pose.PoseLandmark.RIGHT_ELBOW,
-        'leftWrist': mp_pose.PoseLandmark.LEFT_WRIST,
-        'rightWrist': mp_pose.PoseLandmark.RIGHT_WRIST,
-        'leftHip': mp_pose.PoseLandmark.LEFT_HIP,
-        'rightHip': mp_pose.PoseLandmark.RIGHT_HIP,
-        'leftKnee': mp_pose.PoseLandmark.LEFT_KNEE,
-        'rightKnee': mp_pose.PoseLandmark.RIGHT_KNEE,
-        'leftAnkle': mp_pose.PoseLandmark.LEFT_ANKLE,
-        'rightAnkle': mp_pose.PoseLandmark.RIGHT_ANKLE,
-    }
-    
     result = {}
     
-    for key, landmark_enum in landmark_map.items():
+    for key, landmark_index in LANDMARK_INDICES.items():
         try:
-            lm = landmarks.landmark[landmark_enum.value]
+            lm = landmarks.landmark[landmark_index]
             # Always return coordinates, even if visibility is low
             # Don't filter by visibility here - let frontend decide
             result[key] = {
@@ -346,11 +487,110 @@ def calculate_stability_score(landmarks: Dict) -> float:
     # Clamp to [0, 1]
     return float(np.clip(stability_score, 0.0, 1.0))
 
+class TemporalStability:
+    """
+    Steadiness over time: how much the hip and shoulder centres move over the
+    last TEMPORAL_STABILITY_WINDOW frames
+
+    Keeps a ring buffer of the two centres with a running mean and sum of
+    squared deviations (Welford's update, with the matching downdate for the
+    sample leaving the window), so each frame costs O(1) regardless of the
+    window length.
+    """
+
+    DIMENSIONS = 4  # hip x, hip y, shoulder x, shoulder y
+
+    def __init__(self, window: int = TEMPORAL_STABILITY_WINDOW):
+        self.window = window
+        self.reset()
+
+    def reset(self):
+        self.buffer = [None] * self.window
+        self.next = 0   # Slot for the next sample; holds the oldest once the window is full
+        self.count = 0
+        self.mean = [0.0] * self.DIMENSIONS
+        self.m2 = [0.0] * self.DIMENSIONS
+        self.last_time = None
+
+    def _add(self, sample):
+        self.count += 1
+        for i, x in enumerate(sample):
+            delta = x - self.mean[i]
+            self.mean[i] += delta / self.count
+            self.m2[i] += delta * (x - self.mean[i])
+
+    def _remove(self, sample):
+        self.count -= 1
+        if self.count == 0:
+            self.mean = [0.0] * self.DIMENSIONS
+            self.m2 = [0.0] * self.DIMENSIONS
+            return
+        for i, x in enumerate(sample):
+            delta = x - self.mean[i]
+            self.mean[i] -= delta / self.count
+            self.m2[i] = max(0.0, self.m2[i] - delta * (x - self.mean[i]))
+
+    def update(self, landmarks: Dict, now: float = None) -> Optional[float]:
+        """
+        Add a frame and return the score
+
+        Returns:
+            0.0 to 1.0 (1.0 = centres not moving), or None until the window
+            has TEMPORAL_STABILITY_MIN_FRAMES frames with hips and shoulders
+        """
+        now = time.time() if now is None else now
+        if self.last_time is not None and now - self.last_time > TEMPORAL_STABILITY_RESET_SECONDS:
+            self.reset()
+        self.last_time = now
+
+        points = [landmarks.get(key) if landmarks else None
+                  for key in ('leftHip', 'rightHip', 'leftShoulder', 'rightShoulder')]
+        if all(points):
+            l_hip, r_hip, l_shoulder, r_shoulder = points
+            sample = ((l_hip['x'] + r_hip['x']) / 2, (l_hip['y'] + r_hip['y']) / 2,
+                      (l_shoulder['x'] + r_shoulder['x']) / 2, (l_shoulder['y'] + r_shoulder['y']) / 2)
+            if self.count == self.window:
+                self._remove(self.buffer[self.next])
+            self.buffer[self.next] = sample
+            self.next = (self.next + 1) % self.window
+            self._add(sample)
+        return self.score()
+
+    def score(self) -> Optional[float]:
+        if self.count < TEMPORAL_STABILITY_MIN_FRAMES:
+            return None
+        # RMS distance of each centre from its window mean, averaged over the two centres
+        hip_jitter = math.sqrt((self.m2[0] + self.m2[1]) / self.count)
+        shoulder_jitter = math.sqrt((self.m2[2] + self.m2[3]) / self.count)
+        return math.exp(-(hip_jitter + shoulder_jitter) / 2 / TEMPORAL_STABILITY_SCALE)
+
+def update_temporal_stability(session_id: Optional[str], landmarks: Optional[Dict]) -> Optional[float]:
+    """Temporal stability score for a session's latest frame (None without a session)"""
+    if not session_id:
+        return None
+    with _temporal_lock:
+        tracker = _temporal_stability.pop(session_id, None)
+        if tracker is None:
+            tracker = TemporalStability()
+            if len(_temporal_stability) >= TEMPORAL_STABILITY_MAX_SESSIONS:
+                del _temporal_stability[next(iter(_temporal_stability))]  # Least recently seen
+        _temporal_stability[session_id] = tracker
+        return tracker.update(landmarks)
+
+def reset_pose_session(session_id: str) -> bool:
+    """Forget a session's velocity history and temporal stability window; returns whether either existed"""
+    had_previous = _previous_frame_data.pop(session_id, None) is not None
+    with _temporal_lock:
+        had_tracker = _temporal_stability.pop(session_id, None) is not None
+    return had_previous or had_tracker
+
 def assess_lighting(image: np.ndarray) -> str:
     """
     Phase 5: Assess lighting conditions from image
     Returns: 'good' | 'poor' | 'too_bright' | 'too_dark'
     """
+    import cv2
+    
     # Convert to grayscale
     gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
     
@@ -461,6 +701,8 @@ def detect_pose_from_base64(base64_image: str, session_id: str = None) -> Dict:
     Main function: Detect pose from base64 encoded image
     Returns landmarks in format compatible with React Native app
     """
+    import cv2
+    
     try:
         # Convert base64 to image
         image = base64_to_image(base64_image)
@@ -472,11 +714,9 @@ def detect_pose_from_base64(base64_image: str, session_id: str = None) -> Dict:
         # Convert BGR to RGB for MediaPipe
         image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
         
-        # Get pose detector
-        pose = get_pose_detector()
-        
-        # Process image
-        results = pose.process(image_rgb)
+        # Process image on a pooled detector
+        with acquire_pose_detector() as pose:
+            results = pose.process(image_rgb)
         
         # Extract landmarks if MediaPipe detected anything
         if results.pose_landmarks:
@@ -530,12 +770,14 @@ def detect_pose_from_base64(base64_image: str, session_id: str = None) -> Dict:
             
             if person_detected:
                 stability_score = calculate_stability_score(landmarks)
+                temporal_stability = update_temporal_stability(session_id, landmarks)
                 return {
                     'success': True,
                     'personDetected': True,
                     'landmarks': landmarks,  # Always return landmarks if they exist
                     'confidence': 0.9,
                     'stability_score': stability_score,
+                    'temporalStability': temporal_stability,  # Steadiness over recent frames
                     'landmark_count': valid_landmarks,
                     'boundingBox': bounding_box,
                     'detectionQuality': detection_quality,
@@ -610,6 +852,8 @@ def detect_pose_from_image(image: np.ndarray) -> Dict:
     """
     Detect pose from OpenCV image (numpy array)
     """
+    import cv2
+    
     try:
         # Convert BGR to RGB for MediaPipe
         if len(image.shape) == 3 and image.shape[2] == 3:
@@ -617,11 +861,9 @@ def detect_pose_from_image(image: np.ndarray) -> Dict:
         else:
             image_rgb = image
         
-        # Get pose detector
-        pose = get_pose_detector()
-        
-        # Process image
-        results = pose.process(image_rgb)
+        # Process image on a pooled detector
+        with acquire_pose_detector() as pose:
+            results = pose.process(image_rgb)
         
         # Extract landmarks if MediaPipe detected anything
         if results.pose_landmarks:
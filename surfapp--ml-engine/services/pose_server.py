@@ -7,11 +7,37 @@ from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import Optional
+from contextlib import asynccontextmanager
+import os
+import threading
 import uvicorn
 
-from pose_detection import detect_pose_from_base64
+from pose_detection import detect_pose_from_base64, warmup_detectors, get_readiness, reset_pose_session
+from drill_engine import analyze_drill_frame, reset_drill_session
+from landmark_recorder import get_landmark_recorder
+from fast_json import dumps, json_response
 
-app = FastAPI(title='Surf AI Pose Detection Server')
+# Build and warm the detectors at startup (set POSE_PREWARM=0 to build lazily)
+POSE_PREWARM = os.environ.get('POSE_PREWARM', '1') != '0'
+
+def _warmup_in_background():
+    try:
+        elapsed = warmup_detectors()
+        print(f"✅ Pose detectors warm in {elapsed:.2f}s")
+    except Exception:
+        pass  # Reported by warmup_detectors and surfaced on /ready
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm up off the event loop so /health answers while models load
+    if POSE_PREWARM:
+        threading.Thread(target=_warmup_in_background, name='pose-warmup', daemon=True).start()
+    yield
+    recorder = get_landmark_recorder()
+    if recorder:
+        recorder.close()  # Write out buffered frames
+
+app = FastAPI(title='Surf AI Pose Detection Server', lifespan=lifespan)
 
 # CORS middleware
 app.add_middleware(
@@ -24,8 +50,8 @@ app.add_middleware(
 
 class PoseDetectionRequest(BaseModel):
     image: str  # Base64 encoded image
-    drillId: Optional[str] = None  # Optional drill ID for context
-    sessionId: Optional[str] = None  # Optional session ID for velocity tracking
+    drillId: Optional[str] = None  # Optional drill ID: adds drill feedback to the response
+    sessionId: Optional[str] = None  # Optional session ID for velocity tracking and drill progress
 
 class PoseDetectionResponse(BaseModel):
     success: bool
@@ -33,6 +59,7 @@ class PoseDetectionResponse(BaseModel):
     landmarks: Optional[dict] = None
     confidence: float
     stability_score: float = 0.0  # 0.0 to 1.0, based on landmark variance
+    temporalStability: Optional[float] = None  # 0.0 to 1.0, hip/shoulder steadiness over recent frames of the session
     error: Optional[str] = None
     # Phase 1.1 & 5: Enhanced detection data
     boundingBox: Optional[dict] = None
@@ -44,6 +71,22 @@ class PoseDetectionResponse(BaseModel):
     estimatedDistance: str = 'optimal'
     velocity: Optional[dict] = None
     landmark_count: int = 0
+    drill: Optional[dict] = None  # Drill feedback, metrics, stage and rep count when drillId is set
+
+# Field order and defaults of PoseDetectionResponse, read once at import
+_RESPONSE_FIELDS = list(PoseDetectionResponse.model_fields)
+_RESPONSE_DEFAULTS = {
+    name: field.default
+    for name, field in PoseDetectionResponse.model_fields.items()
+    if not field.is_required()
+}
+
+def build_detection_payload(result: dict) -> dict:
+    """
+    Shape a detection result like PoseDetectionResponse: declared fields only,
+    in declaration order, with model defaults for anything missing
+    """
+    return {name: result.get(name, _RESPONSE_DEFAULTS.get(name)) for name in _RESPONSE_FIELDS}
 
 @app.get('/health')
 def health():
@@ -54,6 +97,17 @@ def health():
         "model": "MediaPipe Pose"
     }
 
+@app.get('/ready')
+def ready():
+    """
+    Readiness probe: 200 once every pooled detector is warm, 503 until then
+    
+    Reports warm detector count, requests waiting for a detector and the
+    model tier so orchestrators only route traffic to warm instances.
+    """
+    readiness = get_readiness()
+    return json_response(dumps(readiness), status_code=200 if readiness['ready'] else 503)
+
 @app.post('/detect', response_model=PoseDetectionResponse)
 def detect_pose(request: PoseDetectionRequest):
     """
@@ -72,7 +126,23 @@ def detect_pose(request: PoseDetectionRequest):
         # Detect pose (pass session_id for velocity tracking)
         result = detect_pose_from_base64(request.image, session_id=request.sessionId)
         
-        return PoseDetectionResponse(**result)
+        # Coach the drill on the server so clients don't run kinematics per frame
+        if request.drillId:
+            landmarks = result.get('landmarks') if result.get('personDetected') else None
+            result['drill'] = analyze_drill_frame(request.drillId, landmarks, session_id=request.sessionId)
+        
+        # Optional session recording (POSE_RECORDING_DIR)
+        recorder = get_landmark_recorder()
+        if recorder and request.sessionId:
+            try:
+                rep_count = result['drill']['repCount'] if result.get('drill') else -1
+                recorder.record(request.sessionId, result, rep_count=rep_count)
+            except OSError as e:
+                print(f"⚠️  Landmark recording failed: {e}")
+        
+        # Detection results are plain dicts built by our own code, so encode them
+        # directly instead of validating through the pydantic model again
+        return json_response(dumps(build_detection_payload(result)))
         
     except Exception as e:
         raise HTTPException(
@@ -80,6 +150,25 @@ def detect_pose(request: PoseDetectionRequest):
             detail=f"Pose detection failed: {str(e)}"
         )
 
+@app.delete('/drill-sessions/{session_id}')
+def reset_drill(session_id: str):
+    """
+    Restart a session: drill progress (stage and rep count), velocity history
+    and temporal stability window are dropped, and an open landmark recording
+    is flushed and closed (later frames append to the same file)
+    """
+    drill = reset_drill_session(session_id)
+    pose = reset_pose_session(session_id)
+    recorder = get_landmark_recorder()
+    recording = recorder.close_session(session_id) if recorder else False
+    return {
+        "sessionId": session_id,
+        "reset": drill or pose or recording,
+        "drillReset": drill,
+        "poseReset": pose,
+        "recordingClosed": recording,
+    }
+
 if __name__ == "__main__":
     uvicorn.run(
         "pose_server:app",
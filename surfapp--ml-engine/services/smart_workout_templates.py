@@ -5,14 +5,26 @@ Generates truly personalized, diverse workout plans using ALL quiz data
 """
 
 import random
+import functools
+import operator
 import math
+import time
+import zlib
+import json
+import hashlib
 from typing import List, Dict, Tuple, Optional
 
+import numpy as np
+
+from exercise_catalog import ExerciseCatalog
+
 # ============================================================================
 # EXERCISE DATABASE WITH FULL METADATA
 # ============================================================================
 
-EXERCISES_DB = {
+# Stored column-wise with integer-coded enums; EXERCISES_DB[name] returns a
+# read-only record that supports the same item access as a dict
+EXERCISES_DB = ExerciseCatalog({
     # WARM-UP EXERCISES
     'Jumping Jacks': {
         'category': 'warmup', 'duration': 60, 'sets': 2, 'rest': 15,
@@ -268,7 +280,7 @@ EXERCISES_DB = {
         'exclude_limitations': ['Knee discomfort', 'Ankle injury', 'Calf strain'],
         'skill_min': 'Beginner', 'impact': 'high'
     }
-}
+})
 
 # ============================================================================
 # GOAL-TO-CATEGORY MAPPING
@@ -307,6 +319,54 @@ GOAL_CATEGORIES = {
     }
 }
 
+# ============================================================================
+# DURATION OPTIMIZER SETTINGS
+# ============================================================================
+
+DURATION_TOLERANCE = 0.10        # Accept plans within ±10% of the target duration
+OPTIMIZER_TIME_BUDGET_MS = 20    # Hard per-call budget for the selection solver
+OPTIMIZER_QUANTUM_SECONDS = 5    # Durations closer than this are treated as equal states
+MAX_MAIN_EXERCISES = 6           # Upper bound on main-block exercises per plan
+MAX_SECONDARY_EXERCISES = 2      # Keep secondary categories a minority of the plan
+
+# ============================================================================
+# VARIATION SETTINGS
+# ============================================================================
+
+SECONDARY_INCLUDE_RATE = 0.3     # Chance a secondary exercise is ranked alongside primary ones
+INTENSITY_WEIGHT = 0.5           # Rank penalty per unit of intensity distance from the variation target
+DIVERSITY_WEIGHT = 1.0           # Rank penalty for exercises already used by an earlier variation
+OPTIMIZER_CANDIDATES = 10        # Best-ranked exercises the optimizer tries before the full pool
+
+# Bump whenever the selection or ranking code changes the plans a request gets,
+# so cached plans from the previous algorithm are not served
+GENERATOR_VERSION = 2
+
+# Where in the pool's intensity range each variation should sit (0 = easiest, 1 = hardest)
+VARIATION_INTENSITY_TARGETS = {
+    'balanced': 0.5,
+    'intensity': 1.0,
+    'endurance': 0.0
+}
+
+VARIATION_SUFFIXES = {
+    'balanced': 'Optimized',
+    'intensity': 'High Intensity',
+    'endurance': 'Endurance Focus'
+}
+
+# Digest of everything that shapes a generated plan. Persistent caches key on
+# it so a catalog, tuning or algorithm change never serves plans built by the
+# old code.
+CATALOG_VERSION = hashlib.sha256(json.dumps({
+    'generator': GENERATOR_VERSION,
+    'exercises': EXERCISES_DB.to_dict(),
+    'goals': GOAL_CATEGORIES,
+    'optimizer': [DURATION_TOLERANCE, OPTIMIZER_QUANTUM_SECONDS, MAX_MAIN_EXERCISES, MAX_SECONDARY_EXERCISES],
+    'variations': [SECONDARY_INCLUDE_RATE, INTENSITY_WEIGHT, DIVERSITY_WEIGHT, OPTIMIZER_CANDIDATES,
+                   VARIATION_INTENSITY_TARGETS]
+}, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
 # ============================================================================
 # HELPER FUNCTIONS
 # ============================================================================
@@ -337,42 +397,220 @@ def get_duration_target(duration_range: str) -> int:
     return mapping.get(duration_range, 900)
 
 def filter_exercises(
-    exercises_db: Dict,
+    exercises_db: ExerciseCatalog,
     skill_level: str,
     equipment: str,
     limitations: List[str],
     categories: List[str]
 ) -> List[Tuple[str, Dict]]:
     """Filter exercises based on user constraints"""
+    indices = exercises_db.filter(skill_level, equipment, limitations, categories)
+    return [(exercises_db.names[i], exercises_db.record(i)) for i in indices]
+
+def get_plan_modifiers(
+    goal_config: Dict,
+    bmi_category: str,
+    adaptive_adjustments: Dict,
+    variation_type: str
+) -> Tuple[float, int]:
+    """Calculate rest multiplier and sets adjustment from goal, BMI, adaptive learning and variation"""
+    rest_multiplier = goal_config['rest_multiplier']
+    sets_adjustment = adaptive_adjustments.get('setsAdjustment', 0)
+    intensity_adjustment = adaptive_adjustments.get('restMultiplierAdjustment', 0)
     
-    skill_order = ['Beginner', 'Intermediate', 'Pro']
-    user_skill_index = skill_order.index(skill_level)
+    # BMI adjustments
+    if bmi_category == 'overweight' or bmi_category == 'obese':
+        rest_multiplier *= 1.3
+    elif bmi_category == 'underweight':
+        rest_multiplier *= 1.1
     
-    filtered = []
+    # Apply adaptive adjustments
+    rest_multiplier *= (1 + intensity_adjustment)
     
-    for ex_name, ex_data in exercises_db.items():
-        # Check skill level
-        ex_skill_index = skill_order.index(ex_data['skill_min'])
-        if ex_skill_index > user_skill_index:
-            continue
+    # Variation type adjustments
+    if variation_type == 'intensity':
+        rest_multiplier *= 0.8
+        sets_adjustment += 1
+    elif variation_type == 'endurance':
+        rest_multiplier *= 1.2
+        sets_adjustment -= 1
+    
+    return rest_multiplier, sets_adjustment
+
+def get_exercise_pool_indices(
+    skill_level: str,
+    equipment: str,
+    limitations: List[str],
+    goal_config: Dict
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Catalog indices of the warm-up, primary and secondary pools available to the user"""
+    all_categories = goal_config['primary'] + goal_config['secondary']
+    available = EXERCISES_DB.filter(skill_level, equipment, limitations, all_categories)
+    
+    if not len(available):
+        # Fallback to basic exercises
+        available = EXERCISES_DB.filter('Beginner', 'None', [], ['warmup', 'endurance'])
+    
+    secondary_categories = [c for c in goal_config['secondary'] if c != 'warmup']
+    warmup_pool = available[EXERCISES_DB.category_mask(['warmup'])[available]]
+    main_pool = available[EXERCISES_DB.category_mask(goal_config['primary'])[available]]
+    secondary_pool = available[EXERCISES_DB.category_mask(secondary_categories)[available]]
+    
+    return warmup_pool, main_pool, secondary_pool
+
+def get_exercise_pools(
+    skill_level: str,
+    equipment: str,
+    limitations: List[str],
+    goal_config: Dict
+) -> Tuple[List, List, List]:
+    """Split the exercises available to the user into warm-up, primary and secondary pools"""
+    return tuple(
+        [(EXERCISES_DB.names[i], EXERCISES_DB.record(i)) for i in pool]
+        for pool in get_exercise_pool_indices(skill_level, equipment, limitations, goal_config)
+    )
+
+def _solver_tables() -> Tuple[Tuple[List[int], List[int]], List[bool]]:
+    """
+    Layer tables for optimize_exercise_selection. A layer is
+    count * (MAX_SECONDARY_EXERCISES + 1) + secondary_count.
+    
+    Returns:
+        (destination layer when adding a primary / secondary exercise, or -1
+        when that would break a cap; whether each layer holds a primary exercise)
+    """
+    width = MAX_SECONDARY_EXERCISES + 1
+    n_layers = (MAX_MAIN_EXERCISES + 1) * width
+    destinations = tuple(
+        [
+            index + width + is_secondary
+            if index < MAX_MAIN_EXERCISES * width and index % width + is_secondary <= MAX_SECONDARY_EXERCISES
+            else -1
+            for index in range(n_layers)
+        ]
+        for is_secondary in (0, 1)
+    )
+    has_primary = [index // width > index % width for index in range(n_layers)]
+    return destinations, has_primary
+
+_SOLVER_DESTINATIONS, _SOLVER_HAS_PRIMARY = _solver_tables()
+
+def optimize_exercise_selection(
+    candidates: List[Tuple[str, int, bool]],
+    target_seconds: float,
+    max_seconds: float,
+    time_budget_ms: float = OPTIMIZER_TIME_BUDGET_MS
+) -> Tuple[List[str], int, Dict]:
+    """
+    Pick the subset of exercises whose total time is closest to the target
+    
+    Bounded subset-sum (knapsack) over the candidate pool: every reachable
+    total is kept as a state, capped at MAX_MAIN_EXERCISES exercises and
+    MAX_SECONDARY_EXERCISES secondary ones, and never above max_seconds.
+    Reachable totals are stored as integer bitsets (bit t = t seconds), one
+    per (exercise count, secondary count) layer, so adding a candidate is a
+    shift-and-or per layer. Candidate order decides which of several
+    equal-length subsets wins (earlier candidates are preferred), so callers
+    shuffle or rank it to get varied plans. When the time budget runs out the
+    best state found so far is returned.
+    
+    Args:
+        candidates: (exercise name, exercise time in seconds, is_secondary)
+        target_seconds: Duration the selection should add up to
+        max_seconds: Hard upper bound for the selection
+        time_budget_ms: Solver deadline in milliseconds
+    
+    Returns:
+        (selected exercise names, total seconds, solver stats)
+    """
+    start = time.perf_counter()
+    deadline = start + time_budget_ms / 1000.0
+    
+    # layer -> bitset of reachable exact totals (only non-empty layers kept)
+    layers = {0: 1}
+    limit = (1 << (int(max_seconds) + 1)) - 1 if max_seconds >= 0 else 0
+    
+    # Any total in the target's quantum counts as a hit, as before
+    target_key = int(target_seconds // OPTIMIZER_QUANTUM_SECONDS)
+    target_window = (
+        ((1 << OPTIMIZER_QUANTUM_SECONDS) - 1) << (target_key * OPTIMIZER_QUANTUM_SECONDS)
+        if target_key >= 0 else 0
+    )
+    
+    history = []  # Layers before each candidate, to backtrack the chosen subset
+    timed_out = False
+    has_primary = _SOLVER_HAS_PRIMARY
+    
+    for _, exercise_time, is_secondary in candidates:
+        if time.perf_counter() > deadline:
+            timed_out = True
+            break
         
-        # Check equipment
-        if ex_data['equipment'] != 'None':
-            if equipment == 'None':
-                continue
-            elif equipment == 'Kettlebell' and ex_data['equipment'] not in ['None', 'Kettlebell']:
-                continue
-            # Gym has access to everything
+        history.append(layers)
+        if exercise_time > max_seconds:
+            continue  # Never fits; the states are unchanged
         
-        # Check limitations
-        if any(lim in ex_data['exclude_limitations'] for lim in limitations):
-            continue
+        destinations = _SOLVER_DESTINATIONS[is_secondary]
+        updated = dict(layers)
+        new_primary = 0
+        for source, reachable in layers.items():
+            destination = destinations[source]
+            if destination >= 0:
+                added = (reachable << exercise_time) & limit
+                if added:
+                    updated[destination] = updated.get(destination, 0) | added
+                    if has_primary[destination]:
+                        new_primary |= added
+        layers = updated
         
-        # Check category
-        if ex_data['category'] in categories:
-            filtered.append((ex_name, ex_data))
-    
-    return filtered
+        if new_primary & target_window:
+            break  # Target hit exactly (within one quantum) with a primary exercise
+    
+    # Prefer selections that contain at least one primary exercise, falling
+    # back to secondary-only plans when no primary exercise fits the budget
+    best = _closest_total(layers, target_seconds, primary_only=True)
+    if best is None:
+        best = _closest_total(layers, target_seconds, primary_only=False)
+    best_layer, best_total = best
+    
+    # Walk back through the candidates, keeping one only when the state was
+    # not reachable without it (so earlier candidates win ties)
+    picked = []
+    layer, total = best_layer, best_total
+    for i in range(len(history) - 1, -1, -1):
+        if not (history[i].get(layer, 0) >> total) & 1:
+            _, exercise_time, is_secondary = candidates[i]
+            picked.append(i)
+            layer -= MAX_SECONDARY_EXERCISES + 1 + is_secondary
+            total -= exercise_time
+    
+    stats = {
+        'solveTimeMs': round((time.perf_counter() - start) * 1000, 3),
+        'timedOut': timed_out,
+        'states': bin(functools.reduce(operator.or_, layers.values())).count('1')  # Distinct totals
+    }
+    return [candidates[i][0] for i in reversed(picked)], best_total, stats
+
+def _closest_total(layers: Dict[int, int], target_seconds: float, primary_only: bool) -> Optional[Tuple[int, int]]:
+    """(layer, total) of the reachable total closest to the target, or None"""
+    split = max(int(target_seconds), -1) + 1  # Bits below split are <= target
+    below_mask = (1 << split) - 1
+    best, best_error = None, None
+    for layer, reachable in layers.items():
+        if primary_only and not _SOLVER_HAS_PRIMARY[layer]:
+            continue
+        below = reachable & below_mask
+        above = reachable >> split
+        options = []
+        if below:
+            options.append(below.bit_length() - 1)
+        if above:
+            options.append(split + (above & -above).bit_length() - 1)
+        for total in options:
+            error = abs(target_seconds - total)
+            if best_error is None or error < best_error:
+                best, best_error = (layer, total), error
+    return best
 
 # ============================================================================
 # MAIN GENERATION FUNCTION
@@ -418,52 +656,14 @@ def generate_workout_plan(
     goal_config = GOAL_CATEGORIES.get(goal, GOAL_CATEGORIES['Improve endurance'])
     
     # Calculate modifiers based on skill, BMI, and adaptive learning
-    rest_multiplier = goal_config['rest_multiplier']
-    sets_adjustment = adaptive_adjustments.get('setsAdjustment', 0)
-    intensity_adjustment = adaptive_adjustments.get('restMultiplierAdjustment', 0)
-    
-    # BMI adjustments
-    if bmi_category == 'overweight' or bmi_category == 'obese':
-        rest_multiplier *= 1.3
-    elif bmi_category == 'underweight':
-        rest_multiplier *= 1.1
-    
-    # Apply adaptive adjustments
-    rest_multiplier *= (1 + intensity_adjustment)
-    
-    # Variation type adjustments
-    if variation_type == 'intensity':
-        rest_multiplier *= 0.8
-        sets_adjustment += 1
-    elif variation_type == 'endurance':
-        rest_multiplier *= 1.2
-        sets_adjustment -= 1
-    
-    # Get exercise pools
-    all_categories = goal_config['primary'] + goal_config['secondary']
-    available_exercises = filter_exercises(
-        EXERCISES_DB,
-        skill_level,
-        equipment,
-        limitations,
-        all_categories
+    rest_multiplier, sets_adjustment = get_plan_modifiers(
+        goal_config, bmi_category, adaptive_adjustments, variation_type
     )
     
-    if not available_exercises:
-        # Fallback to basic exercises
-        available_exercises = filter_exercises(
-            EXERCISES_DB,
-            'Beginner',
-            'None',
-            [],
-            ['warmup', 'endurance']
-        )
-    
-    # Separate warm-up and main exercises
-    warmup_pool = [(n, d) for n, d in available_exercises if d['category'] == 'warmup']
-    main_pool = [(n, d) for n, d in available_exercises if d['category'] in goal_config['primary']]
-    secondary_pool = [(n, d) for n, d in available_exercises 
-                     if d['category'] in goal_config['secondary'] and d['category'] != 'warmup']
+    # Get exercise pools (catalog indices)
+    warmup_pool, main_pool, secondary_pool = get_exercise_pool_indices(
+        skill_level, equipment, limitations, goal_config
+    )
     
     # Build workout
     selected_exercises = []
@@ -473,63 +673,44 @@ def generate_workout_plan(
     warmup_target = target_duration * goal_config['warmup_ratio']
     warmup_added = 0
     
+    warmup_pool = list(warmup_pool)
     random.shuffle(warmup_pool)
-    for ex_name, ex_data in warmup_pool[:3]:  # Max 3 warm-up exercises
+    warmup_pool = warmup_pool[:3]  # Max 3 warm-up exercises
+    warmup_times = EXERCISES_DB.exercise_times(warmup_pool, rest_multiplier, 0)
+    for i, exercise_time in zip(warmup_pool, warmup_times.tolist()):
         if warmup_added >= warmup_target:
             break
         
-        duration = ex_data['duration']
-        sets = ex_data['sets']
-        rest = int(ex_data['rest'] * rest_multiplier)
-        
-        exercise_time = (duration * sets) + (rest * (sets - 1))
-        
-        selected_exercises.append(ex_name)
+        selected_exercises.append(EXERCISES_DB.names[i])
         warmup_added += exercise_time
         total_time += exercise_time
     
     # 2. Add main exercises
-    remaining_time = target_duration - total_time
-    main_added = 0
-    
-    # Mix primary and secondary (70% primary, 30% secondary)
-    combined_pool = []
-    random.shuffle(main_pool)
-    random.shuffle(secondary_pool)
-    
-    for i in range(max(len(main_pool), len(secondary_pool))):
-        if i < len(main_pool):
-            combined_pool.append(main_pool[i])
-        if i < len(secondary_pool) and random.random() < 0.3:  # 30% chance
-            combined_pool.append(secondary_pool[i])
-    
-    for ex_name, ex_data in combined_pool:
-        if total_time >= target_duration * 1.1:  # Don't exceed by more than 10%
-            break
-        
-        duration = ex_data['duration']
-        sets = max(1, ex_data['sets'] + sets_adjustment)
-        rest = int(ex_data['rest'] * rest_multiplier)
-        
-        exercise_time = (duration * sets) + (rest * (sets - 1))
-        
-        # Don't add if it overshoots too much
-        if total_time + exercise_time > target_duration * 1.15:
-            continue
-        
-        selected_exercises.append(ex_name)
-        total_time += exercise_time
+    # Mix primary and secondary pools; the optimizer keeps secondary exercises
+    # to a minority and picks the subset whose duration lands closest to target
+    candidate_pool = np.concatenate([main_pool, secondary_pool])
+    candidate_times = EXERCISES_DB.exercise_times(candidate_pool, rest_multiplier, sets_adjustment)
+    is_primary = EXERCISES_DB.category_mask(goal_config['primary'])[candidate_pool]
+    candidates = [
+        (EXERCISES_DB.names[i], exercise_time, not primary)
+        for i, exercise_time, primary in zip(candidate_pool, candidate_times.tolist(), is_primary.tolist())
+    ]
+    random.shuffle(candidates)
+    
+    main_selection, main_time, optimizer_stats = optimize_exercise_selection(
+        candidates,
+        target_seconds=target_duration - total_time,
+        max_seconds=target_duration * (1 + DURATION_TOLERANCE) - total_time
+    )
+    selected_exercises.extend(main_selection)
+    total_time += main_time
     
     # Format result
     exercises_str = ';'.join(selected_exercises)
     actual_duration_min = round(total_time / 60)
     
     # Create descriptive name
-    variation_suffix = {
-        'balanced': 'Optimized',
-        'intensity': 'High Intensity',
-        'endurance': 'Endurance Focus'
-    }[variation_type]
+    variation_suffix = VARIATION_SUFFIXES[variation_type]
     
     plan_name = f"{skill_level} {goal} Plan - {variation_suffix}"
     
@@ -541,7 +722,8 @@ def generate_workout_plan(
         'goal': goal,
         'equipment': equipment,
         'focus': goal,
-        'bmiCategory': bmi_category
+        'bmiCategory': bmi_category,
+        'solveTimeMs': optimizer_stats['solveTimeMs']
     }
 
 # ============================================================================
@@ -560,37 +742,164 @@ def generate_3_plan_variations(
 ) -> List[Dict]:
     """
     Generate 3 truly different workout plan variations
-    """
     
-    # Set different random seeds for each variation to ensure diversity
-    variations = []
+    Exercise times for all three variations (balanced, intensity, endurance)
+    come from one NumPy call. Each variation then ranks the pool: a random key
+    plus penalties for distance from its intensity target, for most secondary
+    exercises and for exercises an earlier variation already used.
+    optimize_exercise_selection picks the main block from that order and
+    keeps the single-plan generator's duration guarantee.
+    
+    A variation whose exercise set matches an earlier plan is solved again,
+    first without every exercise already used, then without one of its
+    exercises at a time. The closest distinct result replaces it when it is
+    within the duration tolerance (or nearer the target than the duplicate),
+    so identical plans are only returned when the pool has no other fit.
+    """
     
-    # Plan 1: Balanced (default)
-    random.seed(hash(f"{skill_level}{goal}{duration_range}1"))
-    plan1 = generate_workout_plan(
-        skill_level, goal, duration_range, height_cm, weight_kg,
-        limitations, equipment, adaptive_adjustments, 'balanced'
-    )
-    variations.append(plan1)
+    if limitations is None:
+        limitations = []
+    if adaptive_adjustments is None:
+        adaptive_adjustments = {}
     
-    # Plan 2: Higher intensity (shorter rest, more sets)
-    random.seed(hash(f"{skill_level}{goal}{duration_range}2"))
-    plan2 = generate_workout_plan(
-        skill_level, goal, duration_range, height_cm, weight_kg,
-        limitations, equipment, adaptive_adjustments, 'intensity'
-    )
-    variations.append(plan2)
+    target_duration = get_duration_target(duration_range)
+    bmi_category = get_bmi_category(height_cm, weight_kg)
+    goal_config = GOAL_CATEGORIES.get(goal, GOAL_CATEGORIES['Improve endurance'])
+    warmup_target = target_duration * goal_config['warmup_ratio']
+    max_duration = target_duration * (1 + DURATION_TOLERANCE)
+    tolerance = target_duration * DURATION_TOLERANCE
     
-    # Plan 3: Endurance focus (longer activities, fewer sets)
-    random.seed(hash(f"{skill_level}{goal}{duration_range}3"))
-    plan3 = generate_workout_plan(
-        skill_level, goal, duration_range, height_cm, weight_kg,
-        limitations, equipment, adaptive_adjustments, 'endurance'
+    warmup_indices, main_indices, secondary_indices = get_exercise_pool_indices(
+        skill_level, equipment, limitations, goal_config
     )
-    variations.append(plan3)
+    main_indices = np.concatenate([main_indices, secondary_indices])
+    
+    # Stable seed so the same answers give the same plans in every worker
+    seed_key = f"{skill_level}|{goal}|{duration_range}|{equipment}|{sorted(limitations)}|{bmi_category}"
+    random_key = random.Random(zlib.crc32(seed_key.encode('utf-8'))).random
+    
+    # Exercise times for every variation in one call: one row per variation,
+    # warm-ups first (they keep their base sets, as in generate_workout_plan)
+    variation_types = ('balanced', 'intensity', 'endurance')
+    modifiers = [
+        get_plan_modifiers(goal_config, bmi_category, adaptive_adjustments, variation_type)
+        for variation_type in variation_types
+    ]
+    sets_adjustments = np.zeros((len(variation_types), len(warmup_indices) + len(main_indices)), dtype=np.int64)
+    sets_adjustments[:, len(warmup_indices):] = [[sets_adjustment] for _, sets_adjustment in modifiers]
+    times = EXERCISES_DB.exercise_times(
+        np.concatenate([warmup_indices, main_indices]),
+        np.array([[rest_multiplier] for rest_multiplier, _ in modifiers]),
+        sets_adjustments
+    ).tolist()
+    warmup_times = [row[:len(warmup_indices)] for row in times]
+    main_times = [row[len(warmup_indices):] for row in times]
+    
+    # Ranking works on plain lists: pools are small and NumPy's per-call
+    # overhead would dominate
+    warmup_pool = warmup_indices.tolist()
+    main_pool = main_indices.tolist()
+    main_secondary = (~EXERCISES_DB.category_mask(goal_config['primary'])[main_indices]).tolist()
+    main_intensity = EXERCISES_DB.intensity[main_indices].tolist()
+    low, high = (min(main_intensity), max(main_intensity)) if main_intensity else (0, 0)
+    intensity_weight = INTENSITY_WEIGHT / max(high - low, 1)
+    repeat_rank = 2.0 + INTENSITY_WEIGHT + DIVERSITY_WEIGHT  # Above any other rank
+    used = set()  # Catalog indices of exercises in earlier variations
+    
+    def build(v: int, rank_keys: Dict[str, List[float]], excluded: set) -> Tuple[List[int], List[int], int, float]:
+        """(warm-ups, main block, total seconds, solver ms) of variation v without the excluded exercises"""
+        # 1. Warm-ups in ranked order (max 3) until the warm-up target is met
+        times = warmup_times[v]
+        rank = [key + DIVERSITY_WEIGHT * (i in used) for i, key in zip(warmup_pool, rank_keys['warmup'])]
+        order = [j for j in sorted(range(len(warmup_pool)), key=rank.__getitem__) if warmup_pool[j] not in excluded]
+        warmup_selected = []
+        warmup_total = 0
+        for j in order[:3]:
+            if warmup_total >= warmup_target:
+                break
+            warmup_selected.append(warmup_pool[j])
+            warmup_total += times[j]
+        
+        # 2. Main block: the optimizer prefers earlier candidates, so it takes
+        # the best-ranked exercises that fit the duration. A warm-up is only
+        # repeated ('Warm up only' plans) when nothing else reaches the target,
+        # as in generate_workout_plan
+        times = main_times[v]
+        repeats = set(warmup_selected)
+        rank = [
+            key + DIVERSITY_WEIGHT * (i in used) + repeat_rank * (i in repeats)
+            for i, key in zip(main_pool, rank_keys['main'])
+        ]
+        candidates = [
+            (main_pool[j], times[j], main_secondary[j])
+            for j in sorted(range(len(main_pool)), key=rank.__getitem__) if main_pool[j] not in excluded
+        ]
+        
+        # The best-ranked exercises usually reach the target; the whole
+        # ranking is only searched when they miss the tolerance band
+        main_target = target_duration - warmup_total
+        main_max = max_duration - warmup_total
+        main_selection, main_time, optimizer_stats = optimize_exercise_selection(
+            candidates[:OPTIMIZER_CANDIDATES], main_target, main_max
+        )
+        solve_time_ms = optimizer_stats['solveTimeMs']
+        if len(candidates) > OPTIMIZER_CANDIDATES and abs(main_time - main_target) > tolerance:
+            main_selection, main_time, optimizer_stats = optimize_exercise_selection(
+                candidates, main_target, main_max
+            )
+            solve_time_ms += optimizer_stats['solveTimeMs']
+        return warmup_selected, main_selection, warmup_total + main_time, solve_time_ms
+    
+    earlier = []  # Exercise sets of the variations so far
+    variations = []
     
-    # Reset random seed
-    random.seed()
+    for v, variation_type in enumerate(variation_types):
+        # Random keys plus the variation's intensity and secondary penalties;
+        # build() adds the penalties that depend on earlier variations
+        intensity_target = low + VARIATION_INTENSITY_TARGETS[variation_type] * (high - low)
+        rank_keys = {
+            'warmup': [random_key() for _ in warmup_pool],
+            'main': [
+                random_key()
+                + intensity_weight * abs(intensity - intensity_target)
+                + (secondary and random_key() >= SECONDARY_INCLUDE_RATE)
+                for intensity, secondary in zip(main_intensity, main_secondary)
+            ],
+        }
+        warmup_selected, main_selection, total_time, solve_time_ms = build(v, rank_keys, set())
+        
+        exercise_set = set(warmup_selected + main_selection)
+        if exercise_set in earlier:
+            # Same exercises as an earlier plan: re-solve without the used
+            # exercises, then without each of this plan's exercises in turn
+            alternatives = [build(v, rank_keys, used)]
+            alternatives += [build(v, rank_keys, {i}) for i in sorted(exercise_set)]
+            solve_time_ms += sum(alternative[3] for alternative in alternatives)
+            
+            distinct = [a for a in alternatives if set(a[0] + a[1]) not in earlier]
+            if distinct:
+                best = min(distinct, key=lambda a: abs(a[2] - target_duration))  # First wins ties
+                error = abs(best[2] - target_duration)
+                if error <= tolerance or error < abs(total_time - target_duration):
+                    warmup_selected, main_selection, total_time = best[:3]
+                    exercise_set = set(warmup_selected + main_selection)
+        
+        earlier.append(exercise_set)
+        used.update(exercise_set)
+        
+        selected_exercises = [EXERCISES_DB.names[i] for i in warmup_selected + main_selection]
+        
+        variations.append({
+            'planName': f"{skill_level} {goal} Plan - {VARIATION_SUFFIXES[variation_type]}",
+            'exercises': ';'.join(selected_exercises),
+            'durationMinutes': round(total_time / 60),
+            'skillLevel': skill_level,
+            'goal': goal,
+            'equipment': equipment,
+            'focus': goal,
+            'bmiCategory': bmi_category,
+            'solveTimeMs': round(solve_time_ms, 3)
+        })
     
     return variations
 
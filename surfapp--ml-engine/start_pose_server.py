@@ -26,6 +26,7 @@ if __name__ == "__main__":
         print("Starting Surf AI Pose Detection Server...")
         print("   Server will be available at http://localhost:8001")
         print("   Health check: http://localhost:8001/health")
+        print("   Readiness: http://localhost:8001/ready")
         print("   Detection: POST http://localhost:8001/detect")
         print("")
         
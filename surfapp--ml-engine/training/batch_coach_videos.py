@@ -0,0 +1,316 @@
+"""
+Batch Coach Videos
+Headless drill coaching over a directory of recorded session videos
+
+Each video is decoded frame by frame (nothing is buffered beyond the current
+frame), run through MediaPipe and the server's drill engine
+(services/drill_engine.py) with the video's own timestamps, and summarized:
+rep count, stage changes, most frequent coaching cues, average drill
+metrics, detection rate and processing speed.
+
+Files are spread over a process pool, one MediaPipe detector per worker
+(built once, reset between videos), longest videos first so the pool stays
+busy. Results are appended to a JSON-lines file as each video finishes, so
+an interrupted overnight run can be resumed with --resume.
+
+The drill for a video comes from, in order: the --manifest JSON
+({"file.mp4": "pumping", ...}), a drill id at the start of the file name
+("pumping_day2.mp4"), or --drill.
+
+Usage:
+    python batch_coach_videos.py footage/ --drill stance --workers 8
+    python batch_coach_videos.py footage/ --manifest drills.json --stride 2 --resume
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+TRAINING_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.abspath(os.path.join(TRAINING_DIR, '..', 'services')))
+
+VIDEO_EXTENSIONS = ('.mp4', '.mov', '.avi', '.mkv', '.m4v', '.webm')
+RESULTS_FILENAME = 'coaching_results.jsonl'
+DEFAULT_MAX_WIDTH = 960   # Frames are downscaled to this width before inference
+TOP_CUES = 5              # Most frequent coaching cues kept per video
+PROGRESS_SECONDS = 30     # Per-worker progress line interval
+
+# ============================================================================
+# WORKER
+# ============================================================================
+
+_detector = None
+_recorder = None
+
+def _init_worker(model_complexity: int, record_dir: str):
+    """Builds this worker's MediaPipe detector (and recorder) once"""
+    global _detector, _recorder
+    import pose_detection
+    pose_detection.POSE_MODEL_COMPLEXITY = model_complexity
+    _detector = pose_detection.create_pose_detector()
+    if record_dir:
+        from landmark_recorder import LandmarkRecorder
+        _recorder = LandmarkRecorder(record_dir)
+
+def _cue(feedback):
+    """Last coaching line that isn't a "Label: value" readout"""
+    for line in reversed(feedback):
+        if ': ' not in line['text'] and line['severity'] != 'info':
+            return line['text']
+    return None
+
+def coach_video(path: str, drill: str, stride: int = 1, max_width: int = DEFAULT_MAX_WIDTH,
+                max_seconds: float = None) -> dict:
+    """
+    Runs one video through pose detection and a drill coach
+
+    Args:
+        path: Video file
+        drill: Drill id (a key of drill_engine.DRILL_COACHES)
+        stride: Analyze every Nth frame (skipped frames are grabbed, not decoded to images)
+        max_width: Downscale wider frames to this width before inference
+        max_seconds: Stop after this much video
+
+    Returns:
+        Summary dict: reps, stage changes, cue counts, metric means,
+        detection rate and timing
+    """
+    import cv2
+    from drill_engine import DrillSession
+    from pose_detection import extract_landmarks
+
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise IOError(f"Cannot open video: {path}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+
+    if hasattr(_detector, 'reset'):
+        _detector.reset()  # Video-mode tracking must not carry over from the previous file
+    session = DrillSession(drill)
+    session_id = os.path.splitext(os.path.basename(path))[0]
+
+    started = time.perf_counter()
+    last_progress = started
+    frame_index = analyzed = detected = stage_changes = 0
+    cues = Counter()
+    metric_sums, metric_counts = Counter(), Counter()
+    stage = session.state['stage']
+    out = None
+    try:
+        while True:
+            if frame_index % stride:
+                if not cap.grab():
+                    break
+                frame_index += 1
+                continue
+            ok, frame = cap.read()
+            if not ok:
+                break
+            timestamp = frame_index / fps
+            frame_index += 1
+            if max_seconds is not None and timestamp > max_seconds:
+                break
+
+            height, width = frame.shape[:2]
+            if width > max_width:
+                frame = cv2.resize(frame, (max_width, int(height * max_width / width)), interpolation=cv2.INTER_AREA)
+            results = _detector.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+            landmarks = extract_landmarks(results.pose_landmarks) if results.pose_landmarks else None
+
+            out = session.analyze(landmarks, now=timestamp)
+            analyzed += 1
+            detected += landmarks is not None
+            if out['stage'] != stage:
+                stage_changes += 1
+                stage = out['stage']
+            cue = _cue(out['feedback'])
+            if cue:
+                cues[cue] += 1
+            for name, value in out['metrics'].items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    metric_sums[name] += value
+                    metric_counts[name] += 1
+            if _recorder is not None:
+                _recorder.record(session_id, {'landmarks': landmarks, 'personDetected': landmarks is not None},
+                                 timestamp=timestamp, rep_count=out['repCount'])
+
+            now = time.perf_counter()
+            if now - last_progress > PROGRESS_SECONDS:
+                done = f"{frame_index}/{total_frames}" if total_frames else str(frame_index)
+                print(f"   ⏳ {os.path.basename(path)}: frame {done} ({analyzed / (now - started):.1f} fps)", flush=True)
+                last_progress = now
+    finally:
+        cap.release()
+        if _recorder is not None:
+            _recorder.close_session(session_id)
+
+    elapsed = time.perf_counter() - started
+    return {
+        'file': os.path.basename(path),
+        'drill': drill,
+        'videoSeconds': round(frame_index / fps, 2),
+        'videoFps': round(fps, 2),
+        'analyzedFrames': analyzed,
+        'detectionRate': round(detected / analyzed, 4) if analyzed else 0.0,
+        'reps': out['repCount'] if out else 0,
+        'stageChanges': stage_changes,
+        'topCues': dict(cues.most_common(TOP_CUES)),
+        'metricMeans': {name: round(metric_sums[name] / metric_counts[name], 2) for name in sorted(metric_counts)},
+        'processingSeconds': round(elapsed, 2),
+        'processingFps': round(analyzed / elapsed, 2) if elapsed else 0.0,
+    }
+
+def _run_job(path: str, drill: str, stride: int, max_width: int, max_seconds: float) -> dict:
+    """Pool entry point: never raises, so one bad file does not stop the batch"""
+    try:
+        return coach_video(path, drill, stride=stride, max_width=max_width, max_seconds=max_seconds)
+    except Exception as e:
+        return {'file': os.path.basename(path), 'drill': drill, 'error': f"{type(e).__name__}: {e}"}
+
+# ============================================================================
+# BATCH
+# ============================================================================
+
+def find_videos(directory: str) -> list:
+    return sorted(
+        os.path.join(directory, name) for name in os.listdir(directory)
+        if name.lower().endswith(VIDEO_EXTENSIONS)
+    )
+
+def assign_drills(videos: list, manifest: dict, default_drill: str, drills) -> tuple:
+    """Returns ([(path, drill)], [files without a drill])"""
+    # Longest drill ids first so "bottom_turn..." is not matched by a shorter id
+    by_length = sorted(drills, key=len, reverse=True)
+    jobs, unassigned = [], []
+    for path in videos:
+        name = os.path.basename(path)
+        drill = manifest.get(name)
+        if drill is None:
+            drill = next((d for d in by_length if name.lower().startswith(d)), default_drill)
+        if drill in drills:
+            jobs.append((path, drill))
+        else:
+            unassigned.append(name)
+    return jobs, unassigned
+
+def load_done(output: str) -> set:
+    """Files with a successful result already in the output file"""
+    done = set()
+    if os.path.exists(output):
+        with open(output) as f:
+            for line in f:
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # Partial last line from an interrupted run
+                if 'error' not in row:
+                    done.add(row['file'])
+    return done
+
+def print_summary(rows: list):
+    print(f"{'file':<36} {'drill':<12} {'reps':>5} {'detected':>9} {'video s':>8} {'fps':>7}  top cue")
+    for row in sorted(rows, key=lambda r: r['file']):
+        if 'error' in row:
+            print(f"{row['file'][:36]:<36} {row['drill']:<12} ❌ {row['error']}")
+            continue
+        top = next(iter(row['topCues']), '')
+        print(f"{row['file'][:36]:<36} {row['drill']:<12} {row['reps']:>5} {row['detectionRate']:>9.0%} "
+              f"{row['videoSeconds']:>8.1f} {row['processingFps']:>7.1f}  {top}")
+
+# ============================================================================
+# MAIN
+# ============================================================================
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Headless drill coaching over a directory of videos')
+    parser.add_argument('video_dir')
+    parser.add_argument('--drill', help='Drill for videos not in the manifest or named after a drill')
+    parser.add_argument('--manifest', help='JSON mapping file name -> drill id')
+    parser.add_argument('--output', help=f'JSON-lines results (default: <video_dir>/{RESULTS_FILENAME})')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--stride', type=int, default=1, help='Analyze every Nth frame')
+    parser.add_argument('--max-width', type=int, default=DEFAULT_MAX_WIDTH)
+    parser.add_argument('--max-seconds', type=float, help='Only the first N seconds of each video')
+    parser.add_argument('--model-complexity', type=int, default=1, choices=(0, 1, 2),
+                        help='MediaPipe model: 0 lite, 1 full, 2 heavy')
+    parser.add_argument('--record-dir', help='Also write each video\'s landmarks as a .lmk recording')
+    parser.add_argument('--resume', action='store_true', help='Skip videos already in the output file')
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    from drill_engine import DRILL_COACHES
+
+    if args.drill and args.drill not in DRILL_COACHES:
+        print(f"❌ Unknown drill: {args.drill} (choose from {', '.join(DRILL_COACHES)})")
+        return False
+    manifest = {}
+    if args.manifest:
+        with open(args.manifest) as f:
+            manifest = json.load(f)
+
+    videos = find_videos(args.video_dir)
+    jobs, unassigned = assign_drills(videos, manifest, args.drill, DRILL_COACHES)
+    output = args.output or os.path.join(args.video_dir, RESULTS_FILENAME)
+    if args.resume:
+        done = load_done(output)
+        jobs = [(path, drill) for path, drill in jobs if os.path.basename(path) not in done]
+    elif os.path.exists(output):
+        os.remove(output)
+
+    print("=" * 80)
+    print("BATCH DRILL COACHING")
+    print("=" * 80)
+    print(f"{len(videos)} videos, {len(jobs)} to process, {args.workers} workers, "
+          f"model complexity {args.model_complexity}, stride {args.stride}")
+    for name in unassigned:
+        print(f"   ⚠️  No drill for {name} (use --drill, --manifest or a drill-prefixed name)")
+    if not jobs:
+        return not unassigned
+
+    # Longest first, so a big file does not start last and hold up the batch
+    jobs.sort(key=lambda job: os.path.getsize(job[0]), reverse=True)
+
+    started = time.perf_counter()
+    rows = []
+    context = multiprocessing.get_context('spawn')  # Fresh interpreter per worker for MediaPipe
+    with ProcessPoolExecutor(max_workers=max(1, min(args.workers, len(jobs))), mp_context=context,
+                             initializer=_init_worker, initargs=(args.model_complexity, args.record_dir)) as pool:
+        futures = [pool.submit(_run_job, path, drill, args.stride, args.max_width, args.max_seconds)
+                   for path, drill in jobs]
+        with open(output, 'a') as f:
+            for future in as_completed(futures):
+                try:
+                    row = future.result()
+                except BrokenProcessPool:
+                    print("❌ A worker died (MediaPipe failed to load or ran out of memory); "
+                          "rerun with --resume to continue")
+                    return False
+                rows.append(row)
+                f.write(json.dumps(row) + '\n')
+                f.flush()
+                status = f"❌ {row['error']}" if 'error' in row else f"✅ {row['reps']} reps, {row['processingFps']} fps"
+                print(f"[{len(rows)}/{len(jobs)}] {row['file']} ({row['drill']}): {status}", flush=True)
+
+    elapsed = time.perf_counter() - started
+    video_seconds = sum(row.get('videoSeconds', 0) for row in rows)
+    failed = sum('error' in row for row in rows)
+    print()
+    print_summary(rows)
+    print(f"\n{len(rows) - failed} videos ({video_seconds / 60:.1f} min of footage) in {elapsed / 60:.1f} min "
+          f"({video_seconds / max(elapsed, 1e-9):.2f}x real time)")
+    print(f"💾 Results: {output}")
+    if failed:
+        print(f"❌ {failed} videos failed")
+    return failed == 0
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,314 @@
+"""
+Benchmark Plan Generators
+Microbenchmarks for plan generation, exercise filtering and /predict, with a
+JSON history and regression gating
+
+Each benchmark is timed per call after a warm-up; p50, p99 and mean are
+recorded. The run is compared with the median of the last few recorded runs
+and fails when a benchmark's p50 or p99 regresses past its threshold (p99 is
+only gated for benchmarks timed over at least 100 calls). A run with
+regressions is not recorded, so it cannot drag the baseline along; pass
+--accept to record it anyway (e.g. after an intended slowdown).
+
+Usage:
+    python benchmark_plan_generators.py [--quick] [--filter smart]
+                                        [--history benchmark_history.json]
+                                        [--p50-threshold 0.25] [--p99-threshold 0.5] [--no-record] [--accept]
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+TRAINING_DIR = os.path.dirname(os.path.abspath(__file__))
+SERVICES_DIR = os.path.abspath(os.path.join(TRAINING_DIR, '..', 'services'))
+sys.path.insert(0, TRAINING_DIR)
+sys.path.insert(0, SERVICES_DIR)
+
+# Benchmarks measure generation, not the persistent cache (enabled per benchmark)
+os.environ.setdefault('PLAN_CACHE_ENABLED', '0')
+
+import smart_workout_templates as smart
+import workout_templates as legacy
+from exercise_catalog import ExerciseCatalog
+
+DEFAULT_HISTORY = os.path.join(TRAINING_DIR, 'benchmark_history.json')
+BASELINE_RUNS = 5          # Baseline = median of this many most recent runs
+WARMUP_CALLS = 5
+CALLS = 200                # Timed calls per benchmark (--quick divides by 10)
+MIN_CALLS = 10
+TIME_BUDGET_SECONDS = 5    # Slow benchmarks get fewer calls, never below MIN_CALLS
+MIN_CALLS_FOR_P99 = 100    # Below this p99 is just the slowest call, too noisy to gate on
+SYNTHETIC_CATALOG_SIZES = [1000, 10000]
+
+# Representative and worst-case inputs
+TYPICAL = {
+    'skill_level': 'Intermediate', 'goal': 'Improve endurance', 'duration_range': '10-20 minutes',
+    'height_cm': 175, 'weight_kg': 75, 'limitations': ['Knee discomfort'], 'equipment': 'Gym',
+    'adaptive_adjustments': {'restMultiplierAdjustment': 0.1, 'setsAdjustment': 0},
+}
+WORST_CASE = {
+    # Largest pool and longest target: Pro, full gym, no limitations, 20+ minutes
+    'skill_level': 'Pro', 'goal': 'Build stamina', 'duration_range': '20+ minutes',
+    'height_cm': 175, 'weight_kg': 75, 'limitations': [], 'equipment': 'Gym',
+    'adaptive_adjustments': {'setsAdjustment': 1},
+}
+LEGACY_TYPICAL = {
+    'skill_level': 'Intermediate', 'goal': 'Improve endurance', 'duration_range': '10-20 minutes',
+    'limitations': ['Knee discomfort'], 'height': 175, 'weight': 75,
+}
+LEGACY_WORST_CASE = {
+    'skill_level': 'Pro', 'goal': 'Improve explosive pop-up speed', 'duration_range': '20+ minutes',
+    'limitations': None, 'height': 175, 'weight': 75,
+}
+PREDICT_BODY = {
+    'skillLevel': 'Intermediate', 'goal': ['Endurance'], 'durationRange': '10-20 minutes',
+    'limitations': ['Knee discomfort'], 'equipment': 'Gym',
+    'userDetails': {'height': 175, 'weight': 75},
+}
+
+# ============================================================================
+# TIMING
+# ============================================================================
+
+def time_calls(fn, calls):
+    """
+    Per-call latency in microseconds after a warm-up
+
+    Generator and server logging goes to /dev/null while timing, so the
+    numbers do not depend on how fast the terminal scrolls.
+    """
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        for _ in range(WARMUP_CALLS):
+            fn()
+        per_call = (time.perf_counter() - start) / WARMUP_CALLS
+        calls = max(MIN_CALLS, min(calls, int(TIME_BUDGET_SECONDS / per_call)))
+
+        samples = np.empty(calls)
+        for i in range(calls):
+            start = time.perf_counter_ns()
+            fn()
+            samples[i] = (time.perf_counter_ns() - start) / 1000
+    return {
+        'p50': round(float(np.percentile(samples, 50)), 2),
+        'p99': round(float(np.percentile(samples, 99)), 2),
+        'mean': round(float(samples.mean()), 2),
+        'calls': calls,
+    }
+
+def synthetic_catalog(size):
+    """Catalog of `size` exercises made by cloning the real catalog under new names"""
+    base = [(name, record.to_dict()) for name, record in smart.EXERCISES_DB.items()]
+    exercises = {}
+    for i in range(size):
+        name, record = base[i % len(base)]
+        exercises[f"{name} #{i // len(base)}"] = record
+    return ExerciseCatalog(exercises)
+
+class swapped_catalog:
+    """Temporarily serve generation from another catalog"""
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+
+    def __enter__(self):
+        self.original = smart.EXERCISES_DB
+        smart.EXERCISES_DB = self.catalog
+
+    def __exit__(self, *exc):
+        smart.EXERCISES_DB = self.original
+
+# ============================================================================
+# BENCHMARKS
+# ============================================================================
+
+def benchmarks():
+    """Yield (name, zero-argument callable, optional context manager)"""
+    catalog = smart.EXERCISES_DB
+    filter_args = ('Pro', 'Gym', [], list(catalog.categories))
+
+    yield 'smart.filter_exercises[typical]', lambda: smart.filter_exercises(
+        catalog, 'Intermediate', 'Gym', ['Knee discomfort'], ['endurance', 'warmup', 'stamina']), None
+    yield 'smart.filter_exercises[worst]', lambda: smart.filter_exercises(catalog, *filter_args), None
+    yield 'smart.generate_workout_plan[typical]', lambda: smart.generate_workout_plan(**TYPICAL), None
+    yield 'smart.generate_workout_plan[worst]', lambda: smart.generate_workout_plan(**WORST_CASE), None
+    yield 'smart.generate_3_plan_variations[typical]', lambda: smart.generate_3_plan_variations(**TYPICAL), None
+    yield 'smart.generate_3_plan_variations[worst]', lambda: smart.generate_3_plan_variations(**WORST_CASE), None
+
+    for size in SYNTHETIC_CATALOG_SIZES:
+        big = synthetic_catalog(size)
+        yield f'smart.filter_exercises[catalog={size}]', lambda big=big: smart.filter_exercises(big, *filter_args), None
+        yield (f'smart.generate_3_plan_variations[catalog={size}]',
+               lambda: smart.generate_3_plan_variations(**WORST_CASE), swapped_catalog(big))
+
+    yield 'legacy.filter_exercises_by_limitations', lambda: legacy.filter_exercises_by_limitations(
+        legacy.get_exercise_pool_by_goal('Improve endurance'), ['Knee discomfort', 'Lower back pain']), None
+    yield 'legacy.generate_workout_plan[typical]', lambda: legacy.generate_workout_plan(
+        'Intermediate', 'Improve endurance', '10-20 minutes', ['Knee discomfort']), None
+    yield 'legacy.generate_workout_plan[worst]', lambda: legacy.generate_workout_plan(
+        'Pro', 'Improve explosive pop-up speed', '20+ minutes'), None
+    yield 'legacy.generate_3_plan_variations[typical]', lambda: legacy.generate_3_plan_variations(**LEGACY_TYPICAL), None
+    yield 'legacy.generate_3_plan_variations[worst]', lambda: legacy.generate_3_plan_variations(**LEGACY_WORST_CASE), None
+
+    # End to end through the ASGI app: validation, generation, encoding
+    from fastapi.testclient import TestClient
+    import model_server
+
+    client = TestClient(model_server.app)
+    yield '/predict[generate]', lambda: client.post('/predict', json=PREDICT_BODY), None
+    yield '/predict[retrieve]', lambda: client.post('/predict', json=dict(PREDICT_BODY, mode='retrieve')), None
+
+    yield '/predict[cache hit]', lambda: client.post('/predict', json=PREDICT_BODY), using_temporary_cache()
+
+class using_temporary_cache:
+    """Temporarily route /predict through a plan cache in a directory removed afterwards"""
+
+    def __enter__(self):
+        import plan_cache
+        self.directory = tempfile.TemporaryDirectory(prefix='plan-benchmark-cache-')
+        self.cache = plan_cache.PlanCache(self.directory.name)
+        self.original = plan_cache._plan_cache
+        plan_cache._plan_cache = self.cache
+
+    def __exit__(self, *exc):
+        import plan_cache
+        plan_cache._plan_cache = self.original
+        self.cache.close()
+        self.directory.cleanup()
+
+# ============================================================================
+# HISTORY AND GATING
+# ============================================================================
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=TRAINING_DIR,
+                              capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def load_history(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return json.load(f)
+
+def baseline_for(history, name):
+    """Median p50/p99 of the benchmark over the most recent runs that have it"""
+    runs = [run['results'][name] for run in history if name in run['results']][-BASELINE_RUNS:]
+    if not runs:
+        return None
+    return {
+        'p50': float(np.median([r['p50'] for r in runs])),
+        'p99': float(np.median([r['p99'] for r in runs])),
+        'runs': len(runs),
+    }
+
+def find_regressions(results, history, p50_threshold, p99_threshold):
+    """
+    Compare each result with its baseline
+
+    Returns:
+        One message per stat that slowed down by more than its threshold
+    """
+    regressions = []
+    for name, result in results.items():
+        baseline = baseline_for(history, name)
+        if baseline is None:
+            continue
+        for stat, threshold in (('p50', p50_threshold), ('p99', p99_threshold)):
+            if stat == 'p99' and result['calls'] < MIN_CALLS_FOR_P99:
+                continue
+            change = result[stat] / baseline[stat] - 1 if baseline[stat] else 0.0
+            result[f'{stat}Change'] = round(change, 3)
+            if change > threshold:
+                regressions.append(
+                    f"{name}: {stat} {result[stat]:.1f} µs vs baseline {baseline[stat]:.1f} µs ({change:+.0%})"
+                )
+    return regressions
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark the plan generators')
+    parser.add_argument('--quick', action='store_true', help='A tenth of the calls (smoke run)')
+    parser.add_argument('--filter', default='', help='Only benchmarks whose name contains this')
+    parser.add_argument('--history', default=DEFAULT_HISTORY, help='JSON history file')
+    parser.add_argument('--p50-threshold', type=float, default=0.25, help='Allowed p50 slowdown (0.25 = 25%%)')
+    parser.add_argument('--p99-threshold', type=float, default=0.5, help='Allowed p99 slowdown')
+    parser.add_argument('--no-record', action='store_true', help='Do not append this run to the history')
+    parser.add_argument('--accept', action='store_true', help='Record this run even if it regressed (new baseline)')
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    calls = max(MIN_CALLS, CALLS // 10) if args.quick else CALLS
+
+    print("=" * 80)
+    print("BENCHMARKING PLAN GENERATORS")
+    print("=" * 80)
+    print(f"Up to {calls} calls per benchmark ({TIME_BUDGET_SECONDS}s budget) after {WARMUP_CALLS} warm-up calls")
+    print()
+    print(f"{'benchmark':<52} {'p50 µs':>10} {'p99 µs':>10} {'mean µs':>10}")
+
+    results = {}
+    for name, fn, context in benchmarks():
+        if args.filter not in name:
+            continue
+        if context is not None:
+            with context:
+                results[name] = time_calls(fn, calls)
+        else:
+            results[name] = time_calls(fn, calls)
+        r = results[name]
+        print(f"{name:<52} {r['p50']:>10.1f} {r['p99']:>10.1f} {r['mean']:>10.1f}")
+
+    history = load_history(args.history)
+    has_baseline = bool(history)
+    regressions = find_regressions(results, history, args.p50_threshold, args.p99_threshold)
+
+    record = not args.no_record and (not regressions or args.accept)
+    if record:
+        history.append({
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'calls': calls,
+            'results': results,
+        })
+        with open(args.history, 'w') as f:
+            json.dump(history, f, indent=2)
+
+    print()
+    print("=" * 80)
+    print("REGRESSION CHECK")
+    print("=" * 80)
+    if not has_baseline:
+        print(f"No baseline yet in {args.history}")
+    if regressions:
+        for regression in regressions:
+            print(f"  - {regression}")
+        print()
+        print(f"⚠️  {len(regressions)} REGRESSIONS (p50 > {args.p50_threshold:+.0%}, p99 > {args.p99_threshold:+.0%})")
+        if record:
+            print(f"Recorded as accepted in {args.history}")
+            return True
+        if not args.no_record:
+            print(f"Not recorded in {args.history} (rerun with --accept to make this the new baseline)")
+        return False
+
+    print("✅ NO REGRESSIONS")
+    return True
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -1,66 +1,275 @@
-import pandas as pd
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import LabelEncoder
-from sklearn.metrics import accuracy_score
+"""
+Recommender Training Pipeline
+Trains the exercise recommender (RandomForest) and saves the model and
+encoders used by the model server
+
+Datasets are streamed in chunks and reduced to compact numeric arrays as they
+are read, so the text columns never have to fit in memory at once. Trees are
+built in parallel, and an optional randomized hyperparameter search runs its
+cross-validation folds across all cores.
+
+Usage:
+    python finalize_model.py [dataset.csv|dataset.parquet] [--n-jobs -1] [--search]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+
 import joblib
 import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import accuracy_score
+from sklearn.model_selection import KFold, RandomizedSearchCV, train_test_split
+from sklearn.preprocessing import LabelEncoder
+
+from plan_dataset import iter_training_chunks
+
+# Add services directory to path for the forest compiler
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'services'))
+from forest_inference import FOREST_DIR_NAME, compile_forest, save_compiled_forest
 
-# --- 1. Load the dataset ---
 try:
-    df = pd.read_csv('cardio_plans_1000.csv') # Using your 1000-row file
-except FileNotFoundError:
-    print("Error: Dataset file not found.")
-    exit()
+    import resource  # Unix only; peak memory is not reported on Windows
+except ImportError:
+    resource = None
+
+# --- CONFIGURATION ---
+DEFAULT_DATASET = 'cardio_plans_1000.csv'
+CATEGORICAL_COLUMNS = ['skillLevel', 'goal', 'exercises']
+NUMERIC_COLUMNS = ['bmi', 'age', 'weight', 'height']  # Model feature order after skill and goal
+DEFAULT_CHUNK_ROWS = 100000
+
+# Ranges for synthesized body metrics when the dataset has none
+SYNTH_RANGES = {'height': (150, 201), 'weight': (50, 101), 'age': (16, 61)}
+
+# Randomized search space
+PARAM_DISTRIBUTIONS = {
+    'n_estimators': [50, 100, 200, 300],
+    'max_depth': [None, 10, 20, 40],
+    'min_samples_leaf': [1, 2, 4],
+    'max_features': ['sqrt', 'log2', None],
+}
+
+# --- PHASE TIMING ---
+PHASE_TIMES = {}
+
+@contextmanager
+def timed(phase):
+    """Record wall time of a pipeline phase"""
+    start = time.perf_counter()
+    print(f"⏳ {phase}...")
+    yield
+    PHASE_TIMES[phase] = time.perf_counter() - start
+    print(f"   done in {PHASE_TIMES[phase]:.2f}s")
+
+def peak_memory_mb():
+    """Peak resident set size of this process in MB (None if unavailable)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+# --- 1. FEATURE SYNTHESIS ---
+def _splitmix64(values):
+    """Vectorized splitmix64 hash of uint64 values"""
+    with np.errstate(over='ignore'):
+        z = values + np.uint64(0x9E3779B97F4A7C15)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return z ^ (z >> np.uint64(31))
+
+def synthesize_metric(row_index, seed, name):
+    """
+    Plausible integer metric per row, a pure function of (seed, row, metric)
+
+    Rows get the same value however the dataset is chunked or how many
+    workers read it, so repeated runs train on identical features.
+    """
+    low, high = SYNTH_RANGES[name]
+    salt = np.uint64(sum(ord(c) << (8 * i) for i, c in enumerate(name)) & 0xFFFFFFFF)
+    key = _splitmix64(row_index.astype(np.uint64) ^ (np.uint64(seed) << np.uint64(32)) ^ salt)
+    return (low + key % np.uint64(high - low)).astype(np.float32)
+
+# --- 2. CHUNKED LOADING ---
+class IncrementalEncoder:
+    """Assigns integer codes to categories in first-seen order across chunks"""
+
+    def __init__(self):
+        self.codes = {}
+
+    def encode(self, values):
+        codes = self.codes
+        return np.fromiter((codes.setdefault(v, len(codes)) for v in values), dtype=np.int32, count=len(values))
+
+    def to_label_encoder(self):
+        """
+        LabelEncoder with sorted classes, plus the map from first-seen codes
+        to LabelEncoder codes
+        """
+        classes = np.array(list(self.codes), dtype=object)
+        order = np.argsort(classes.astype(str), kind='stable')
+        remap = np.empty(len(classes), dtype=np.int32)
+        remap[order] = np.arange(len(classes), dtype=np.int32)
+
+        encoder = LabelEncoder()
+        encoder.classes_ = classes[order]
+        return encoder, remap
+
+def load_training_arrays(path, chunk_rows, seed):
+    """
+    Stream the dataset into compact arrays
+
+    Returns:
+        (X float32 matrix, y int32 labels, dict of fitted LabelEncoders, row count)
+    """
+    encoders = {column: IncrementalEncoder() for column in CATEGORICAL_COLUMNS}
+    skill_parts, goal_parts, label_parts, numeric_parts = [], [], [], []
+    rows = 0
+
+    for chunk_index, chunk in enumerate(iter_training_chunks(path, CATEGORICAL_COLUMNS + NUMERIC_COLUMNS, chunk_rows)):
+        n = len(chunk)
+        row_index = np.arange(rows, rows + n)
+
+        skill_parts.append(encoders['skillLevel'].encode(chunk['skillLevel'].astype(str).tolist()))
+        goal_parts.append(encoders['goal'].encode(chunk['goal'].astype(str).tolist()))
+        label_parts.append(encoders['exercises'].encode(chunk['exercises'].astype(str).tolist()))
+
+        # Body metrics: use the dataset's values, synthesize missing ones deterministically
+        metrics = {}
+        for name in ('height', 'weight', 'age'):
+            if name in chunk.columns:
+                metrics[name] = chunk[name].to_numpy(dtype=np.float32)
+            else:
+                metrics[name] = synthesize_metric(row_index, seed, name)
+        if 'bmi' in chunk.columns:
+            metrics['bmi'] = chunk['bmi'].to_numpy(dtype=np.float32)
+        else:
+            metrics['bmi'] = metrics['weight'] / ((metrics['height'] / 100.0) ** 2)
+
+        numeric_parts.append(np.column_stack([metrics[name] for name in NUMERIC_COLUMNS]).astype(np.float32))
+        rows += n
+        print(f"   chunk {chunk_index + 1}: {rows} rows, {len(encoders['exercises'].codes)} distinct plans")
+
+    if rows == 0:
+        raise ValueError(f"Dataset {path} has no rows")
+
+    label_encoders = {}
+    remaps = {}
+    for column, encoder in encoders.items():
+        label_encoders[column], remaps[column] = encoder.to_label_encoder()
+
+    skill = remaps['skillLevel'][np.concatenate(skill_parts)]
+    goal = remaps['goal'][np.concatenate(goal_parts)]
+    y = remaps['exercises'][np.concatenate(label_parts)]
+    X = np.column_stack([skill, goal, np.concatenate(numeric_parts)]).astype(np.float32)
 
-# --- 2. Prepare the Data ---
-df['goal'] = df['goal'].astype(str)
-df['skillLevel'] = df['skillLevel'].astype(str)
+    return X, y, label_encoders, rows
 
-skill_encoder = LabelEncoder()
-goal_encoder = LabelEncoder()
+# --- 3. TRAINING ---
+def search_hyperparameters(X_train, y_train, args):
+    """Randomized search; candidates x folds are spread over n_jobs processes"""
+    search = RandomizedSearchCV(
+        RandomForestClassifier(random_state=args.seed, n_jobs=1),
+        PARAM_DISTRIBUTIONS,
+        n_iter=args.search_iter,
+        cv=KFold(n_splits=args.cv, shuffle=True, random_state=args.seed),
+        scoring='accuracy',
+        n_jobs=args.n_jobs,
+        random_state=args.seed,
+        refit=False,
+    )
+    search.fit(X_train, y_train)
+    print(f"   best CV accuracy {search.best_score_ * 100:.2f}% with {search.best_params_}")
+    return search.best_params_
 
-exercise_encoder = LabelEncoder()
+def parse_args():
+    parser = argparse.ArgumentParser(description='Train the exercise recommender model')
+    parser.add_argument('dataset', nargs='?', default=DEFAULT_DATASET, help='CSV or Parquet plan dataset')
+    parser.add_argument('--output-dir', default='.', help='Where the model and encoders are saved')
+    parser.add_argument('--n-jobs', type=int, default=-1, help='Parallel jobs for tree building and search (-1 = all cores)')
+    parser.add_argument('--n-estimators', type=int, default=100, help='Trees when not searching')
+    parser.add_argument('--search', action='store_true', help='Run a randomized hyperparameter search first')
+    parser.add_argument('--search-iter', type=int, default=10, help='Search candidates')
+    parser.add_argument('--cv', type=int, default=3, help='Cross-validation folds for the search')
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS, help='Rows per loading chunk')
+    parser.add_argument('--test-size', type=float, default=0.2, help='Held-out fraction')
+    parser.add_argument('--seed', type=int, default=42, help='Seed for splits, synthesis and the forest')
+    return parser.parse_args()
 
-df['skill_encoded'] = skill_encoder.fit_transform(df['skillLevel'])
-df['goal_encoded'] = goal_encoder.fit_transform(df['goal'])
+def main():
+    args = parse_args()
+    total_start = time.perf_counter()
 
-df['exercises_encoded'] = exercise_encoder.fit_transform(df['exercises'])
+    # --- Load the dataset ---
+    try:
+        with timed('Loading dataset'):
+            X, y, encoders, rows = load_training_arrays(args.dataset, args.chunk_rows, args.seed)
+    except FileNotFoundError:
+        print("Error: Dataset file not found.")
+        sys.exit(1)
+    print(f"   {rows} rows, features {X.shape[1]}, {X.nbytes / 1e6:.1f} MB feature matrix")
 
-# Ensure numeric auxiliary columns exist for training a 6-feature model
-# If not present, synthesize plausible values
-rng = np.random.default_rng(42)
-if 'height' not in df.columns:
-    df['height'] = rng.integers(150, 201, size=len(df))  # cm
-if 'weight' not in df.columns:
-    df['weight'] = rng.integers(50, 101, size=len(df))   # kg
-if 'age' not in df.columns:
-    df['age'] = rng.integers(16, 61, size=len(df))       # years
-if 'bmi' not in df.columns:
-    df['bmi'] = df['weight'] / ((df['height'] / 100.0) ** 2)
+    # --- Split Data into Training and Testing Sets ---
+    with timed('Splitting'):
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=args.test_size, random_state=args.seed)
 
-# --- 3. Split Data into Training and Testing Sets ---
-X = df[['skill_encoded', 'goal_encoded', 'bmi', 'age', 'weight', 'height']]
+    # --- Hyperparameter search ---
+    params = {'n_estimators': args.n_estimators}
+    if args.search:
+        with timed('Hyperparameter search'):
+            params = search_hyperparameters(X_train, y_train, args)
 
-y = df['exercises_encoded']
+    # --- Train Model ---
+    with timed('Training'):
+        model = RandomForestClassifier(random_state=args.seed, n_jobs=args.n_jobs, **params)
+        model.fit(X_train, y_train)
+    print("Model training complete!")
 
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    # --- Check the Model's Accuracy ---
+    with timed('Evaluation'):
+        y_pred = model.predict(X_test)
+        accuracy = accuracy_score(y_test, y_pred)
+    print(f"Model Accuracy on Test Data: {accuracy * 100:.2f}%")
 
-# --- 4. Train Model ---
-model = RandomForestClassifier(n_estimators=100, random_state=42)
-model.fit(X_train, y_train)
-print("Model training complete!")
+    # --- Save the Model and Encoders for Your App ---
+    with timed('Saving'):
+        os.makedirs(args.output_dir, exist_ok=True)
+        joblib.dump(model, os.path.join(args.output_dir, 'recommender_model.joblib'))
+        joblib.dump(encoders['skillLevel'], os.path.join(args.output_dir, 'skill_encoder.joblib'))
+        joblib.dump(encoders['goal'], os.path.join(args.output_dir, 'goal_encoder.joblib'))
+        joblib.dump(encoders['exercises'], os.path.join(args.output_dir, 'exercise_encoder.joblib'))
+    print("Model and encoders have been saved successfully.")
 
-# --- 5. Check the Model's Accuracy ---
-y_pred = model.predict(X_test)
-accuracy = accuracy_score(y_test, y_pred)
-print(f"Model Accuracy on Test Data: {accuracy * 100:.2f}%") # This should be much higher now!
+    # --- Compile the forest for the model server's fast inference path ---
+    with timed('Compiling forest'):
+        forest_dir = save_compiled_forest(compile_forest(model), os.path.join(args.output_dir, FOREST_DIR_NAME))
+    print(f"Compiled forest saved to {forest_dir}")
 
-# --- 6. Save the Model and Encoders for Your App ---
-joblib.dump(model, 'recommender_model.joblib')
-joblib.dump(skill_encoder, 'skill_encoder.joblib')
-joblib.dump(goal_encoder, 'goal_encoder.joblib')
+    # --- Report ---
+    report = {
+        'dataset': args.dataset,
+        'rows': rows,
+        'params': params,
+        'nJobs': args.n_jobs,
+        'accuracy': accuracy,
+        'phaseSeconds': {phase: round(seconds, 3) for phase, seconds in PHASE_TIMES.items()},
+        'totalSeconds': round(time.perf_counter() - total_start, 3),
+        'peakMemoryMb': peak_memory_mb(),
+    }
+    with open(os.path.join(args.output_dir, 'training_report.json'), 'w') as f:
+        json.dump(report, f, indent=2)
 
-joblib.dump(exercise_encoder, 'exercise_encoder.joblib')
+    print("\n📊 Training report:")
+    for phase, seconds in report['phaseSeconds'].items():
+        print(f"  - {phase}: {seconds:.2f}s")
+    print(f"  - Total: {report['totalSeconds']:.2f}s")
+    if report['peakMemoryMb'] is not None:
+        print(f"  - Peak memory: {report['peakMemoryMb']:.1f} MB")
 
-print("Model and encoders have been saved successfully.")
+if __name__ == "__main__":
+    main()
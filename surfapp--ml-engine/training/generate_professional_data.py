@@ -1,6 +1,14 @@
-import pandas as pd
-import random
+import argparse
+import csv
 import json
+import os
+import random
+import shutil
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import plan_dataset
 
 # ============================================================================
 # PROFESSIONAL CARDIO WORKOUT DATA GENERATOR
@@ -402,13 +410,46 @@ DURATION_TARGETS = {
     '20+ minutes': {'min': 1200, 'max': 2400, 'target': 1500}
 }
 
+# --- DATASET SAMPLING ---
+SKILL_LEVELS = ['Beginner', 'Intermediate', 'Pro']
+GOALS = ['Endurance', 'Power', 'Fat Loss', 'Stamina']
+EQUIPMENT_OPTIONS = ['None', 'Kettlebell', 'Gym']
+DURATION_RANGES = ['5-10 minutes', '10-20 minutes', '20+ minutes']
+
+# Common limitations to test
+LIMITATION_SETS = [
+    [],
+    ['Knee discomfort'],
+    ['Lower back issues'],
+    ['Shoulder injury'],
+    ['Ankle injury'],
+    ['Knee discomfort', 'Lower back issues'],
+    ['Wrist pain', 'Shoulder injury'],
+    ['Hip problems', 'Knee discomfort']
+]
+
+# CSV column order (matches the DataFrame built by generate_dataset)
+PLAN_COLUMNS = ['planName', 'skillLevel', 'goal', 'equipment', 'durationMinutes',
+                'focus', 'exercises', 'exerciseDetails']
+
+# --- PARALLEL GENERATION SETTINGS ---
+DEFAULT_SHARD_SIZE = 50000   # Plans per shard; each shard is one task and one file
+WRITE_BATCH_SIZE = 1000      # Rows buffered per shard before writing to disk
+
 # --- WORKOUT PLAN GENERATOR ---
-def generate_realistic_plan(skill_level, goal, equipment, duration_range, limitations=None):
+def generate_realistic_plan(skill_level, goal, equipment, duration_range, limitations=None, rng=None,
+                            details_as_json=True):
     """
     Generates a realistic, diverse workout plan based on user parameters
+    
+    rng is a random.Random for reproducible output; the module-level random
+    generator is used when it is omitted. With details_as_json=False the
+    exercise details stay a list of dicts (for columnar output).
     """
     if limitations is None:
         limitations = []
+    if rng is None:
+        rng = random
     
     # Get configurations
     goal_config = GOAL_CONFIGS[goal]
@@ -444,10 +485,10 @@ def generate_realistic_plan(skill_level, goal, equipment, duration_range, limita
     warmup_time = 0
     warmup_count = 0
     while warmup_time < warmup_target and warmup_count < 3 and warmup_pool:
-        ex_name, ex_data = random.choice(warmup_pool)
+        ex_name, ex_data = rng.choice(warmup_pool)
         warmup_pool.remove((ex_name, ex_data))
         
-        duration = random.randint(ex_data['duration_range'][0], ex_data['duration_range'][1])
+        duration = rng.randint(ex_data['duration_range'][0], ex_data['duration_range'][1])
         duration = int(duration * skill_modifier['intensity_multiplier'])
         
         selected_exercises.append({
@@ -480,21 +521,21 @@ def generate_realistic_plan(skill_level, goal, equipment, duration_range, limita
     
     while total_duration < duration_target * 0.95 and main_exercises_count < max_main:
         # 70% primary, 30% secondary
-        if random.random() < 0.7 and primary_pool:
-            ex_name, ex_data = random.choice(primary_pool)
+        if rng.random() < 0.7 and primary_pool:
+            ex_name, ex_data = rng.choice(primary_pool)
             primary_pool.remove((ex_name, ex_data))
         elif secondary_pool:
-            ex_name, ex_data = random.choice(secondary_pool)
+            ex_name, ex_data = rng.choice(secondary_pool)
             secondary_pool.remove((ex_name, ex_data))
         else:
             break
         
         # Calculate duration and sets
-        duration = random.randint(ex_data['duration_range'][0], ex_data['duration_range'][1])
+        duration = rng.randint(ex_data['duration_range'][0], ex_data['duration_range'][1])
         duration = int(duration * skill_modifier['intensity_multiplier'])
         
         sets_min, sets_max = goal_config['sets_range']
-        sets = random.randint(sets_min, sets_max)
+        sets = rng.randint(sets_min, sets_max)
         
         # Calculate rest based on intensity
         base_rest = 30 if ex_data['intensity'] in ['high', 'very_high'] else 20
@@ -532,37 +573,34 @@ def generate_realistic_plan(skill_level, goal, equipment, duration_range, limita
         'durationMinutes': actual_duration,
         'focus': goal,
         'exercises': exercises_str,
-        'exerciseDetails': json.dumps(selected_exercises)  # Store detailed info
+        'exerciseDetails': json.dumps(selected_exercises) if details_as_json else selected_exercises
     }
 
 # --- GENERATE DATASET ---
+def sample_plan_params(rng=None):
+    """Draw random (skill, goal, equipment, duration, limitations) for one plan"""
+    if rng is None:
+        rng = random
+    skill = rng.choice(SKILL_LEVELS)
+    goal = rng.choice(GOALS)
+    equipment = rng.choice(EQUIPMENT_OPTIONS)
+    duration = rng.choice(DURATION_RANGES)
+    limitations = rng.choice(LIMITATION_SETS)
+    return skill, goal, equipment, duration, limitations
+
 def generate_dataset(num_plans=2000):
     """
     Generate diverse, realistic workout plans
     """
+    import pandas as pd
+    
     print(f"🏋️ Generating {num_plans} professional cardio workout plans...")
     
     plans = []
     
-    # Common limitations to test
-    limitation_sets = [
-        [],
-        ['Knee discomfort'],
-        ['Lower back issues'],
-        ['Shoulder injury'],
-        ['Ankle injury'],
-        ['Knee discomfort', 'Lower back issues'],
-        ['Wrist pain', 'Shoulder injury'],
-        ['Hip problems', 'Knee discomfort']
-    ]
-    
     for i in range(num_plans):
         # Random parameters
-        skill = random.choice(['Beginner', 'Intermediate', 'Pro'])
-        goal = random.choice(['Endurance', 'Power', 'Fat Loss', 'Stamina'])
-        equipment = random.choice(['None', 'Kettlebell', 'Gym'])
-        duration = random.choice(['5-10 minutes', '10-20 minutes', '20+ minutes'])
-        limitations = random.choice(limitation_sets)
+        skill, goal, equipment, duration, limitations = sample_plan_params()
         
         # Generate plan
         try:
@@ -576,22 +614,227 @@ def generate_dataset(num_plans=2000):
     
     return pd.DataFrame(plans)
 
+# --- PARALLEL, SHARDED GENERATION ---
+def _empty_stats():
+    return {'skillLevel': Counter(), 'goal': Counter(), 'equipment': Counter(), 'durationMinutes': 0}
+
+class _CsvShardWriter:
+    """Streams plan dicts to a CSV file (exercise details as JSON strings)"""
+    
+    def __init__(self, path):
+        self.file = open(path, 'w', newline='', encoding='utf-8')
+        self.writer = csv.DictWriter(self.file, fieldnames=PLAN_COLUMNS, lineterminator='\n')
+        self.writer.writeheader()
+    
+    def write(self, plans, first_plan_id):
+        self.writer.writerows(plans)
+    
+    def close(self):
+        self.file.close()
+
+class _ParquetShardWriter:
+    """Streams plan dicts to a Parquet file, one row group per batch"""
+    
+    def __init__(self, path):
+        self.writer = plan_dataset.open_plan_writer(path)
+    
+    def write(self, plans, first_plan_id):
+        rows = [plan_dataset.plan_to_row(plan, first_plan_id + i) for i, plan in enumerate(plans)]
+        plan_dataset.write_plan_rows(self.writer, rows)
+    
+    def close(self):
+        self.writer.close()
+
+SHARD_WRITERS = {'csv': _CsvShardWriter, 'parquet': _ParquetShardWriter}
+
+def generate_shard(shard_index, num_plans, seed, output_path, output_format='csv', first_plan_id=0):
+    """
+    Generate one shard of plans and stream it to a CSV or Parquet file
+    
+    Each shard has its own random.Random seeded from (seed, shard_index), so
+    a shard's rows do not depend on which worker ran it or in what order.
+    Rows are written in batches of WRITE_BATCH_SIZE, keeping memory flat.
+    Parquet rows get planIds starting at first_plan_id.
+    
+    Returns:
+        Dict with shard index, path, row count, errors, seconds and stats
+    """
+    start = time.perf_counter()
+    rng = random.Random(f"{seed}:{shard_index}")
+    stats = _empty_stats()
+    rows_written = 0
+    errors = 0
+    
+    writer = SHARD_WRITERS[output_format](output_path)
+    try:
+        batch = []
+        
+        for _ in range(num_plans):
+            skill, goal, equipment, duration, limitations = sample_plan_params(rng)
+            try:
+                plan = generate_realistic_plan(skill, goal, equipment, duration, limitations, rng=rng,
+                                               details_as_json=(output_format == 'csv'))
+            except Exception:
+                errors += 1
+                continue
+            
+            batch.append(plan)
+            stats['skillLevel'][plan['skillLevel']] += 1
+            stats['goal'][plan['goal']] += 1
+            stats['equipment'][plan['equipment']] += 1
+            stats['durationMinutes'] += plan['durationMinutes']
+            
+            if len(batch) >= WRITE_BATCH_SIZE:
+                writer.write(batch, first_plan_id + rows_written)
+                rows_written += len(batch)
+                batch = []
+        
+        writer.write(batch, first_plan_id + rows_written)
+        rows_written += len(batch)
+    finally:
+        writer.close()
+    
+    return {
+        'shard': shard_index,
+        'path': output_path,
+        'rows': rows_written,
+        'errors': errors,
+        'seconds': time.perf_counter() - start,
+        'stats': stats
+    }
+
+def merge_shards(shard_paths, output_file):
+    """Concatenate shard CSVs (in the given order) into one file with a single header"""
+    with open(output_file, 'w', newline='', encoding='utf-8') as out:
+        for i, path in enumerate(shard_paths):
+            with open(path, 'r', newline='', encoding='utf-8') as shard:
+                header = shard.readline()
+                if i == 0:
+                    out.write(header)
+                shutil.copyfileobj(shard, out, 1024 * 1024)
+
+def generate_dataset_parallel(
+    num_plans,
+    output_file,
+    workers=None,
+    seed=42,
+    shard_size=DEFAULT_SHARD_SIZE,
+    shard_dir=None,
+    keep_shards=False,
+    output_format='csv'
+):
+    """
+    Generate a large dataset across a process pool and merge it into one file
+    
+    The plan count is split into shards of shard_size rows. Workers stream
+    their shard to disk and only return small summary stats, so memory stays
+    bounded no matter how many rows are generated. The merged file is the
+    same for a given (num_plans, seed, shard_size), whatever the worker count.
+    
+    Args:
+        num_plans: Total plans to generate
+        output_file: Merged CSV or Parquet path
+        workers: Worker processes (defaults to all cores)
+        seed: Base seed; shard i uses (seed, i)
+        shard_size: Plans per shard
+        shard_dir: Where shard files go (defaults to <output_file>.shards)
+        keep_shards: Keep shard files after merging
+        output_format: 'csv' or 'parquet' (columnar, see plan_dataset)
+    
+    Returns:
+        Dict with row count, shard count, timings and aggregated stats
+    """
+    workers = workers or os.cpu_count() or 1
+    shard_dir = shard_dir or f"{output_file}.shards"
+    os.makedirs(shard_dir, exist_ok=True)
+    
+    shard_counts = [shard_size] * (num_plans // shard_size)
+    if num_plans % shard_size:
+        shard_counts.append(num_plans % shard_size)
+    shard_paths = [os.path.join(shard_dir, f"shard-{i:05d}.{output_format}") for i in range(len(shard_counts))]
+    shard_offsets = [sum(shard_counts[:i]) for i in range(len(shard_counts))]
+    
+    print(f"🏋️ Generating {num_plans} plans in {len(shard_counts)} shards on {workers} workers...")
+    start = time.perf_counter()
+    
+    totals = _empty_stats()
+    rows = 0
+    errors = 0
+    
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(generate_shard, i, count, seed, path, output_format, offset)
+            for i, (count, path, offset) in enumerate(zip(shard_counts, shard_paths, shard_offsets))
+        ]
+        for done, future in enumerate(as_completed(futures), 1):
+            result = future.result()
+            rows += result['rows']
+            errors += result['errors']
+            for key in ('skillLevel', 'goal', 'equipment'):
+                totals[key].update(result['stats'][key])
+            totals['durationMinutes'] += result['stats']['durationMinutes']
+            print(f"  ✓ Shard {result['shard']} ({result['rows']} plans, {result['seconds']:.1f}s) "
+                  f"- {done}/{len(futures)} done")
+    
+    generate_seconds = time.perf_counter() - start
+    
+    merge_start = time.perf_counter()
+    if output_format == 'parquet':
+        plan_dataset.merge_parquet_files(shard_paths, output_file)
+    else:
+        merge_shards(shard_paths, output_file)
+    merge_seconds = time.perf_counter() - merge_start
+    
+    if not keep_shards:
+        shutil.rmtree(shard_dir, ignore_errors=True)
+    
+    if errors:
+        print(f"  ✗ {errors} plans failed to generate")
+    
+    return {
+        'rows': rows,
+        'errors': errors,
+        'shards': len(shard_counts),
+        'generateSeconds': generate_seconds,
+        'mergeSeconds': merge_seconds,
+        'stats': totals
+    }
+
 # --- MAIN EXECUTION ---
+def parse_args():
+    parser = argparse.ArgumentParser(description='Generate synthetic cardio workout plans')
+    parser.add_argument('--plans', type=int, default=2000, help='Number of plans to generate')
+    parser.add_argument('--output', default=None,
+                        help='Output file (default: cardio_plans_professional_<plans>.<format>)')
+    parser.add_argument('--format', choices=sorted(SHARD_WRITERS), default='csv', help='Output format')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: all cores)')
+    parser.add_argument('--seed', type=int, default=42, help='Base random seed')
+    parser.add_argument('--shard-size', type=int, default=DEFAULT_SHARD_SIZE, help='Plans per shard')
+    parser.add_argument('--keep-shards', action='store_true', help='Keep per-shard CSV files')
+    return parser.parse_args()
+
 if __name__ == "__main__":
-    # Generate dataset
-    df = generate_dataset(2000)
+    args = parse_args()
+    output_file = args.output or f'cardio_plans_professional_{args.plans}.{args.format}'
     
-    # Save to CSV
-    output_file = 'cardio_plans_professional_2000.csv'
-    df.to_csv(output_file, index=False)
+    # Generate dataset
+    result = generate_dataset_parallel(
+        args.plans,
+        output_file,
+        workers=args.workers,
+        seed=args.seed,
+        shard_size=args.shard_size,
+        keep_shards=args.keep_shards,
+        output_format=args.format
+    )
+    stats = result['stats']
     
-    print(f"\n✅ SUCCESS! Generated {len(df)} plans")
+    print(f"\n✅ SUCCESS! Generated {result['rows']} plans")
     print(f"📁 Saved to: {output_file}")
+    print(f"⏱️  Generation: {result['generateSeconds']:.1f}s, merge: {result['mergeSeconds']:.1f}s "
+          f"({result['rows'] / max(result['generateSeconds'], 1e-9):.0f} plans/s)")
     print(f"\n📊 Dataset Statistics:")
-    print(f"  - Skill Levels: {df['skillLevel'].value_counts().to_dict()}")
-    print(f"  - Goals: {df['goal'].value_counts().to_dict()}")
-    print(f"  - Equipment: {df['equipment'].value_counts().to_dict()}")
-    print(f"  - Avg Duration: {df['durationMinutes'].mean():.1f} minutes")
-    print(f"  - Unique Plans: {df['exercises'].nunique()}")
-    print(f"\n🎯 Sample Plans:")
-    print(df[['planName', 'exercises', 'durationMinutes']].head(3).to_string(index=False))
\ No newline at end of file
+    print(f"  - Skill Levels: {dict(stats['skillLevel'])}")
+    print(f"  - Goals: {dict(stats['goal'])}")
+    print(f"  - Equipment: {dict(stats['equipment'])}")
+    print(f"  - Avg Duration: {stats['durationMinutes'] / max(result['rows'], 1):.1f} minutes")
@@ -0,0 +1,215 @@
+"""
+Plan Dataset Storage
+Columnar (Parquet/Arrow) format for generated cardio plans
+
+Each plan is one row. Categorical columns (skill, goal, equipment, focus,
+plan name) are dictionary-encoded, `exercises` is a list of names and
+`exerciseDetails` a list of structs, so nothing has to be split or
+JSON-parsed when loading. Readers select only the columns they need.
+
+Requires pyarrow (pip install pyarrow); CSV datasets keep working without it.
+"""
+
+import json
+import os
+from typing import Dict, Iterable, List, Optional
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    pa = pc = pq = None
+    PYARROW_AVAILABLE = False
+
+PARQUET_COMPRESSION = 'zstd'
+CSV_CHUNK_ROWS = 50000  # Rows converted per chunk when migrating CSV datasets
+
+DETAIL_FIELDS = ['name', 'duration', 'sets', 'rest', 'category']
+
+def _require_pyarrow():
+    if not PYARROW_AVAILABLE:
+        raise ImportError("pyarrow is required for Parquet plan datasets: pip install pyarrow")
+
+def plan_schema():
+    """Arrow schema of the plans table"""
+    _require_pyarrow()
+    categorical = pa.dictionary(pa.int32(), pa.string())
+    detail = pa.struct([
+        ('name', pa.string()),
+        ('duration', pa.int32()),
+        ('sets', pa.int32()),
+        ('rest', pa.int32()),
+        ('category', pa.string()),
+    ])
+    return pa.schema([
+        ('planId', pa.int64()),
+        ('planName', categorical),
+        ('skillLevel', categorical),
+        ('goal', categorical),
+        ('equipment', categorical),
+        ('durationMinutes', pa.int32()),
+        ('focus', categorical),
+        ('exercises', pa.list_(pa.string())),
+        ('exerciseDetails', pa.list_(detail)),
+    ])
+
+# ============================================================================
+# WRITING
+# ============================================================================
+
+def plan_to_row(plan: Dict, plan_id: int) -> Dict:
+    """
+    Convert a generated plan dict into a plans-table row
+
+    Accepts both the CSV form (';'-joined exercises, JSON exerciseDetails)
+    and the in-memory form (lists).
+    """
+    exercises = plan['exercises']
+    if isinstance(exercises, str):
+        exercises = exercises.split(';') if exercises else []
+
+    details = plan.get('exerciseDetails') or []
+    if isinstance(details, str):
+        details = json.loads(details)
+
+    return {
+        'planId': plan_id,
+        'planName': plan['planName'],
+        'skillLevel': plan['skillLevel'],
+        'goal': plan['goal'],
+        'equipment': plan['equipment'],
+        'durationMinutes': int(plan['durationMinutes']),
+        'focus': plan['focus'],
+        'exercises': exercises,
+        'exerciseDetails': [{field: d.get(field) for field in DETAIL_FIELDS} for d in details],
+    }
+
+def rows_to_table(rows: List[Dict]):
+    """Build an Arrow table from plans-table rows"""
+    return pa.Table.from_pylist(rows, schema=plan_schema())
+
+def open_plan_writer(path: str):
+    """Parquet writer for the plans schema; write tables with write_plan_rows"""
+    _require_pyarrow()
+    return pq.ParquetWriter(path, plan_schema(), compression=PARQUET_COMPRESSION)
+
+def write_plan_rows(writer, rows: List[Dict]):
+    """Append one batch of rows to an open plan writer as a row group"""
+    if rows:
+        writer.write_table(rows_to_table(rows))
+
+def merge_parquet_files(paths: Iterable[str], output_file: str):
+    """Concatenate plan Parquet files, streaming one record batch at a time"""
+    _require_pyarrow()
+    with open_plan_writer(output_file) as writer:
+        for path in paths:
+            for batch in pq.ParquetFile(path).iter_batches():
+                writer.write_batch(batch)
+
+def csv_to_parquet(csv_path: str, parquet_path: Optional[str] = None, chunk_rows: int = CSV_CHUNK_ROWS) -> str:
+    """
+    Convert an existing CSV plan dataset to Parquet (JSON is parsed once, here)
+
+    Returns:
+        Path of the written Parquet file
+    """
+    import pandas as pd
+
+    _require_pyarrow()
+    parquet_path = parquet_path or os.path.splitext(csv_path)[0] + '.parquet'
+
+    plan_id = 0
+    with open_plan_writer(parquet_path) as writer:
+        for chunk in pd.read_csv(csv_path, chunksize=chunk_rows, keep_default_na=False):
+            rows = []
+            for plan in chunk.to_dict('records'):
+                rows.append(plan_to_row(plan, plan_id))
+                plan_id += 1
+            write_plan_rows(writer, rows)
+
+    return parquet_path
+
+# ============================================================================
+# READING
+# ============================================================================
+
+def _join_exercises(table):
+    """Replace the exercises list column with its ';'-joined string form"""
+    if 'exercises' not in table.column_names:
+        return table
+    joined = pc.binary_join(table['exercises'], ';')
+    return table.set_column(table.column_names.index('exercises'), 'exercises', joined)
+
+def read_plans_table(path: str, columns: Optional[List[str]] = None):
+    """Read the plans table (or only the given columns) as an Arrow table"""
+    _require_pyarrow()
+    return pq.read_table(path, columns=columns)
+
+def load_plans(path: str, columns: Optional[List[str]] = None, exercises_as: str = 'list'):
+    """
+    Load plans into a pandas DataFrame
+
+    Args:
+        path: Parquet dataset
+        columns: Columns to read (all when None); unread columns cost nothing
+        exercises_as: 'list' keeps exercises as lists, 'string' joins them
+            with ';' (the CSV representation) inside Arrow
+
+    Returns:
+        DataFrame with pandas categoricals for the dictionary-encoded columns
+    """
+    table = read_plans_table(path, columns)
+
+    if exercises_as == 'string':
+        table = _join_exercises(table)
+
+    return table.to_pandas()
+
+def load_exercise_details(path: str, fields: Optional[List[str]] = None):
+    """
+    Flatten exerciseDetails into a child table: one row per (planId, position)
+
+    Args:
+        path: Parquet dataset
+        fields: Detail fields to keep (all when None)
+
+    Returns:
+        DataFrame with planId, position and the selected detail fields
+    """
+    import numpy as np
+    import pandas as pd
+
+    table = read_plans_table(path, ['planId', 'exerciseDetails'])
+    details = table['exerciseDetails'].combine_chunks()
+
+    parents = pc.list_parent_indices(details).to_numpy()
+    offsets = details.offsets.to_numpy()
+    position = np.arange(len(parents)) - (offsets[parents] - offsets[0])
+    flat = pc.list_flatten(details)
+
+    frame = {
+        'planId': table['planId'].to_numpy()[parents],
+        'position': position,
+    }
+    for field in fields or DETAIL_FIELDS:
+        frame[field] = flat.field(field).to_numpy(zero_copy_only=False)
+    return pd.DataFrame(frame)
+
+def iter_training_chunks(path: str, columns: List[str], chunk_rows: int = CSV_CHUNK_ROWS):
+    """
+    Yield the given columns of a CSV or Parquet plan dataset as DataFrames of
+    at most chunk_rows rows, so datasets larger than memory can be streamed
+    """
+    import pandas as pd
+
+    if path.endswith('.parquet'):
+        _require_pyarrow()
+        parquet_file = pq.ParquetFile(path)
+        available = [c for c in columns if c in parquet_file.schema_arrow.names]
+        for batch in parquet_file.iter_batches(batch_size=chunk_rows, columns=available):
+            yield _join_exercises(pa.Table.from_batches([batch])).to_pandas()
+        return
+
+    yield from pd.read_csv(path, usecols=lambda column: column in columns, chunksize=chunk_rows)
@@ -0,0 +1,453 @@
+"""
+Replay Drills
+Offline replay of landmark recordings through the drill coaches and the pose
+post-processing functions, without a webcam or MediaPipe
+
+Frames come from .lmk recordings (services/landmark_recorder.py, written by
+the pose service with POSE_RECORDING_DIR or by synthetic_landmarks.py).
+Every frame is run through each drill's DrillSession with its recorded
+timestamp, plus calculate_detection_quality, calculate_stability_score, the
+rolling TemporalStability, check_body_completeness and
+determine_calibration_status. Joint angles for a whole recording come from
+one kinematics call.
+
+To check a threshold or scoring change, compare two versions:
+    --baseline REF        replay with the services code at git REF as well
+                          (run in a subprocess from a `git archive` export)
+    --override NAME=VAL   replay with a module constant changed, e.g.
+                          STANCE_KNEE_MIN=85 or drill_engine.PUMP_KNEE_LOW_MAX=100
+With either, the report shows per-drill and per-metric differences between
+the baseline and the candidate (current tree plus overrides).
+
+A baseline ref uses its own pose_detection, and its own drill_engine and
+kinematics where it has them. Modules it predates fall back to the current
+tree and run against the ref's pose_detection (kinematics keeps its own
+landmark table for trees whose pose_detection has none), so any ref back to
+the original services can be compared on the pose metrics; drill outputs only
+differ from refs that have a drill_engine. The report lists the modules taken
+from the current tree. Refs whose pose_detection imports cv2, mediapipe and
+PIL at module level need those installed.
+
+Usage:
+    python replay_drills.py recordings/ [--drills stance,popup] [--output frames.jsonl]
+                            [--baseline HEAD~1] [--override STANCE_KNEE_MIN=85] [--fail-on-diff]
+"""
+
+import argparse
+import ast
+import inspect
+import io
+import json
+import os
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+from collections import Counter
+
+import numpy as np
+
+TRAINING_DIR = os.path.dirname(os.path.abspath(__file__))
+SERVICES_DIR = os.path.abspath(os.path.join(TRAINING_DIR, '..', 'services'))
+
+DIFF_EXAMPLES = 5          # Differing frames listed per drill
+METRIC_TOLERANCE = 1e-6    # Numeric differences below this are ignored
+OVERRIDE_MODULES = ('drill_engine', 'pose_detection', 'kinematics')
+NUMERIC_POSE_METRICS = ('detectionQuality', 'stabilityScore', 'temporalStability')
+
+# ============================================================================
+# LOADING
+# ============================================================================
+
+def find_recordings(paths):
+    """Expand directories to the .lmk files inside them"""
+    from landmark_recorder import RECORDING_SUFFIX
+
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(
+                os.path.join(path, name) for name in os.listdir(path) if name.endswith(RECORDING_SUFFIX)
+            ))
+        else:
+            files.append(path)
+    return files
+
+def records_to_frames(records):
+    """Recording records -> landmark dicts in the pose service's format (None when missing)"""
+    from kinematics import LANDMARK_NAMES
+
+    landmarks = np.asarray(records['landmarks'], dtype=np.float64)
+    present = ~np.isnan(landmarks[:, :, 0])
+    frames = []
+    for values, mask, detected in zip(landmarks.tolist(), present.tolist(), records['personDetected'].tolist()):
+        if not detected:
+            frames.append(None)
+            continue
+        frames.append({
+            name: {'x': v[0], 'y': v[1], 'z': v[2], 'visibility': v[3]} if ok else None
+            for name, v, ok in zip(LANDMARK_NAMES, values, mask)
+        })
+    return frames
+
+# ============================================================================
+# REPLAY
+# ============================================================================
+
+def apply_overrides(overrides):
+    """Set module constants from NAME=VALUE strings; returns what was changed"""
+    import importlib
+
+    applied = {}
+    for override in overrides:
+        name, _, raw = override.partition('=')
+        if not raw:
+            raise ValueError(f"Override must look like NAME=VALUE: {override}")
+        value = ast.literal_eval(raw)
+        module_name, _, attr = name.rpartition('.')
+        candidates = [module_name] if module_name else OVERRIDE_MODULES
+        for candidate in candidates:
+            module = importlib.import_module(candidate)
+            if hasattr(module, attr):
+                applied[f"{candidate}.{attr}"] = {'from': getattr(module, attr), 'to': value}
+                setattr(module, attr, value)
+                break
+        else:
+            raise ValueError(f"No constant {name} in {', '.join(candidates)}")
+    return applied
+
+def replay(files, drills):
+    """
+    Run every frame of every recording through the drills and pose metrics
+
+    Returns:
+        Column-oriented results: per-frame lists for each drill's stage,
+        rep count, feedback and metrics, and for each pose metric
+    """
+    import drill_engine
+    import pose_detection
+    from landmark_recorder import open_recording
+
+    try:
+        from kinematics import frames_to_array, joint_angles
+    except ImportError:
+        frames_to_array = joint_angles = None
+    pass_angles = joint_angles is not None and 'angles' in inspect.signature(drill_engine.DrillSession.analyze).parameters
+
+    drills = drills or list(drill_engine.DRILL_COACHES)
+    results = {
+        'recordings': [],
+        'frame': [],
+        'timestamp': [],
+        'drills': {drill: {'stage': [], 'repCount': [], 'feedback': [], 'cue': [], 'metrics': []} for drill in drills},
+        'pose': {'detectionQuality': [], 'stabilityScore': [], 'temporalStability': [],
+                 'calibrationStatus': [], 'bodyCompleteness': []},
+    }
+
+    start = time.perf_counter()
+    for path in files:
+        records = open_recording(path)
+        frames = records_to_frames(records)
+        timestamps = records['timestamp'].tolist()
+        angles = joint_angles(frames_to_array(frames)) if pass_angles and frames else None
+        results['recordings'].append({'path': path, 'frames': len(frames)})
+        results['frame'].extend(range(len(frames)))
+        results['timestamp'].extend(timestamps)
+
+        for drill in drills:
+            session = drill_engine.DrillSession(drill)
+            columns = results['drills'][drill]
+            for i, (frame, now) in enumerate(zip(frames, timestamps)):
+                if pass_angles:
+                    out = session.analyze(frame, now=now, angles=angles[i])
+                else:
+                    out = session.analyze(frame, now=now)
+                columns['stage'].append(out['stage'])
+                columns['repCount'].append(out['repCount'])
+                columns['feedback'].append(' | '.join(line['text'] for line in out['feedback']))
+                columns['cue'].append(next(  # Last coaching line that isn't a "Label: value" readout
+                    (line['text'] for line in reversed(out['feedback']) if ': ' not in line['text']),
+                    out['feedback'][-1]['text'] if out['feedback'] else ''
+                ))
+                columns['metrics'].append(out['metrics'])
+
+        pose = results['pose']
+        # Baselines from before the temporal metric existed report None
+        temporal = pose_detection.TemporalStability() if hasattr(pose_detection, 'TemporalStability') else None
+        for frame, now in zip(frames, timestamps):
+            if frame is None:
+                pose['detectionQuality'].append(0.0)
+                pose['stabilityScore'].append(0.0)
+                pose['temporalStability'].append(None)
+                pose['calibrationStatus'].append('not_detected')
+                pose['bodyCompleteness'].append(None)
+                continue
+            bounding_box = pose_detection.calculate_person_bounding_box(frame)
+            pose['detectionQuality'].append(pose_detection.calculate_detection_quality(frame))
+            pose['stabilityScore'].append(pose_detection.calculate_stability_score(frame))
+            pose['temporalStability'].append(temporal.update(frame, now=now) if temporal else None)
+            pose['calibrationStatus'].append(pose_detection.determine_calibration_status(frame, bounding_box))
+            pose['bodyCompleteness'].append(pose_detection.check_body_completeness(frame))
+
+    results['seconds'] = time.perf_counter() - start
+    return results
+
+def run_baseline(ref, files, drills):
+    """Replay with the services code at a git ref, in a subprocess"""
+    toplevel, prefix = subprocess.run(
+        ['git', 'rev-parse', '--show-toplevel', '--show-prefix'], cwd=SERVICES_DIR,
+        capture_output=True, text=True, check=True
+    ).stdout.splitlines()
+    archive = subprocess.run(
+        ['git', 'archive', '--format=tar', f"{ref}:{prefix.rstrip('/')}"], cwd=toplevel, capture_output=True
+    )
+    if archive.returncode != 0:
+        raise RuntimeError(f"Cannot export services at {ref}: {archive.stderr.decode().strip()}")
+
+    with tempfile.TemporaryDirectory(prefix='replay-baseline-') as tmp:
+        with tarfile.open(fileobj=io.BytesIO(archive.stdout)) as tar:
+            tar.extractall(tmp)
+        output = os.path.join(tmp, 'baseline.json')
+        command = [sys.executable, os.path.abspath(__file__), *files,
+                   '--services-dir', tmp, '--emit', output]
+        if drills:
+            command += ['--drills', ','.join(drills)]
+        completed = subprocess.run(command, capture_output=True, text=True)
+        if completed.returncode != 0:
+            stderr = completed.stderr.strip()
+            hint = ''
+            if 'ImportError' in stderr or 'ModuleNotFoundError' in stderr or 'AttributeError' in stderr:
+                hint = (f"\n(The services code at {ref} could not be imported here; older pose_detection "
+                        "modules import cv2, mediapipe and PIL at module level)")
+            raise RuntimeError(f"Baseline replay at {ref} failed:\n{stderr}{hint}")
+        with open(output) as f:
+            return json.load(f)
+
+# ============================================================================
+# REPORTING
+# ============================================================================
+
+def summarize(results):
+    print(f"{'drill':<14} {'reps':>6} {'stage changes':>14}  most common cue")
+    for drill, columns in results['drills'].items():
+        stages = columns['stage']
+        changes = sum(1 for a, b in zip(stages, stages[1:]) if a != b)
+        reps = _total_reps(results, drill)
+        common = Counter(columns['cue']).most_common(1)
+        print(f"{drill:<14} {reps:>6} {changes:>14}  {common[0][0] if common else ''}")
+
+    pose = results['pose']
+    if pose['detectionQuality']:
+        print()
+        temporal = [v for v in pose['temporalStability'] if v is not None]
+        print(f"Detection quality: mean {np.mean(pose['detectionQuality']):.3f}   "
+              f"Stability: mean {np.mean(pose['stabilityScore']):.3f}   "
+              f"Temporal stability: mean {np.mean(temporal) if temporal else float('nan'):.3f}")
+        statuses = Counter(pose['calibrationStatus'])
+        print("Calibration: " + ', '.join(f"{status} {count}" for status, count in statuses.most_common()))
+
+def _recording_starts(results):
+    starts, total = [], 0
+    for rec in results['recordings']:
+        starts.append(total)
+        total += rec['frames']
+    return starts
+
+def _numeric_diff(a, b):
+    """Differences between two metric columns; None (no value) counts as a change against a value"""
+    a = np.array([np.nan if v is None else v for v in a], dtype=float)
+    b = np.array([np.nan if v is None else v for v in b], dtype=float)
+    both = ~np.isnan(a) & ~np.isnan(b)
+    delta = np.abs(a[both] - b[both])
+    return {
+        'changedFrames': int((delta > METRIC_TOLERANCE).sum() + (np.isnan(a) != np.isnan(b)).sum()),
+        'meanAbsDiff': round(float(delta.mean()), 6) if len(delta) else 0.0,
+        'maxAbsDiff': round(float(delta.max()), 6) if len(delta) else 0.0,
+        'meanBaseline': round(float(np.nanmean(a)), 6) if (~np.isnan(a)).any() else None,
+        'meanCandidate': round(float(np.nanmean(b)), 6) if (~np.isnan(b)).any() else None,
+    }
+
+def diff_results(baseline, candidate):
+    """Aggregate differences between two replays of the same recordings"""
+    n = len(candidate['frame'])
+    if len(baseline['frame']) != n:
+        raise ValueError("Baseline and candidate replayed different frames")
+
+    report = {'frames': n, 'drills': {}, 'pose': {}}
+    for drill, cand in candidate['drills'].items():
+        base = baseline['drills'].get(drill)
+        if base is None:
+            report['drills'][drill] = {'missingInBaseline': True}
+            continue
+        differing = [
+            i for i in range(n)
+            if base['feedback'][i] != cand['feedback'][i] or base['stage'][i] != cand['stage'][i]
+            or base['repCount'][i] != cand['repCount'][i]
+        ]
+        report['drills'][drill] = {
+            'changedFrames': len(differing),
+            'repsBaseline': _total_reps(baseline, drill),
+            'repsCandidate': _total_reps(candidate, drill),
+            'examples': [
+                {'frame': candidate['frame'][i], 'timestamp': candidate['timestamp'][i],
+                 'baseline': base['feedback'][i], 'candidate': cand['feedback'][i]}
+                for i in differing[:DIFF_EXAMPLES]
+            ],
+        }
+
+    for metric in NUMERIC_POSE_METRICS:
+        report['pose'][metric] = _numeric_diff(baseline['pose'][metric], candidate['pose'][metric])
+    status_changes = Counter(
+        f"{a} -> {b}" for a, b in zip(baseline['pose']['calibrationStatus'], candidate['pose']['calibrationStatus'])
+        if a != b
+    )
+    report['pose']['calibrationStatus'] = {'changedFrames': sum(status_changes.values()),
+                                           'transitions': dict(status_changes.most_common())}
+    report['pose']['bodyCompleteness'] = {'changedFrames': sum(
+        1 for a, b in zip(baseline['pose']['bodyCompleteness'], candidate['pose']['bodyCompleteness']) if a != b
+    )}
+    return report
+
+def _total_reps(results, drill):
+    reps = results['drills'][drill]['repCount']
+    return sum(
+        reps[start + rec['frames'] - 1]
+        for start, rec in zip(_recording_starts(results), results['recordings']) if rec['frames']
+    )
+
+def print_diff(report):
+    print(f"{'drill':<14} {'changed frames':>15} {'reps (base -> new)':>20}")
+    for drill, d in report['drills'].items():
+        if d.get('missingInBaseline'):
+            print(f"{drill:<14} {'(not in baseline)':>15}")
+            continue
+        pct = 100 * d['changedFrames'] / report['frames'] if report['frames'] else 0
+        print(f"{drill:<14} {d['changedFrames']:>8} ({pct:4.1f}%) {d['repsBaseline']:>9} -> {d['repsCandidate']}")
+        for example in d['examples']:
+            print(f"    frame {example['frame']}: {example['baseline']}")
+            print(f"    {' ' * len(str(example['frame']))}    -> {example['candidate']}")
+    print()
+    for metric in NUMERIC_POSE_METRICS:
+        m = report['pose'][metric]
+        means = ' -> '.join('n/a' if v is None else f"{v:.4f}" for v in (m['meanBaseline'], m['meanCandidate']))
+        print(f"{metric:<18} changed {m['changedFrames']:>6}  mean {means}  max |diff| {m['maxAbsDiff']:.4f}")
+    calibration = report['pose']['calibrationStatus']
+    print(f"{'calibrationStatus':<18} changed {calibration['changedFrames']:>6}  "
+          + ', '.join(f"{k}: {v}" for k, v in list(calibration['transitions'].items())[:5]))
+    print(f"{'bodyCompleteness':<18} changed {report['pose']['bodyCompleteness']['changedFrames']:>6}")
+
+def has_differences(report):
+    return (any(d.get('changedFrames') for d in report['drills'].values())
+            or any(m['changedFrames'] for m in report['pose'].values()))
+
+def write_frames(results, path):
+    """One JSON line per frame with every drill's output and the pose metrics"""
+    with open(path, 'w') as f:
+        for i, frame in enumerate(results['frame']):
+            row = {'frame': frame, 'timestamp': results['timestamp'][i]}
+            for drill, columns in results['drills'].items():
+                row[drill] = {key: columns[key][i] for key in ('stage', 'repCount', 'feedback', 'cue', 'metrics')}
+            row['pose'] = {key: values[i] for key, values in results['pose'].items()}
+            f.write(json.dumps(row) + '\n')
+
+# ============================================================================
+# MAIN
+# ============================================================================
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Replay landmark recordings through the drill coaches')
+    parser.add_argument('inputs', nargs='+', help='.lmk recordings or directories of them')
+    parser.add_argument('--drills', default='', help='Comma-separated drill ids (default: all)')
+    parser.add_argument('--output', help='Write per-frame outputs as JSON lines')
+    parser.add_argument('--baseline', help='Git ref whose services code is the baseline')
+    parser.add_argument('--override', action='append', default=[], help='NAME=VALUE constant for the candidate run')
+    parser.add_argument('--report', help='Write the diff report as JSON')
+    parser.add_argument('--fail-on-diff', action='store_true', help='Exit 1 when baseline and candidate differ')
+    # Internal: used for the baseline subprocess
+    parser.add_argument('--services-dir', default=SERVICES_DIR, help=argparse.SUPPRESS)
+    parser.add_argument('--emit', help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    sys.path.insert(0, args.services_dir)
+    if args.services_dir != SERVICES_DIR:
+        # Fallback for modules the baseline ref predates (e.g. the recording reader);
+        # the ref's own modules come first, so these import its pose_detection
+        sys.path.append(SERVICES_DIR)
+    drills = [d for d in args.drills.split(',') if d]
+
+    files = find_recordings(args.inputs)
+    if not files:
+        print("❌ No recordings found")
+        return False
+
+    if args.emit:
+        # Baseline subprocess: replay and hand the columns back
+        results = replay(files, drills)
+        results['currentTreeModules'] = [
+            name for name in OVERRIDE_MODULES
+            if os.path.dirname(os.path.abspath(sys.modules[name].__file__)) == SERVICES_DIR
+        ]
+        with open(args.emit, 'w') as f:
+            json.dump(results, f)
+        return True
+
+    print("=" * 80)
+    print("REPLAYING DRILLS")
+    print("=" * 80)
+
+    baseline = None
+    if args.baseline:
+        print(f"Baseline: services at {args.baseline}")
+        baseline = run_baseline(args.baseline, files, drills)
+        if baseline['currentTreeModules']:
+            print(f"   {', '.join(baseline['currentTreeModules'])} from the current tree (not in {args.baseline})")
+    elif args.override:
+        print("Baseline: current code")
+        baseline = replay(files, drills)
+
+    applied = apply_overrides(args.override)
+    for name, change in applied.items():
+        print(f"Override: {name} {change['from']} -> {change['to']}")
+
+    results = replay(files, drills)
+    n = len(results['frame'])
+    fps = n / results['seconds'] if results['seconds'] else 0.0
+    print(f"{len(files)} recordings, {n} frames, {len(results['drills'])} drills "
+          f"in {results['seconds']:.2f}s ({fps:,.0f} frames/s)")
+    print()
+    summarize(results)
+
+    if args.output:
+        write_frames(results, args.output)
+        print(f"\n💾 Per-frame outputs written to {args.output}")
+
+    if baseline is None:
+        return True
+
+    report = diff_results(baseline, results)
+    report['overrides'] = {name: change['to'] for name, change in applied.items()}
+    report['baseline'] = args.baseline or 'current'
+    if baseline.get('currentTreeModules'):
+        report['baselineCurrentTreeModules'] = baseline['currentTreeModules']
+    print()
+    print("=" * 80)
+    print("DIFFERENCES (baseline -> candidate)")
+    print("=" * 80)
+    print_diff(report)
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Diff report written to {args.report}")
+
+    if has_differences(report):
+        print("\n⚠️  OUTPUTS DIFFER FROM BASELINE")
+        return not args.fail_on_diff
+    print("\n✅ NO DIFFERENCES FROM BASELINE")
+    return True
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
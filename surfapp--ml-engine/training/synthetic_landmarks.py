@@ -0,0 +1,427 @@
+"""
+Synthetic Landmarks
+Procedural 17-landmark pose sequences for every drill, without a camera
+
+Each drill is a looped timeline of keyframe poses (held, then blended into
+the next with a smoothstep). A pose is a handful of body parameters (knee,
+hip, shoulder and elbow angles, shin lean, head lift, shoulder twist and
+roll, whole-body drift and drop) that a 2D skeleton is built from, foot
+first: ankle -> knee -> hip -> shoulders -> arms and head. The joint angles
+the drill coaches measure therefore follow the keyframe values.
+
+Everything is computed over whole frame arrays, so a session of any length
+costs a few NumPy passes. Variation is parametric:
+    tempo       timeline speed (1.0 = keyframe durations as written)
+    noise       per-landmark jitter (normalized image units)
+    sway        slow drift of the joint angles (degrees)
+    occlusion   fraction of frames with one body part occluded (low visibility)
+    dropout     fraction of frames with no person detected
+Per session, body size, facing direction and timeline phase are random.
+
+Output is in the pose service's formats: landmark dicts as built by
+pose_detection.extract_landmarks, or .lmk recordings
+(services/landmark_recorder.py) for replay_drills.py and load tests.
+
+Usage:
+    python synthetic_landmarks.py --out-dir synthetic_recordings --seconds 600 --sessions 4
+    python synthetic_landmarks.py --verify
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+TRAINING_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.abspath(os.path.join(TRAINING_DIR, '..', 'services')))
+
+from kinematics import LANDMARK_INDEX, LANDMARK_NAMES, joint_angles  # noqa: E402
+from landmark_recorder import RECORD_DTYPE, RECORDING_SUFFIX, write_recording  # noqa: E402
+
+DEFAULT_FPS = 30.0
+DEFAULT_NOISE = 0.004       # Landmark jitter std, normalized image units
+DEFAULT_SWAY = 3.0          # Joint-angle drift amplitude, degrees
+CHUNK_FRAMES = 50000        # Frames generated per NumPy pass when writing files
+OCCLUSION_FRAMES = (5, 30)  # Length range of one occlusion event
+SWAY_FREQUENCIES = np.array([0.13, 0.31, 0.57])  # Hz
+
+# Segment lengths at body scale 1 (normalized image units)
+SHIN, THIGH, TRUNK = 0.2, 0.21, 0.26
+UPPER_ARM, FOREARM = 0.15, 0.13
+NECK, FACE = 0.07, 0.03
+SHOULDER_SPAN = 0.2         # Shoulder-to-shoulder width facing the camera
+
+# ============================================================================
+# POSES
+# ============================================================================
+
+# Body parameters, in this order in every pose vector:
+#   x, ground    ankle midpoint
+#   stance       left/right separation of ankles and hips
+#   shin         shin lean from vertical (degrees, + toward facing direction)
+#   knee, hip    joint angles; hip over 180 bends the other way (extension)
+#   shoulder     hip-shoulder-elbow angle (0 = arm along the torso)
+#   elbow        joint angle
+#   head         head lift relative to the torso line (degrees)
+#   twist        0 = shoulders square to the camera, 1 = side on
+#   roll         shoulder line tilt against the hip line (degrees)
+#   drift, drop  whole-body offset (falling)
+PARAMS = ('x', 'ground', 'stance', 'shin', 'knee', 'hip', 'shoulder', 'elbow',
+          'head', 'twist', 'roll', 'drift', 'drop')
+P = {name: i for i, name in enumerate(PARAMS)}
+
+STANDING = {
+    'x': 0.5, 'ground': 0.88, 'stance': 0.12, 'shin': 25.0, 'knee': 170.0, 'hip': 175.0,
+    'shoulder': 15.0, 'elbow': 165.0, 'head': 0.0, 'twist': 0.0, 'roll': 0.0, 'drift': 0.0, 'drop': 0.0,
+}
+PRONE = {**STANDING, 'x': 0.12, 'ground': 0.78, 'stance': 0.02, 'shin': 90.0, 'knee': 172.0,
+         'hip': 175.0, 'shoulder': 90.0, 'elbow': 160.0, 'head': 10.0, 'twist': 0.8}
+
+def pose(base=STANDING, **changes) -> np.ndarray:
+    """Pose vector from a base pose with some parameters changed"""
+    values = {**base, **changes}
+    return np.array([values[name] for name in PARAMS], dtype=np.float64)
+
+SURF_STANCE = dict(knee=118.0, hip=155.0, shoulder=35.0, elbow=150.0, stance=0.16)
+
+# Drill -> [(hold seconds, blend seconds to the next keyframe, pose)], looped
+DRILL_TIMELINES = {
+    'stance': [
+        (3.0, 1.0, pose(**SURF_STANCE)),
+        (2.0, 1.0, pose(**{**SURF_STANCE, 'knee': 128.0, 'hip': 162.0, 'x': 0.53})),
+        (1.0, 1.5, pose(knee=165.0, hip=172.0)),
+    ],
+    'popup': [
+        (1.5, 0.3, pose(PRONE, elbow=70.0, shoulder=80.0)),
+        (0.6, 0.35, pose(PRONE, hip=220.0, elbow=165.0, shoulder=95.0, head=20.0)),
+        (3.0, 0.8, pose(**SURF_STANCE)),
+    ],
+    'paddling': [
+        (0.2, 0.5, pose(PRONE, head=28.0, shoulder=25.0, elbow=165.0)),
+        (0.2, 0.5, pose(PRONE, head=24.0, shoulder=165.0, elbow=160.0)),
+    ],
+    'bottom_turn': [
+        (1.5, 0.8, pose(**{**SURF_STANCE, 'knee': 102.0, 'hip': 145.0, 'twist': 0.55, 'roll': 8.0})),
+        (1.0, 0.8, pose(**{**SURF_STANCE, 'knee': 130.0, 'twist': 0.1})),
+    ],
+    'pumping': [
+        (0.15, 0.6, pose(**{**SURF_STANCE, 'knee': 98.0, 'hip': 148.0})),
+        (0.15, 0.6, pose(**{**SURF_STANCE, 'knee': 155.0, 'hip': 168.0})),
+    ],
+    'tube_stance': [
+        (4.0, 1.0, pose(shin=40.0, knee=75.0, hip=80.0, shoulder=40.0, elbow=120.0, stance=0.16, head=-15.0)),
+        (1.0, 1.0, pose(shin=35.0, knee=95.0, hip=110.0, shoulder=35.0, elbow=130.0, stance=0.16)),
+    ],
+    'falling': [
+        (2.0, 0.3, pose(**SURF_STANCE)),
+        (0.2, 0.15, pose(**{**SURF_STANCE, 'shoulder': 160.0, 'elbow': 35.0, 'twist': 0.8})),
+        (1.2, 1.0, pose(**{**SURF_STANCE, 'shoulder': 160.0, 'elbow': 35.0, 'twist': 0.8,
+                           'shin': 70.0, 'knee': 150.0, 'drift': 0.15, 'drop': 0.35})),
+    ],
+    'cutback': [
+        (0.8, 0.5, pose(**SURF_STANCE, shin=35.0)),
+        (1.0, 0.5, pose(**SURF_STANCE, shin=35.0, roll=18.0, head=-40.0)),
+        (0.8, 0.5, pose(**SURF_STANCE, shin=35.0)),
+        (1.0, 0.5, pose(**SURF_STANCE, shin=35.0, roll=-18.0, head=-40.0)),
+    ],
+}
+
+# ============================================================================
+# GENERATION
+# ============================================================================
+
+def random_body(rng: np.random.Generator) -> dict:
+    """Per-session variation: size, facing direction, timeline phase, sway phases"""
+    return {
+        'scale': rng.uniform(0.85, 1.1),
+        'mirror': bool(rng.random() < 0.5),
+        'phase': rng.random(),
+        'swayPhases': rng.uniform(0, 2 * np.pi, size=(3, len(SWAY_FREQUENCIES))),
+    }
+
+def _timeline_params(drill: str, t: np.ndarray, phase: float) -> np.ndarray:
+    """(frames, len(PARAMS)) pose parameters at times t (seconds of timeline)"""
+    keyframes = DRILL_TIMELINES[drill]
+    holds = np.array([k[0] for k in keyframes])
+    blends = np.array([k[1] for k in keyframes])
+    poses = np.stack([k[2] for k in keyframes])
+    starts = np.concatenate([[0.0], np.cumsum(holds + blends)[:-1]])
+    period = float((holds + blends).sum())
+
+    local = (t + phase * period) % period
+    i = np.searchsorted(starts, local, side='right') - 1
+    into_blend = np.clip((local - starts[i] - holds[i]) / blends[i], 0.0, 1.0)
+    w = (into_blend * into_blend * (3.0 - 2.0 * into_blend))[:, None]  # Smoothstep
+    return poses[i] * (1.0 - w) + poses[(i + 1) % len(keyframes)] * w
+
+def _u(degrees: np.ndarray) -> np.ndarray:
+    """Unit vectors in image coordinates: 0 = up, 90 = facing direction"""
+    r = np.radians(degrees)
+    return np.stack([np.sin(r), -np.cos(r)], axis=-1)
+
+def _skeleton(params: np.ndarray, scale: float) -> np.ndarray:
+    """Pose parameters -> (frames, 17, 2) landmark x, y"""
+    p = {name: params[:, i] for name, i in P.items()}
+    out = np.empty((len(params), len(LANDMARK_NAMES), 2))
+
+    def put(name, xy):
+        out[:, LANDMARK_INDEX[name]] = xy
+
+    base = np.stack([p['x'] + p['drift'], p['ground'] + p['drop']], axis=-1)
+    half_stance = np.stack([p['stance'] / 2, np.zeros(len(params))], axis=-1)
+
+    # Legs, foot first
+    shin_dir = p['shin']
+    thigh_dir = shin_dir - (180.0 - p['knee'])
+    trunk_dir = thigh_dir + (180.0 - p['hip'])
+    shin, thigh = _u(shin_dir) * SHIN * scale, _u(thigh_dir) * THIGH * scale
+    for side, sign in (('left', -1.0), ('right', 1.0)):
+        ankle = base + sign * half_stance
+        put(f'{side}Ankle', ankle)
+        put(f'{side}Knee', ankle + shin)
+        put(f'{side}Hip', ankle + shin + thigh)
+    hip_mid = base + shin + thigh
+
+    # Shoulders: span narrows with twist, line tilts with roll
+    shoulder_mid = hip_mid + _u(trunk_dir) * TRUNK * scale
+    span = SHOULDER_SPAN * scale * (1.0 - p['twist'])
+    roll = np.radians(p['roll'])
+    half_span = np.stack([np.cos(roll), np.sin(roll)], axis=-1) * (span / 2)[:, None]
+
+    upper_dir = trunk_dir + 180.0 - p['shoulder']
+    fore_dir = upper_dir - (180.0 - p['elbow'])
+    upper, fore = _u(upper_dir) * UPPER_ARM * scale, _u(fore_dir) * FOREARM * scale
+    for side, sign in (('left', -1.0), ('right', 1.0)):
+        shoulder = shoulder_mid + sign * half_span
+        put(f'{side}Shoulder', shoulder)
+        put(f'{side}Elbow', shoulder + upper)
+        put(f'{side}Wrist', shoulder + upper + fore)
+
+    # Head tilts back from the torso line by 'head' degrees
+    head_dir = trunk_dir - p['head']
+    up, forward = _u(head_dir), _u(head_dir + 90.0)
+    neck_top = shoulder_mid + up * NECK * scale
+    face_side = half_span * 0.25
+    put('nose', neck_top + forward * FACE * scale)
+    put('leftEye', neck_top + (up * 0.012 + forward * 0.02) * scale - face_side)
+    put('rightEye', neck_top + (up * 0.012 + forward * 0.02) * scale + face_side)
+    put('leftEar', neck_top - forward * 0.015 * scale - face_side * 2)
+    put('rightEar', neck_top - forward * 0.015 * scale + face_side * 2)
+    return out
+
+def _occlusion_masks(frames: int, rate: float, rng: np.random.Generator) -> np.ndarray:
+    """(frames, 17) bool: landmarks occluded by burst events covering ~rate of frames"""
+    groups = [
+        [n for n in LANDMARK_NAMES if n.startswith('left') and ('Elbow' in n or 'Wrist' in n)],
+        [n for n in LANDMARK_NAMES if n.startswith('right') and ('Elbow' in n or 'Wrist' in n)],
+        [n for n in LANDMARK_NAMES if 'Knee' in n or 'Ankle' in n],
+        ['nose', 'leftEye', 'rightEye', 'leftEar', 'rightEar'],
+    ]
+    mask = np.zeros((frames, len(LANDMARK_NAMES)), dtype=bool)
+    if rate <= 0 or frames == 0:
+        return mask
+    events = rng.poisson(rate * frames / np.mean(OCCLUSION_FRAMES))
+    starts = rng.integers(0, frames, events)
+    ends = np.minimum(starts + rng.integers(*OCCLUSION_FRAMES, events), frames)
+    which = rng.integers(0, len(groups), events)
+
+    # Coverage per group from +1/-1 boundary counts
+    edges = np.zeros((frames + 1, len(groups)), dtype=np.int32)
+    np.add.at(edges, (starts, which), 1)
+    np.add.at(edges, (ends, which), -1)
+    covered = np.cumsum(edges[:-1], axis=0) > 0
+    for g, names in enumerate(groups):
+        mask[:, [LANDMARK_INDEX[n] for n in names]] |= covered[:, g:g + 1]
+    return mask
+
+def generate_drill(drill: str, frames: int, fps: float = DEFAULT_FPS, tempo: float = 1.0,
+                   noise: float = DEFAULT_NOISE, sway: float = DEFAULT_SWAY, occlusion: float = 0.0,
+                   dropout: float = 0.0, seed: int = None, body: dict = None,
+                   start_frame: int = 0, start_time: float = 0.0) -> dict:
+    """
+    Generate a drill's landmark sequence
+
+    Args:
+        drill: Drill id (a key of DRILL_TIMELINES)
+        frames: Number of frames
+        fps: Frame rate of the timestamps
+        tempo: Timeline speed multiplier
+        noise: Landmark jitter std (normalized units)
+        sway: Joint-angle drift amplitude (degrees)
+        occlusion: Fraction of frames with a body part occluded
+        dropout: Fraction of frames with no person detected
+        seed: Random seed
+        body: Session variation from random_body (pass the same one to
+              continue a session in chunks with start_frame)
+        start_frame: Index of the first frame within the session
+        start_time: Timestamp of frame 0
+
+    Returns:
+        Dict of arrays: timestamp (frames,), landmarks (frames, 17, 4) as
+        x, y, z, visibility with NaN when no person, personDetected (frames,)
+    """
+    if drill not in DRILL_TIMELINES:
+        raise ValueError(f"Unknown drill: {drill}")
+    rng = np.random.default_rng(seed)
+    if body is None:
+        body = random_body(rng)
+
+    t = (start_frame + np.arange(frames)) / fps
+    params = _timeline_params(drill, t * tempo, body['phase'])
+
+    if sway:
+        # Slow, session-consistent drift of knee, hip and shin angles
+        waves = np.sin(2 * np.pi * SWAY_FREQUENCIES * t[:, None, None] + body['swayPhases']).sum(axis=-1)
+        params[:, [P['knee'], P['hip'], P['shin']]] += sway * waves / len(SWAY_FREQUENCIES)
+
+    xy = _skeleton(params, body['scale'])
+    if body['mirror']:
+        xy[..., 0] = 1.0 - xy[..., 0]
+    xy += rng.normal(0.0, noise, xy.shape)
+
+    landmarks = np.empty((frames, len(LANDMARK_NAMES), 4), dtype=np.float32)
+    landmarks[..., :2] = xy
+    side = np.array([-1.0 if n.startswith('left') else 1.0 if n.startswith('right') else 0.0
+                     for n in LANDMARK_NAMES])
+    landmarks[..., 2] = side * 0.05 * (1.0 - params[:, P['twist'], None]) + rng.normal(0.0, noise, xy.shape[:2])
+
+    visibility = rng.uniform(0.88, 0.999, xy.shape[:2])
+    outside = ((xy < 0.0) | (xy > 1.0)).any(axis=-1)
+    visibility[outside] *= 0.2
+    occluded = _occlusion_masks(frames, occlusion, rng)
+    visibility[occluded] = rng.uniform(0.05, 0.35, int(occluded.sum()))
+    landmarks[..., 3] = visibility
+
+    detected = rng.random(frames) >= dropout
+    landmarks[~detected] = np.nan
+    return {'timestamp': start_time + t, 'landmarks': landmarks, 'personDetected': detected}
+
+def to_landmark_dicts(sequence: dict) -> list:
+    """Sequence -> list of landmark dicts in the extract_landmarks format (None without a person)"""
+    frames = []
+    for values, detected in zip(sequence['landmarks'].astype(np.float64).tolist(),
+                                sequence['personDetected'].tolist()):
+        if not detected:
+            frames.append(None)
+            continue
+        frames.append({
+            name: {'x': v[0], 'y': v[1], 'z': v[2], 'visibility': v[3]}
+            for name, v in zip(LANDMARK_NAMES, values)
+        })
+    return frames
+
+def to_records(sequence: dict) -> np.ndarray:
+    """Sequence -> RECORD_DTYPE records (joint angles included, no stability or quality scores)"""
+    records = np.zeros(len(sequence['timestamp']), dtype=RECORD_DTYPE)
+    records['timestamp'] = sequence['timestamp']
+    records['landmarks'] = sequence['landmarks']
+    records['angles'] = joint_angles(sequence['landmarks'])
+    records['visibility'] = np.nan_to_num(sequence['landmarks'][..., 3].mean(axis=-1))
+    records['repCount'] = -1
+    records['personDetected'] = sequence['personDetected']
+    return records
+
+# ============================================================================
+# VERIFICATION
+# ============================================================================
+
+# A clean run of each drill should make its coach say this at least once
+EXPECTED_CUES = {
+    'stance': 'GREAT STANCE!',
+    'popup': 'POP-UP SUCCESS!',
+    'paddling': 'GOOD PADDLE POSTURE!',
+    'bottom_turn': 'GOOD TURN POSTURE!',
+    'pumping': 'Good Extension!',
+    'tube_stance': 'GREAT TUBE STANCE!',
+    'falling': 'Safe fall: GOOD',
+    'cutback': 'GOOD CUTBACK!',
+}
+
+def verify(seconds: float = 60.0, fps: float = DEFAULT_FPS, seed: int = 0) -> bool:
+    """Run each drill's sequence through its own coach and check the expected cue appears"""
+    from drill_engine import DrillSession
+
+    print(f"{'drill':<14} {'frames':>7} {'cue frames':>11} {'reps':>5}")
+    all_ok = True
+    for drill, cue in EXPECTED_CUES.items():
+        sequence = generate_drill(drill, int(seconds * fps), fps=fps, occlusion=0.02, dropout=0.01, seed=seed)
+        session = DrillSession(drill)
+        hits = 0
+        for frame, now in zip(to_landmark_dicts(sequence), sequence['timestamp'].tolist()):
+            out = session.analyze(frame, now=now)
+            hits += any(line['text'] == cue for line in out['feedback'])
+        ok = hits > 0 and (drill not in ('popup', 'pumping') or out['repCount'] > 0)
+        all_ok &= ok
+        print(f"{drill:<14} {len(sequence['timestamp']):>7} {hits:>11} {out['repCount']:>5}  {'✅' if ok else '❌'} {cue}")
+    return all_ok
+
+# ============================================================================
+# MAIN
+# ============================================================================
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Generate synthetic drill landmark recordings')
+    parser.add_argument('--out-dir', default=os.path.join(TRAINING_DIR, 'synthetic_recordings'))
+    parser.add_argument('--drills', default='all', help="Comma-separated drill ids or 'all'")
+    parser.add_argument('--sessions', type=int, default=1, help='Recordings per drill')
+    parser.add_argument('--seconds', type=float, default=60.0, help='Length of each recording')
+    parser.add_argument('--fps', type=float, default=DEFAULT_FPS)
+    parser.add_argument('--tempo', type=float, default=1.0)
+    parser.add_argument('--tempo-jitter', type=float, default=0.15, help='Per-session tempo spread (fraction)')
+    parser.add_argument('--noise', type=float, default=DEFAULT_NOISE)
+    parser.add_argument('--sway', type=float, default=DEFAULT_SWAY)
+    parser.add_argument('--occlusion', type=float, default=0.02)
+    parser.add_argument('--dropout', type=float, default=0.01)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--verify', action='store_true', help='Check each drill against its coach instead')
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+
+    if args.verify:
+        print("=" * 80)
+        print("VERIFYING SYNTHETIC DRILLS AGAINST THE COACHES")
+        print("=" * 80)
+        success = verify(fps=args.fps, seed=args.seed)
+        print("\n✅ ALL DRILLS RECOGNIZED" if success else "\n❌ SOME DRILLS NOT RECOGNIZED")
+        return success
+
+    drills = list(DRILL_TIMELINES) if args.drills == 'all' else args.drills.split(',')
+    unknown = [d for d in drills if d not in DRILL_TIMELINES]
+    if unknown:
+        print(f"❌ Unknown drills: {', '.join(unknown)}")
+        return False
+    os.makedirs(args.out_dir, exist_ok=True)
+    frames_per_session = int(args.seconds * args.fps)
+
+    print("=" * 80)
+    print("GENERATING SYNTHETIC LANDMARKS")
+    print("=" * 80)
+    rng = np.random.default_rng(args.seed)
+    start = time.perf_counter()
+    total = 0
+    for drill in drills:
+        for session in range(args.sessions):
+            body = random_body(rng)
+            tempo = args.tempo * rng.uniform(1 - args.tempo_jitter, 1 + args.tempo_jitter)
+            path = os.path.join(args.out_dir, f"{drill}-{session:03d}{RECORDING_SUFFIX}")
+            for offset in range(0, frames_per_session, CHUNK_FRAMES):
+                sequence = generate_drill(
+                    drill, min(CHUNK_FRAMES, frames_per_session - offset), fps=args.fps, tempo=tempo,
+                    noise=args.noise, sway=args.sway, occlusion=args.occlusion, dropout=args.dropout,
+                    seed=rng.integers(2 ** 32), body=body, start_frame=offset,
+                )
+                write_recording(path, to_records(sequence), append=offset > 0)
+            total += frames_per_session
+            print(f"   {os.path.basename(path)}: {frames_per_session} frames (tempo {tempo:.2f})")
+
+    elapsed = time.perf_counter() - start
+    print(f"\n✅ {total:,} frames in {elapsed:.2f}s ({total / elapsed:,.0f} frames/s) -> {args.out_dir}")
+    return True
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,141 @@
+"""
+Test Forest Inference
+Validates that the compiled flat-array forest predicts exactly what
+scikit-learn's RandomForestClassifier predicts, and compares single-row and
+batch latency
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+# Add services directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'services'))
+from forest_inference import compile_forest, load_compiled_forest, save_compiled_forest
+
+MODEL_PATH = os.path.join(os.path.dirname(__file__), '..', 'models', 'recommender_model.joblib')
+SINGLE_ROW_CALLS = 200
+
+def make_recommender_data(rows, classes, seed):
+    """Features shaped like the recommender's: [skill, goal, bmi, age, weight, height]"""
+    rng = np.random.default_rng(seed)
+    height = rng.integers(150, 201, rows)
+    weight = rng.integers(50, 101, rows)
+    X = np.column_stack([
+        rng.integers(0, 3, rows),
+        rng.integers(0, 4, rows),
+        weight / (height / 100) ** 2,
+        rng.integers(16, 61, rows),
+        weight,
+        height,
+    ]).astype(np.float64)
+    y = (X[:, 0] * 7 + X[:, 1] * 3 + (X[:, 2] > 24) + rng.integers(0, classes, rows)) % classes
+    return X, y.astype(int)
+
+def check_parity(name, model, forest, X):
+    """Compare predictions and probabilities; returns list of failure messages"""
+    failures = []
+    expected = model.predict(X)
+    actual = forest.predict(X)
+    mismatched = int((expected != actual).sum())
+    if mismatched:
+        failures.append(f"{name}: {mismatched}/{len(X)} predictions differ")
+
+    max_error = float(np.abs(model.predict_proba(X) - forest.predict_proba(X)).max())
+    if max_error > 1e-12:
+        failures.append(f"{name}: probabilities differ by up to {max_error:.2e}")
+
+    status = "✅" if not failures else "❌"
+    print(f"{status} {name}: {len(X)} rows, {mismatched} mismatches, max |Δp| {max_error:.1e}")
+    return failures
+
+def time_calls(fn, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - start) / calls
+
+def test_forest_inference():
+    """Parity across model shapes, a save/load round trip and latency"""
+
+    print("=" * 80)
+    print("TESTING COMPILED FOREST INFERENCE")
+    print("=" * 80)
+    print()
+
+    failures = []
+    cases = [
+        ('deep forest, many classes', dict(n_estimators=50), 4000, 60),
+        ('shallow forest, impure leaves', dict(n_estimators=30, max_depth=4), 2000, 5),
+        ('large leaves', dict(n_estimators=20, min_samples_leaf=25), 2000, 12),
+        ('binary', dict(n_estimators=25), 1000, 2),
+    ]
+
+    for name, params, rows, classes in cases:
+        X, y = make_recommender_data(rows, classes, seed=len(name))
+        model = RandomForestClassifier(random_state=42, n_jobs=1, **params).fit(X[: rows // 2], y[: rows // 2])
+        forest = compile_forest(model)
+        failures += check_parity(name, model, forest, X[rows // 2:])
+
+    # Unseen feature ranges and exact split thresholds
+    X, y = make_recommender_data(3000, 40, seed=7)
+    model = RandomForestClassifier(n_estimators=40, random_state=0, n_jobs=1).fit(X, y)
+    forest = compile_forest(model)
+    thresholds = model.estimators_[0].tree_.threshold
+    edge = np.repeat(X[:50], 2, axis=0)
+    edge[:, 2] = np.resize(thresholds[thresholds > 0], len(edge))
+    failures += check_parity('thresholds and out-of-range values', model, forest, np.vstack([edge, X[:50] * 3, X[:50] - 100]))
+
+    # Missing values follow each split's learned missing-value branch
+    X_missing, y_missing = make_recommender_data(2000, 10, seed=11)
+    X_missing[np.random.default_rng(0).random(X_missing.shape) < 0.1] = np.nan
+    missing_model = RandomForestClassifier(n_estimators=20, random_state=0, n_jobs=1).fit(X_missing[:1000], y_missing[:1000])
+    failures += check_parity('missing values', missing_model, compile_forest(missing_model), X_missing[1000:])
+
+    # Round trip through disk, memory-mapped
+    with tempfile.TemporaryDirectory() as directory:
+        save_compiled_forest(forest, directory)
+        failures += check_parity('save/load (mmap)', model, load_compiled_forest(directory, mmap_mode='r'), X[:500])
+
+    # The deployed model, when present
+    if os.path.exists(MODEL_PATH):
+        import joblib
+        deployed = joblib.load(MODEL_PATH)
+        X_deployed, _ = make_recommender_data(2000, 2, seed=3)
+        failures += check_parity('deployed recommender_model.joblib', deployed, compile_forest(deployed), X_deployed[:, :deployed.n_features_in_])
+
+    # Latency
+    print()
+    print("Latency (forest of 40 trees):")
+    row = X[:1]
+    sklearn_single = time_calls(lambda: model.predict(row), SINGLE_ROW_CALLS)
+    compiled_single = time_calls(lambda: forest.predict(row), SINGLE_ROW_CALLS)
+    batch = X[:2000]
+    sklearn_batch = time_calls(lambda: model.predict(batch), 5)
+    compiled_batch = time_calls(lambda: forest.predict(batch), 5)
+    print(f"  single row: scikit-learn {sklearn_single * 1e6:8.0f} µs   compiled {compiled_single * 1e6:8.0f} µs   ({sklearn_single / compiled_single:.1f}x)")
+    print(f"  2000 rows:  scikit-learn {sklearn_batch * 1e3:8.1f} ms   compiled {compiled_batch * 1e3:8.1f} ms   ({sklearn_batch / compiled_batch:.1f}x)")
+    print()
+
+    print("=" * 80)
+    print("TEST RESULTS")
+    print("=" * 80)
+
+    if failures:
+        for failure in failures:
+            print(f"  - {failure}")
+        print()
+        print(f"⚠️  {len(failures)} PARITY CHECKS FAILED")
+    assert not failures, f"{len(failures)} parity checks failed:\n" + '\n'.join(failures)
+
+    print("✅ COMPILED FOREST MATCHES SCIKIT-LEARN")
+
+if __name__ == "__main__":
+    try:
+        test_forest_inference()
+    except AssertionError:
+        sys.exit(1)
@@ -0,0 +1,82 @@
+"""
+Test Plan Retrieval
+Checks that corpus plans naming an exercise the catalog does not know are
+never retrieved, whatever the request (their limitations, equipment and
+skill are unknown, so serving them would bypass the safety filters)
+"""
+
+import csv
+import itertools
+import os
+import sys
+import tempfile
+
+# Add services directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'services'))
+from exercise_catalog import EQUIPMENT_LEVELS, SKILL_LEVELS
+from plan_retrieval import CORPUS_GOALS, PLAN_CORPUS_PATH, PlanIndex
+
+UNKNOWN_EXERCISE = 'Unlisted Box Jumps'
+DURATION_RANGES = ['5-10 minutes', '10-20 minutes', '20+ minutes']
+LIMITATIONS = [[], ['Knee discomfort'], ['Lower back issues'], ['Shoulder injury', 'Ankle injury']]
+
+def write_corpus_with_unknown(path):
+    """Corpus copy where every tenth plan also names UNKNOWN_EXERCISE; returns the tainted texts"""
+    tainted = set()
+    with open(PLAN_CORPUS_PATH, newline='') as src, open(path, 'w', newline='') as dst:
+        reader = csv.DictReader(src)
+        writer = csv.DictWriter(dst, fieldnames=reader.fieldnames)
+        writer.writeheader()
+        for i, row in enumerate(reader):
+            if i % 10 == 0:
+                row['exercises'] = f"{row['exercises']};{UNKNOWN_EXERCISE}"
+                tainted.add(row['exercises'])
+            writer.writerow(row)
+    return tainted
+
+def test_unknown_exercises_never_returned():
+    print("=" * 80)
+    print("TESTING PLAN RETRIEVAL WITH UNKNOWN EXERCISES")
+    print("=" * 80)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'corpus.csv')
+        tainted = write_corpus_with_unknown(path)
+        index = PlanIndex(path)
+
+    failures = []
+    if UNKNOWN_EXERCISE not in index.stats()['unknownExercises']:
+        failures.append(f"stats() does not report {UNKNOWN_EXERCISE}")
+    if index.stats()['skippedPlans'] == 0:
+        failures.append("no plans were skipped")
+
+    searches = 0
+    for skill, goal, duration, equipment, limitations, exact in itertools.product(
+        SKILL_LEVELS, CORPUS_GOALS, DURATION_RANGES, EQUIPMENT_LEVELS, LIMITATIONS, (False, True)
+    ):
+        plans = index.search(skill, goal, duration, equipment, limitations, k=10, exact=exact)
+        searches += 1
+        for plan in plans:
+            if plan['exercises'] in tainted or UNKNOWN_EXERCISE in plan['exercises'].split(';'):
+                failures.append(f"{skill}/{goal}/{duration}/{equipment}/{limitations}: returned {plan['planName']}")
+
+    print(f"{len(tainted)} tainted plan texts, {index.stats()['skippedPlans']} rows skipped, {searches} searches")
+    print()
+    print("=" * 80)
+    print("TEST RESULTS")
+    print("=" * 80)
+
+    if failures:
+        for failure in failures[:20]:
+            print(f"  - {failure}")
+        print()
+        print(f"⚠️  {len(failures)} RETRIEVAL CHECKS FAILED")
+    assert not failures, f"{len(failures)} retrieval checks failed:\n" + '\n'.join(failures[:20])
+
+    print("✅ PLANS WITH UNKNOWN EXERCISES ARE NEVER RETRIEVED")
+
+if __name__ == "__main__":
+    try:
+        test_unknown_exercises_never_returned()
+    except AssertionError:
+        sys.exit(1)
@@ -0,0 +1,99 @@
+"""
+Test Plan Variations
+Checks that the three plans from smart_workout_templates differ whenever the
+exercise pool allows it
+"""
+
+import itertools
+import os
+import sys
+
+# Add services directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'services'))
+from smart_workout_templates import (
+    EXERCISES_DB, GOAL_CATEGORIES, MAX_MAIN_EXERCISES,
+    generate_3_plan_variations, get_exercise_pool_indices
+)
+
+SKILL_LEVELS = ['Beginner', 'Intermediate', 'Pro']
+DURATIONS = ['5-10 minutes', '10-20 minutes', '20+ minutes']
+EQUIPMENT = ['None', 'Kettlebell', 'Gym']
+LIMITATION_SETS = [
+    [],
+    ['Knee discomfort'],
+    ['Shoulder injury', 'Wrist pain'],
+    ['Knee discomfort', 'Ankle injury', 'Hip problems', 'Lower back issues'],
+]
+MAX_PLAN_EXERCISES = 3 + MAX_MAIN_EXERCISES  # Warm-ups plus the main block
+
+# Small pools (3-6 exercises) where ranking alone used to repeat a plan but a
+# distinct plan fits the duration
+SMALL_POOL_CASES = [
+    ('Beginner', 'Warm up only', '5-10 minutes', 'Gym', ['Knee discomfort']),
+    ('Beginner', 'Improve explosive pop-up speed', '5-10 minutes', 'None',
+     ['Knee discomfort', 'Ankle injury', 'Hip problems', 'Lower back issues']),
+    ('Beginner', 'Fat loss', '10-20 minutes', 'Gym',
+     ['Knee discomfort', 'Ankle injury', 'Hip problems', 'Lower back issues']),
+    ('Intermediate', 'Improve explosive pop-up speed', '10-20 minutes', 'Gym',
+     ['Knee discomfort', 'Ankle injury', 'Hip problems', 'Lower back issues']),
+    ('Beginner', 'Improve explosive pop-up speed', '20+ minutes', 'None', ['Knee discomfort']),
+    ('Pro', 'Warm up only', '5-10 minutes', 'None', ['Knee discomfort']),
+]
+
+def pool_size(skill, goal, equipment, limitations):
+    """Distinct exercises available to the user for this goal"""
+    pools = get_exercise_pool_indices(skill, equipment, limitations, GOAL_CATEGORIES[goal])
+    return len(set().union(*(pool.tolist() for pool in pools)))
+
+def repeated_plans(skill, goal, duration, equipment, limitations):
+    """Pairs of plans (1-based) with the same exercise set"""
+    plans = generate_3_plan_variations(skill, goal, duration, equipment=equipment, limitations=limitations)
+    exercise_sets = [frozenset(plan['exercises'].split(';')) for plan in plans]
+    return [
+        (i + 1, j + 1) for (i, a), (j, b) in itertools.combinations(enumerate(exercise_sets), 2) if a == b
+    ]
+
+def test_plans_differ():
+    print("=" * 80)
+    print("TESTING PLAN VARIATION DIVERSITY")
+    print("=" * 80)
+
+    failures = []
+    checked = 0
+
+    # Pools with more exercises than a plan can hold always leave room for a different plan
+    for case in itertools.product(SKILL_LEVELS, GOAL_CATEGORIES, DURATIONS, EQUIPMENT, LIMITATION_SETS):
+        skill, goal, _, equipment, limitations = case
+        if pool_size(skill, goal, equipment, limitations) <= MAX_PLAN_EXERCISES:
+            continue
+        checked += 1
+        repeats = repeated_plans(*case)
+        if repeats:
+            failures.append(f"{' | '.join(map(str, case))}: plans {repeats} are identical")
+
+    for case in SMALL_POOL_CASES:
+        checked += 1
+        repeats = repeated_plans(*case)
+        if repeats:
+            failures.append(f"{' | '.join(map(str, case))} (small pool): plans {repeats} are identical")
+
+    print(f"{checked} requests checked")
+    print()
+    print("=" * 80)
+    print("TEST RESULTS")
+    print("=" * 80)
+
+    if failures:
+        for failure in failures[:20]:
+            print(f"  - {failure}")
+        print()
+        print(f"⚠️  {len(failures)} DIVERSITY CHECKS FAILED")
+    assert not failures, f"{len(failures)} diversity checks failed:\n" + '\n'.join(failures[:20])
+
+    print("✅ THE THREE PLANS DIFFER WHENEVER THE POOL ALLOWS IT")
+
+if __name__ == "__main__":
+    try:
+        test_plans_differ()
+    except AssertionError:
+        sys.exit(1)
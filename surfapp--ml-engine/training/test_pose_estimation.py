@@ -1,3 +1,7 @@
+import argparse
+import threading
+from collections import deque
+
 import cv2
 import mediapipe as mp
 import numpy as np
@@ -41,6 +45,8 @@ TUBE_HIP_MAX = 100
 PANEL_WIDTH = 500
 LINE_HEIGHT = 30
 PANEL_PADDING = 20
+PANEL_SHADE = 50
+RATE_WINDOW = 30 # Frames averaged for the FPS / latency readout
 
 # --- State Variables ---
 current_drill = 'stance'
@@ -63,13 +69,16 @@ def calculate_angle(a, b, c):
     angle = np.abs(radians*180.0/np.pi)
     return 360 - angle if angle > 180.0 else angle
 
+_panel_shades = {} # Panel background per shape, allocated once instead of every frame
+
 def draw_panel(image, text_lines):
     """Draws a semi-transparent panel for better text readability."""
     panel_height = len(text_lines) * LINE_HEIGHT + PANEL_PADDING
     sub_img = image[0:panel_height, 0:PANEL_WIDTH]
-    black_rect = np.ones(sub_img.shape, dtype=np.uint8) * 50
-    res = cv2.addWeighted(sub_img, 0.7, black_rect, 0.3, 1.0)
-    image[0:panel_height, 0:PANEL_WIDTH] = res
+    shade = _panel_shades.get(sub_img.shape)
+    if shade is None:
+        shade = _panel_shades[sub_img.shape] = np.full(sub_img.shape, PANEL_SHADE, dtype=np.uint8)
+    cv2.addWeighted(sub_img, 0.7, shade, 0.3, 1.0, dst=sub_img) # Blend in place
     
     y0 = LINE_HEIGHT
     for i, line in enumerate(text_lines):
@@ -380,94 +389,223 @@ def coach_cutback_drill(landmarks):
     return lines
 
 
-# --- Main Application Loop ---
-def main():
+# --- Frame Pipeline ---
+# Capture, inference and render run on their own threads, connected by
+# single-slot buffers that only ever hold the newest item: a slow stage
+# skips stale frames instead of queueing them, so latency stays bounded.
+
+DRILL_FUNCTIONS = {
+    'stance': coach_stance_drill,
+    'popup': coach_popup_drill,
+    'paddling': coach_paddling_drill,
+    'bottom_turn': coach_bottom_turn_drill,
+    'pumping': coach_pumping_drill,
+    'tube_stance': coach_tube_stance_drill,
+    'falling': coach_falling_drill,
+    'cutback': coach_cutback_drill,
+    # Add 'snap' later
+}
+
+# Define keys for drills - Use numbers for more drills
+DRILL_KEYS = {
+    ord('1'): 'stance',
+    ord('2'): 'popup',
+    ord('3'): 'paddling',
+    ord('4'): 'bottom_turn',
+    ord('5'): 'pumping',
+    ord('6'): 'tube_stance',
+    ord('7'): 'falling',
+    ord('8'): 'cutback'
+    # Add more keys as needed
+}
+DRILL_KEY_TEXT = "Drills: 1:Stance 2:PopUp 3:Paddle 4:BtmTurn 5:Pump 6:Tube 7:Falling 8:Cutback | r:Reset | q:Quit"
+
+# Drill state is changed by key presses (render thread) and the coaches (inference thread)
+state_lock = threading.Lock()
+
+class LatestSlot:
+    """Single-slot buffer: put() replaces the held item, get() waits for one newer than the last seen"""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._item = None
+        self._seq = 0
+        self._closed = False
+
+    def put(self, item):
+        with self._cond:
+            self._item = item
+            self._seq += 1
+            self._cond.notify_all()
+
+    def get(self, after_seq, timeout=0.5):
+        """Returns (seq, item), or (after_seq, None) on timeout or close"""
+        with self._cond:
+            self._cond.wait_for(lambda: self._seq > after_seq or self._closed, timeout)
+            if self._seq > after_seq:
+                return self._seq, self._item
+            return after_seq, None
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+class RateMeter:
+    """Events per second over the last RATE_WINDOW events"""
+
+    def __init__(self):
+        self._times = deque(maxlen=RATE_WINDOW)
+
+    def tick(self, now=None):
+        self._times.append(time.perf_counter() if now is None else now)
+
+    def rate(self):
+        if len(self._times) < 2 or self._times[-1] == self._times[0]:
+            return 0.0
+        return (len(self._times) - 1) / (self._times[-1] - self._times[0])
+
+def analyze_frame(pose, frame):
+    """Runs pose detection and the current drill's coach; returns (results, text lines)"""
+    frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    results = pose.process(frame_rgb)
+
+    with state_lock:
+        text_lines = [
+            {"text": f"Current Drill: {current_drill.upper()}", "color": WHITE},
+            {"text": DRILL_KEY_TEXT, "color": YELLOW}
+        ]
+        try:
+            if results.pose_landmarks:
+                landmarks = results.pose_landmarks.landmark
+                # Call the appropriate coaching function
+                coach_function = DRILL_FUNCTIONS.get(current_drill)
+                if coach_function:
+                    text_lines.extend(coach_function(landmarks))
+                else:
+                    text_lines.append({"text": "Selected drill not implemented", "color": RED})
+            else:
+                text_lines.append({"text": "No pose detected", "color": RED})
+        except Exception as e:
+            # Basic error handling during development
+            # print(f"Error in coaching logic: {e}") # Uncomment to debug
+            text_lines.append({"text": "Ensure body is fully visible", "color": RED})
+    return results, text_lines
+
+def render_frame(frame, results, text_lines, readout):
+    """Draws landmarks, the coaching panel and the FPS / latency readout, then shows the frame"""
+    if results.pose_landmarks:
+        mp_drawing.draw_landmarks(frame, results.pose_landmarks, mp_pose.POSE_CONNECTIONS, landmark_drawing_spec=CUSTOM_DRAWING_SPEC)
+    draw_panel(frame, text_lines + [{"text": readout, "color": WHITE}])
+    cv2.imshow('Surf AI Pose Coach', frame)
+
+def handle_key(key):
+    """Applies a key press; returns False to quit"""
     global current_drill, popup_stage, rep_counter, pump_state
-
-    cap = cv2.VideoCapture(0)
-    if not cap.isOpened():
-        print("Error: Cannot open webcam")
-        return
-
-    # Dictionary to map drill names to functions
-    drill_functions = {
-        'stance': coach_stance_drill,
-        'popup': coach_popup_drill,
-        'paddling': coach_paddling_drill,
-        'bottom_turn': coach_bottom_turn_drill,
-        'pumping': coach_pumping_drill,
-        'tube_stance': coach_tube_stance_drill,
-        'falling': coach_falling_drill,
-        'cutback': coach_cutback_drill,
-        # Add 'cutback' and 'snap' later
-    }
-    
-    # Define keys for drills - Use numbers for more drills
-    drill_keys = {
-        ord('1'): 'stance',
-        ord('2'): 'popup',
-        ord('3'): 'paddling',
-        ord('4'): 'bottom_turn',
-        ord('5'): 'pumping',
-        ord('6'): 'tube_stance',
-        ord('7'): 'falling',
-        ord('8'): 'cutback'
-        # Add more keys as needed
-    }
-    drill_key_text = "Drills: 1:Stance 2:PopUp 3:Paddle 4:BtmTurn 5:Pump 6:Tube 7:Falling 8:Cutback | r:Reset | q:Quit"
-
-
+    if key == ord('q'):
+        return False
+    with state_lock:
+        if key == ord('r'): # Generic Reset
+            popup_stage = 'DOWN'; rep_counter = 0; pump_state = 'HIGH'
+        elif key in DRILL_KEYS:
+            current_drill = DRILL_KEYS[key]
+            # Reset states when changing drill
+            popup_stage = 'DOWN'; rep_counter = 0; pump_state = 'HIGH'
+    return True
+
+def capture_loop(cap, frames, stop):
+    """Capture thread: keeps the newest camera frame in the slot"""
+    while not stop.is_set() and cap.isOpened():
+        success, frame = cap.read()
+        if not success: continue
+        frames.put((frame, time.perf_counter()))
+    frames.close()
+
+def inference_loop(frames, outputs, stop, inference_rate):
+    """Inference thread: pose detection and coaching on the newest captured frame"""
+    with mp_pose.Pose(min_detection_confidence=DETECTION_CONFIDENCE, min_tracking_confidence=TRACKING_CONFIDENCE) as pose:
+        seq = 0
+        while not stop.is_set():
+            seq, item = frames.get(seq)
+            if item is None: continue
+            frame, captured_at = item
+            started = time.perf_counter()
+            results, text_lines = analyze_frame(pose, frame)
+            inference_rate.tick()
+            outputs.put((frame, results, text_lines, captured_at, time.perf_counter() - started))
+    outputs.close()
+
+def run_pipelined(cap):
+    """Capture and inference threads feed the render loop on the main thread (HighGUI needs it)"""
+    frames, outputs = LatestSlot(), LatestSlot()
+    stop = threading.Event()
+    inference_rate, display_rate = RateMeter(), RateMeter()
+    latencies = deque(maxlen=RATE_WINDOW)
+
+    threads = [
+        threading.Thread(target=capture_loop, args=(cap, frames, stop), name='capture', daemon=True),
+        threading.Thread(target=inference_loop, args=(frames, outputs, stop, inference_rate), name='inference', daemon=True),
+    ]
+    for thread in threads:
+        thread.start()
+
+    seq = 0
+    try:
+        while True:
+            seq, item = outputs.get(seq, timeout=0.01)
+            if item is not None:
+                frame, results, text_lines, captured_at, inference_seconds = item
+                display_rate.tick()
+                latencies.append(time.perf_counter() - captured_at)
+                readout = (f"Display {display_rate.rate():.1f} FPS | Inference {inference_rate.rate():.1f} FPS "
+                           f"({inference_seconds * 1000:.0f} ms) | Latency {np.mean(latencies) * 1000:.0f} ms")
+                render_frame(frame, results, text_lines, readout)
+            elif not threads[1].is_alive():
+                break
+            # Only poll the keyboard; waiting for frames happens in outputs.get
+            if not handle_key(cv2.waitKey(1) & 0xFF): break
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join(timeout=2.0)
+
+def run_sequential(cap):
+    """Original single-threaded loop: read, detect, coach, draw, show, wait"""
+    display_rate = RateMeter()
     with mp_pose.Pose(min_detection_confidence=DETECTION_CONFIDENCE, min_tracking_confidence=TRACKING_CONFIDENCE) as pose:
         while cap.isOpened():
             success, frame = cap.read()
             if not success: continue
+            captured_at = time.perf_counter()
 
-            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            results = pose.process(frame_rgb)
+            results, text_lines = analyze_frame(pose, frame)
+            display_rate.tick()
+            readout = (f"Display {display_rate.rate():.1f} FPS | "
+                       f"Latency {(time.perf_counter() - captured_at) * 1000:.0f} ms (sequential)")
+            render_frame(frame, results, text_lines, readout)
 
-            if results.pose_landmarks:
-                mp_drawing.draw_landmarks(frame, results.pose_landmarks, mp_pose.POSE_CONNECTIONS, landmark_drawing_spec=CUSTOM_DRAWING_SPEC)
-
-            text_lines_to_display = [
-                {"text": f"Current Drill: {current_drill.upper()}", "color": WHITE},
-                {"text": drill_key_text, "color": YELLOW}
-            ]
-
-            try:
-                if results.pose_landmarks:
-                    landmarks = results.pose_landmarks.landmark
-                    # Call the appropriate coaching function
-                    coach_function = drill_functions.get(current_drill)
-                    if coach_function:
-                         # Pass landmarks (MediaPipe list) to coach; some coaches may need previous frame data
-                         # Convert landmarks list to simple dict of needed names to coordinates for coaches that expect them
-                         # For backward compatibility we'll pass the raw landmarks list into existing coaches
-                         text_lines_to_display.extend(coach_function(landmarks))
-                    else:
-                         text_lines_to_display.append({"text": "Selected drill not implemented", "color": RED})
-                else:
-                    text_lines_to_display.append({"text": "No pose detected", "color": RED})
-            except Exception as e:
-                # Basic error handling during development
-                # print(f"Error in coaching logic: {e}") # Uncomment to debug
-                text_lines_to_display.append({"text": "Ensure body is fully visible", "color": RED})
+            if not handle_key(cv2.waitKey(10) & 0xFF): break
 
-            draw_panel(frame, text_lines_to_display)
-            cv2.imshow('Surf AI Pose Coach', frame)
-
-            key = cv2.waitKey(10) & 0xFF
-            if key == ord('q'): break
-            elif key == ord('r'): # Generic Reset
-                 popup_stage = 'DOWN'; rep_counter = 0; pump_state = 'HIGH'
-            elif key in drill_keys:
-                 current_drill = drill_keys[key]
-                 # Reset states when changing drill
-                 popup_stage = 'DOWN'; rep_counter = 0; pump_state = 'HIGH'
+# --- Main Application Loop ---
+def main():
+    parser = argparse.ArgumentParser(description='Webcam surf drill coach')
+    parser.add_argument('--camera', type=int, default=0, help='Camera index')
+    parser.add_argument('--sequential', action='store_true', help='Single-threaded loop, for comparison')
+    args = parser.parse_args()
 
+    cap = cv2.VideoCapture(args.camera)
+    if not cap.isOpened():
+        print("Error: Cannot open webcam")
+        return
 
-    cap.release()
-    cv2.destroyAllWindows()
+    try:
+        if args.sequential:
+            run_sequential(cap)
+        else:
+            run_pipelined(cap)
+    finally:
+        cap.release()
+        cv2.destroyAllWindows()
 
 if __name__ == "__main__":
     main()
-
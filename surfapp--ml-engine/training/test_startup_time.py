@@ -0,0 +1,114 @@
+"""
+Test Startup Time
+Measures cold import time of the ML services, prints an import-time breakdown
+and fails if a service exceeds its startup budget or loads heavy modules that
+should only be imported on first use
+"""
+
+import os
+import re
+import subprocess
+import sys
+import time
+
+SERVICES_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'services'))
+
+# Cold-start budget per service in seconds (override with STARTUP_BUDGET_SECONDS)
+DEFAULT_BUDGET_SECONDS = float(os.environ.get('STARTUP_BUDGET_SECONDS', 3.0))
+RUNS = 3          # Best of N cold starts, to smooth out a noisy machine
+TOP_IMPORTS = 10  # Rows shown in the import-time breakdown
+
+# Service module -> modules that must stay out of the import path
+SERVICES = {
+    'model_server': ['cv2', 'mediapipe', 'pandas', 'joblib', 'sklearn'],
+    'pose_server': ['cv2', 'mediapipe', 'PIL', 'pandas', 'joblib', 'sklearn'],
+    'model_server_backup': ['cv2', 'mediapipe', 'pandas', 'joblib', 'sklearn'],
+}
+
+IMPORT_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+def measure_cold_start(module: str):
+    """
+    Import a service module in a fresh interpreter
+
+    Returns:
+        (wall seconds, list of (cumulative us, self us, depth, module name), error or None)
+    """
+    env = dict(os.environ, PLAN_CACHE_ENABLED='0', POSE_PREWARM='0')
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=SERVICES_DIR, env=env, capture_output=True, text=True
+    )
+    elapsed = time.perf_counter() - start
+
+    imports = []
+    other_lines = []
+    for line in proc.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            imports.append((int(cumulative_us), int(self_us), len(indent) // 2, name))
+        elif not line.startswith('import time:'):
+            other_lines.append(line)
+
+    error = None
+    if proc.returncode != 0:
+        error = '\n'.join(other_lines[-5:]) or f'exit code {proc.returncode}'
+    return elapsed, imports, error
+
+def test_startup_time():
+    """Check every service against its budget and forbidden imports"""
+
+    print("=" * 80)
+    print("TESTING SERVICE STARTUP TIME")
+    print("=" * 80)
+    print(f"Budget: {DEFAULT_BUDGET_SECONDS:.2f}s per service (best of {RUNS})")
+    print()
+
+    failures = []
+
+    for module, forbidden in SERVICES.items():
+        runs = [measure_cold_start(module) for _ in range(RUNS)]
+        error = next((r[2] for r in runs if r[2]), None)
+        if error:
+            failures.append(f"{module}: import failed\n{error}")
+            print(f"❌ {module}: import failed")
+            continue
+
+        elapsed, imports, _ = min(runs, key=lambda r: r[0])
+        imported = {name for _, _, _, name in imports}
+        heavy = [name for name in forbidden if name in imported]
+
+        status = "✅" if elapsed <= DEFAULT_BUDGET_SECONDS and not heavy else "❌"
+        print(f"{status} {module}: {elapsed:.2f}s cold start, {len(imports)} modules imported")
+
+        # Top-level packages by cumulative import time
+        top_level = sorted((r for r in imports if r[2] <= 1), reverse=True)[:TOP_IMPORTS]
+        for cumulative_us, self_us, _, name in top_level:
+            print(f"     {cumulative_us / 1000:8.1f} ms  (self {self_us / 1000:6.1f} ms)  {name}")
+        print()
+
+        if elapsed > DEFAULT_BUDGET_SECONDS:
+            failures.append(f"{module}: {elapsed:.2f}s exceeds budget of {DEFAULT_BUDGET_SECONDS:.2f}s")
+        if heavy:
+            failures.append(f"{module}: imports {', '.join(heavy)} at startup")
+
+    print("=" * 80)
+    print("TEST RESULTS")
+    print("=" * 80)
+
+    if failures:
+        for failure in failures:
+            print(f"  - {failure}")
+        print()
+        print(f"⚠️  {len(failures)} STARTUP CHECKS FAILED")
+    assert not failures, f"{len(failures)} startup checks failed:\n" + '\n'.join(failures)
+
+    print("✅ ALL SERVICES START WITHIN BUDGET")
+
+if __name__ == "__main__":
+    try:
+        test_startup_time()
+    except AssertionError:
+        sys.exit(1)
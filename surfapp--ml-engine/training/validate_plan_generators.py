@@ -0,0 +1,452 @@
+"""
+Validate Plan Generators
+Runs both plan generators over their full input grid in a process pool and
+checks every plan for duration bounds, limitation safety and skill
+eligibility
+
+    - legacy: training/workout_templates.py (model_server_backup)
+    - smart:  services/smart_workout_templates.py (model_server)
+
+Prints a summary and writes a JSON report with per-check failure counts,
+example failures and per-case timings.
+
+Known failures (mostly plans a small pool cannot stretch to the requested
+duration) are recorded in validation_baseline.json: one bitmap per generator
+and check over the grid axes. The run exits non-zero only on failures the
+baseline does not list, so it can gate every catalog change. Cases the
+baseline has never seen (a new goal, limitation or larger
+--max-limitations) count as new. After an intended change, rewrite the
+baseline with --update-baseline and commit it with the change.
+
+Usage:
+    python validate_plan_generators.py [--generator all|legacy|smart] [--workers N]
+                                       [--max-limitations 1] [--report validation_report.json]
+                                       [--baseline validation_baseline.json] [--update-baseline]
+"""
+
+import argparse
+import base64
+import itertools
+import json
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+TRAINING_DIR = os.path.dirname(os.path.abspath(__file__))
+SERVICES_DIR = os.path.abspath(os.path.join(TRAINING_DIR, '..', 'services'))
+sys.path.insert(0, TRAINING_DIR)
+sys.path.insert(0, SERVICES_DIR)
+
+SKILL_LEVELS = ['Beginner', 'Intermediate', 'Pro']
+DURATION_RANGES = ['5-10 minutes', '10-20 minutes', '20+ minutes']
+
+# Accepted plan length in minutes per duration range (None = no upper bound)
+DURATION_BOUNDS = {
+    '5-10 minutes': (5, 10),
+    '10-20 minutes': (10, 20),
+    '20+ minutes': (20, None),
+}
+
+# (height cm, weight kg) per BMI category; (0, 0) = no body data
+BODY_METRICS = {
+    'none': (0, 0),
+    'underweight': (170, 49),
+    'normal': (170, 64),
+    'overweight': (170, 78),
+    'obese': (170, 95),
+}
+
+ADAPTIVE_VARIANTS = {
+    'none': None,
+    'easier': {'rest': 0.2, 'sets': -1, 'difficulty': 'easier'},
+    'harder': {'rest': -0.1, 'sets': 1, 'difficulty': 'harder'},
+}
+
+# Legacy skill rules: name keywords a level may not get
+LEGACY_SKILL_KEYWORDS = {
+    'Beginner': ['Advanced', 'Heavy', 'Intense', 'Weighted', 'Power'],
+    'Intermediate': ['Advanced', 'Heavy'],
+    'Pro': [],
+}
+
+CASES_PER_TASK = 250   # Cases sent to a worker at once
+EXAMPLES_PER_CHECK = 5 # Failure examples kept per check in the report
+
+DEFAULT_BASELINE = os.path.join(TRAINING_DIR, 'validation_baseline.json')
+GRID_AXES = ('skill', 'goal', 'duration', 'equipment', 'body', 'limitations', 'adaptive')
+
+# ============================================================================
+# GRID
+# ============================================================================
+
+def limitation_sets(limitations, max_size):
+    """No limitations, then every combination of up to max_size limitations"""
+    sets = [[]]
+    for size in range(1, max_size + 1):
+        sets += [list(combo) for combo in itertools.combinations(limitations, size)]
+    return sets
+
+def build_grid(generator, max_limitations):
+    """All input combinations for one generator as (generator, params) cases"""
+    if generator == 'legacy':
+        from workout_templates import LIMITATION_EXCLUSIONS
+        goals = ['Warm up only', 'Improve endurance', 'Improve explosive pop-up speed',
+                 'Endurance', 'Power', 'Fat Loss', 'Stamina']
+        equipment_options = ['None']  # The legacy generator ignores equipment
+        body_metrics = [b for b in BODY_METRICS if b != 'obese']  # No obese category
+        limitations = list(LIMITATION_EXCLUSIONS)
+    else:
+        from smart_workout_templates import EXERCISES_DB, GOAL_CATEGORIES
+        goals = list(GOAL_CATEGORIES)
+        equipment_options = ['None', 'Kettlebell', 'Gym']
+        body_metrics = list(BODY_METRICS)
+        limitations = list(EXERCISES_DB.limitations)
+
+    grid = itertools.product(
+        SKILL_LEVELS, goals, DURATION_RANGES, equipment_options, body_metrics,
+        limitation_sets(limitations, max_limitations), ADAPTIVE_VARIANTS
+    )
+    return [
+        (generator, {
+            'skill': skill, 'goal': goal, 'duration': duration, 'equipment': equipment,
+            'body': body, 'limitations': lims, 'adaptive': adaptive,
+        })
+        for skill, goal, duration, equipment, body, lims, adaptive in grid
+    ]
+
+def describe(case):
+    generator, p = case
+    parts = [generator, p['skill'], p['goal'], p['duration'], p['equipment'], p['body'],
+             ','.join(p['limitations']) or 'no limitations', f"adaptive={p['adaptive']}"]
+    return ' | '.join(parts)
+
+# ============================================================================
+# CHECKS
+# ============================================================================
+
+def check_duration(plans, duration_range):
+    low, high = DURATION_BOUNDS[duration_range]
+    errors = []
+    for i, plan in enumerate(plans, 1):
+        minutes = plan.get('durationMinutes', 0)
+        if minutes < low or (high is not None and minutes > high):
+            errors.append(('duration', f"plan {i} is {minutes} min, outside {duration_range}"))
+    return errors
+
+def check_structure(plans):
+    errors = []
+    if len(plans) != 3:
+        errors.append(('plan-count', f"expected 3 plans, got {len(plans)}"))
+    for i, plan in enumerate(plans, 1):
+        if not plan.get('exercises'):
+            errors.append(('empty-plan', f"plan {i} has no exercises"))
+    return errors
+
+def run_legacy(p):
+    from workout_templates import LIMITATION_EXCLUSIONS, generate_3_plan_variations
+
+    height, weight = BODY_METRICS[p['body']]
+    variant = ADAPTIVE_VARIANTS[p['adaptive']]
+    adaptive = None
+    if variant:
+        adaptive = {
+            'rest_multiplier_adjustment': variant['rest'],
+            'sets_adjustment': variant['sets'],
+            'exercise_difficulty': variant['difficulty'],
+        }
+
+    plans = generate_3_plan_variations(
+        p['skill'], p['goal'], p['duration'], limitations=p['limitations'] or None,
+        height=height or None, weight=weight or None, adaptive_adjustments=adaptive
+    )
+
+    errors = check_structure(plans) + check_duration(plans, p['duration'])
+    excluded = [k.lower() for lim in p['limitations'] for k in LIMITATION_EXCLUSIONS.get(lim, [])]
+    for i, plan in enumerate(plans, 1):
+        for exercise in filter(None, plan['exercises'].split(';')):
+            unsafe = [k for k in excluded if k in exercise.lower()]
+            if unsafe:
+                errors.append(('limitation', f"plan {i} has {exercise} (excluded by '{unsafe[0]}')"))
+            too_hard = [k for k in LEGACY_SKILL_KEYWORDS[p['skill']] if k in exercise]
+            if too_hard:
+                errors.append(('skill', f"plan {i} has {exercise} for a {p['skill']}"))
+    return errors
+
+def run_smart(p):
+    from exercise_catalog import EQUIPMENT_LEVELS, SKILL_LEVELS as CATALOG_SKILLS
+    from smart_workout_templates import EXERCISES_DB, generate_3_plan_variations
+
+    height, weight = BODY_METRICS[p['body']]
+    variant = ADAPTIVE_VARIANTS[p['adaptive']]
+    adaptive = {}
+    if variant:
+        adaptive = {
+            'restMultiplierAdjustment': variant['rest'],
+            'setsAdjustment': variant['sets'],
+            'exerciseDifficultyAdjustment': variant['difficulty'],
+        }
+
+    plans = generate_3_plan_variations(
+        p['skill'], p['goal'], p['duration'], height_cm=height, weight_kg=weight,
+        limitations=p['limitations'], equipment=p['equipment'], adaptive_adjustments=adaptive
+    )
+
+    errors = check_structure(plans) + check_duration(plans, p['duration'])
+    limitation_mask = EXERCISES_DB.limitation_mask(p['limitations'])
+    user_skill = CATALOG_SKILLS.index(p['skill'])
+    user_equipment = EQUIPMENT_LEVELS.index(p['equipment'])
+    for i, plan in enumerate(plans, 1):
+        for exercise in filter(None, plan['exercises'].split(';')):
+            index = EXERCISES_DB.index.get(exercise)
+            if index is None:
+                errors.append(('unknown-exercise', f"plan {i} has {exercise}, which is not in the catalog"))
+                continue
+            if EXERCISES_DB.exclude_mask[index] & limitation_mask:
+                errors.append(('limitation', f"plan {i} has {exercise}"))
+            if EXERCISES_DB.skill_min[index] > user_skill:
+                errors.append(('skill', f"plan {i} has {exercise} for a {p['skill']}"))
+            if EXERCISES_DB.equipment[index] > user_equipment:
+                errors.append(('equipment', f"plan {i} has {exercise} without {EXERCISES_DB.field_value('equipment', index)}"))
+    return errors
+
+RUNNERS = {'legacy': run_legacy, 'smart': run_smart}
+
+def validate_cases(cases):
+    """Worker: run and check a batch of cases; returns [(case, errors, ms)]"""
+    results = []
+    for case in cases:
+        generator, params = case
+        start = time.perf_counter()
+        try:
+            errors = RUNNERS[generator](params)
+        except Exception as e:
+            errors = [('exception', f"{type(e).__name__}: {e}")]
+        results.append((case, errors, (time.perf_counter() - start) * 1000))
+    return results
+
+# ============================================================================
+# BASELINE
+# ============================================================================
+
+def axis_value(params, axis):
+    value = params[axis]
+    return ','.join(value) if axis == 'limitations' else value
+
+class Baseline:
+    """
+    Known failures of one generator: a bitmap per check over the product of
+    the grid axes, matched by axis value (so reordering the catalog keeps it)
+    """
+
+    def __init__(self, axes, failures):
+        self.axes = axes
+        self.positions = [{value: i for i, value in enumerate(axes[axis])} for axis in GRID_AXES]
+        self.failures = failures  # check -> bool array in grid order
+
+    @classmethod
+    def from_results(cls, results):
+        axes = {axis: [] for axis in GRID_AXES}
+        for (_, params), _, _ in results:
+            for axis in GRID_AXES:
+                if axis_value(params, axis) not in axes[axis]:
+                    axes[axis].append(axis_value(params, axis))
+        baseline = cls(axes, {})
+        size = int(np.prod([len(axes[axis]) for axis in GRID_AXES]))
+        for (_, params), errors, _ in results:
+            for check in {c for c, _ in errors}:
+                baseline.failures.setdefault(check, np.zeros(size, dtype=bool))[baseline.flat_index(params)] = True
+        return baseline
+
+    @classmethod
+    def from_dict(cls, data):
+        size = int(np.prod([len(data['axes'][axis]) for axis in GRID_AXES]))
+        failures = {
+            check: np.unpackbits(np.frombuffer(base64.b64decode(bits), dtype=np.uint8), count=size).astype(bool)
+            for check, bits in data['failures'].items()
+        }
+        return cls(data['axes'], failures)
+
+    def to_dict(self):
+        return {
+            'axes': self.axes,
+            'failures': {
+                check: base64.b64encode(np.packbits(bits).tobytes()).decode('ascii')
+                for check, bits in sorted(self.failures.items())
+            },
+            'failedCases': int(np.logical_or.reduce(list(self.failures.values())).sum()) if self.failures else 0,
+        }
+
+    def flat_index(self, params):
+        """Index of a case in the bitmaps, or None when an axis value is new"""
+        index = 0
+        for axis, positions in zip(GRID_AXES, self.positions):
+            position = positions.get(axis_value(params, axis))
+            if position is None:
+                return None
+            index = index * len(positions) + position
+        return index
+
+    def known(self, params, check):
+        index = self.flat_index(params)
+        bits = self.failures.get(check)
+        return index is not None and bits is not None and bool(bits[index])
+
+def load_baselines(path):
+    """generator -> Baseline from a baseline file (empty when there is none)"""
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        data = json.load(f)
+    return {generator: Baseline.from_dict(entry) for generator, entry in data['generators'].items()}
+
+def compare_with_baseline(results, baseline):
+    """
+    Returns:
+        (new failures as [(case, check, message)], number of known failures
+        that no longer occur)
+    """
+    new, fixed = [], 0
+    for case, errors, _ in results:
+        _, params = case
+        failing = {check for check, _ in errors}
+        seen = set()
+        for check, message in errors:
+            if check not in seen and not (baseline and baseline.known(params, check)):
+                new.append((case, check, message))
+            seen.add(check)
+        if baseline:
+            fixed += sum(1 for check in baseline.failures if check not in failing and baseline.known(params, check))
+    return new, fixed
+
+# ============================================================================
+# REPORT
+# ============================================================================
+
+def summarize(generator, results, wall_seconds):
+    times = np.array([ms for _, _, ms in results])
+    failed = [(case, errors) for case, errors, _ in results if errors]
+    by_check = Counter(check for _, errors in failed for check in {c for c, _ in errors})
+
+    examples = {}
+    for case, errors in failed:
+        for check, message in errors:
+            bucket = examples.setdefault(check, [])
+            if len(bucket) < EXAMPLES_PER_CHECK and not any(e['case'] == describe(case) for e in bucket):
+                bucket.append({'case': describe(case), 'error': message})
+
+    return {
+        'cases': len(results),
+        'failedCases': len(failed),
+        'failuresByCheck': dict(by_check),
+        'failedCasesByGoal': dict(Counter(case[1]['goal'] for case, _ in failed)),
+        'failedCasesByDuration': dict(Counter(case[1]['duration'] for case, _ in failed)),
+        'examples': examples,
+        'wallSeconds': round(wall_seconds, 2),
+        'caseMs': {
+            'mean': round(float(times.mean()), 3),
+            'p50': round(float(np.percentile(times, 50)), 3),
+            'p99': round(float(np.percentile(times, 99)), 3),
+            'max': round(float(times.max()), 3),
+        },
+    }
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Validate both plan generators over their full input grid')
+    parser.add_argument('--generator', choices=['all', 'legacy', 'smart'], default='all')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Worker processes')
+    parser.add_argument('--max-limitations', type=int, default=1,
+                        help='Largest limitation combination in the grid (2 = every pair)')
+    parser.add_argument('--report', default='validation_report.json', help='JSON report path')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='Known-failures baseline')
+    parser.add_argument('--update-baseline', action='store_true',
+                        help='Record the current failures as the baseline instead of gating on it')
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    generators = ['legacy', 'smart'] if args.generator == 'all' else [args.generator]
+
+    print("=" * 80)
+    print("VALIDATING PLAN GENERATORS")
+    print("=" * 80)
+    print(f"Workers: {args.workers}, limitation combinations up to {args.max_limitations}")
+    print()
+
+    report = {'workers': args.workers, 'maxLimitations': args.max_limitations, 'generators': {}}
+    baselines = load_baselines(args.baseline)
+    new_failures = 0
+    total_start = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        for generator in generators:
+            cases = build_grid(generator, args.max_limitations)
+            tasks = [cases[i:i + CASES_PER_TASK] for i in range(0, len(cases), CASES_PER_TASK)]
+
+            start = time.perf_counter()
+            results = [r for batch in pool.map(validate_cases, tasks) for r in batch]
+            summary = summarize(generator, results, time.perf_counter() - start)
+            report['generators'][generator] = summary
+
+            if args.update_baseline:
+                baselines[generator] = Baseline.from_results(results)
+                new, fixed = [], 0
+            else:
+                new, fixed = compare_with_baseline(results, baselines.get(generator))
+            summary['newFailures'] = len(new)
+            summary['fixedSinceBaseline'] = fixed
+            summary['newFailureExamples'] = [
+                {'case': describe(case), 'check': check, 'error': message} for case, check, message in new[:20]
+            ]
+            new_failures += len(new)
+
+            status = "✅" if not new else "❌"
+            print(f"{status} {generator}: {summary['cases']} cases in {summary['wallSeconds']:.2f}s "
+                  f"(p50 {summary['caseMs']['p50']:.2f} ms, p99 {summary['caseMs']['p99']:.2f} ms per case)")
+            for check, count in sorted(summary['failuresByCheck'].items(), key=lambda item: -item[1]):
+                print(f"     {count:6d} cases fail '{check}', e.g. {summary['examples'][check][0]['case']}")
+                print(f"            {summary['examples'][check][0]['error']}")
+            if new:
+                print(f"     {len(new):6d} failures are not in the baseline, e.g. {describe(new[0][0])}")
+                print(f"            {new[0][2]}")
+            if fixed:
+                print(f"     {fixed:6d} known failures no longer occur (run with --update-baseline to record)")
+
+    report['wallSeconds'] = round(time.perf_counter() - total_start, 2)
+    with open(args.report, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    if args.update_baseline:
+        data = {'generators': {}}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                data = json.load(f)
+        data['maxLimitations'] = args.max_limitations
+        for generator in generators:
+            data['generators'][generator] = baselines[generator].to_dict()
+        with open(args.baseline, 'w') as f:
+            json.dump(data, f, indent=2)
+            f.write('\n')
+
+    failed = sum(s['failedCases'] for s in report['generators'].values())
+    print()
+    print("=" * 80)
+    print(f"Report written to {args.report} ({report['wallSeconds']:.2f}s total)")
+    if args.update_baseline:
+        print(f"✅ BASELINE WRITTEN to {args.baseline} ({failed} known failing cases)")
+        return True
+    if new_failures:
+        print(f"⚠️  {new_failures} NEW FAILURES ({failed} failing cases in total)")
+        return False
+    if failed:
+        print(f"✅ NO NEW FAILURES ({failed} known failing cases)")
+        return True
+    print("✅ ALL PLANS VALID")
+    return True
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
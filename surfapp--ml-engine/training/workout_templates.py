@@ -3,6 +3,9 @@ Workout Templates System
 Deterministic workout plan generation based on skill level, goal, duration, BMI, and limitations
 """
 
+import bisect
+import re
+
 def get_bmi_category(height=None, weight=None, bmi=None):
     """
     Calculate BMI category from height/weight or use provided BMI
@@ -94,25 +97,69 @@ LIMITATION_EXCLUSIONS = {
     'High blood pressure': ['Jumping Jacks', 'Burpees', 'Box Jumps', 'Tuck Jumps', 'Jump Squats', 'Jogging', 'Running', 'Stair', 'Jump Rope', 'High Knees', 'Butt Kicks', 'Walking Lunges', 'Explosive Lunges', 'Plyometric Lunges', 'Jumping Burpees', 'Sprint', 'HIIT Sprints', 'Shuttle Runs', 'Stair Running', 'Swimming', 'Swimming Laps', 'Pool Swimming', 'Intense Swimming Intervals', 'Tabata Intervals', 'EMOM Workouts', 'HIIT Circuit', 'Cycling Sprints', 'Assault Bike', 'Assault Bike Sprints'],
 }
 
+# Limitation rules are compiled once, on first use: each limitation gets one
+# regex (alternation of its lowercased keywords) and an exclusion bitmap over
+# every exercise the module knows about, so filtering known exercises is an
+# OR of bitmaps plus one dict lookup per exercise. Names outside the known
+# set fall back to the regexes. Keywords added to LIMITATION_EXCLUSIONS are
+# picked up without further changes.
+_limitation_index = None
+
+def _build_limitation_index():
+    known = list(dict.fromkeys(
+        WARMUP_EXERCISES + ENDURANCE_EXERCISES + POWER_EXERCISES + STAMINA_EXERCISES
+        + FATLOSS_EXERCISES + list(EXERCISE_DURATIONS)
+    ))
+    patterns = {
+        limitation: re.compile('|'.join(re.escape(k.lower()) for k in sorted(set(keywords), key=len, reverse=True)))
+        for limitation, keywords in LIMITATION_EXCLUSIONS.items()
+        if keywords
+    }
+    masks = {limitation: 0 for limitation in LIMITATION_EXCLUSIONS}
+    for bit, exercise in enumerate(known):
+        name = exercise.lower()
+        for limitation, pattern in patterns.items():
+            if pattern.search(name):
+                masks[limitation] |= 1 << bit
+    return {
+        'bits': {exercise: bit for bit, exercise in enumerate(known)},
+        'masks': masks,
+        'patterns': patterns,
+    }
+
+def _get_limitation_index():
+    global _limitation_index
+    if _limitation_index is None:
+        _limitation_index = _build_limitation_index()
+    return _limitation_index
+
 def filter_exercises_by_limitations(exercises, limitations):
     """Filter out exercises that conflict with user limitations"""
     if not limitations or 'None' in limitations:
         return exercises
     
-    excluded_keywords = set()
-    for limitation in limitations:
-        if limitation in LIMITATION_EXCLUSIONS:
-            excluded_keywords.update(LIMITATION_EXCLUSIONS[limitation])
+    index = _get_limitation_index()
+    active = [lim for lim in limitations if lim in index['masks']]
+    if not active:
+        return list(exercises)
+    
+    excluded = 0
+    for limitation in active:
+        excluded |= index['masks'][limitation]
+    patterns = [index['patterns'][lim] for lim in active if lim in index['patterns']]
+    bits = index['bits']
     
     filtered = []
     for exercise in exercises:
-        should_exclude = False
-        for keyword in excluded_keywords:
-            if keyword.lower() in exercise.lower():
-                should_exclude = True
-                break
-        if not should_exclude:
-            filtered.append(exercise)
+        bit = bits.get(exercise)
+        if bit is not None:
+            if not (excluded >> bit) & 1:
+                filtered.append(exercise)
+        else:
+            # Unknown name: match the keywords directly
+            name = exercise.lower()
+            if not any(pattern.search(name) for pattern in patterns):
+                filtered.append(exercise)
     
     return filtered
 
@@ -238,6 +285,67 @@ EXERCISE_DURATIONS = {
     'Intense Swimming Intervals': {'duration': 60, 'rest': 90, 'sets': 5},
 }
 
+def _adjusted_total(ex_data, rest_multiplier, sets_adjustment):
+    """Total seconds for one exercise after BMI/adaptive rest and sets adjustments"""
+    adjusted_rest = int(ex_data['rest'] * rest_multiplier)
+    adjusted_sets = max(1, ex_data['sets'] + sets_adjustment)
+    return (ex_data['duration'] + adjusted_rest) * adjusted_sets - adjusted_rest  # Last set doesn't have rest after
+
+# Adjusted totals of every exercise, per (rest_multiplier, sets_adjustment)
+_exercise_totals = {}
+MAX_CACHED_ADJUSTMENTS = 256
+
+def _get_exercise_totals(rest_multiplier, sets_adjustment):
+    key = (rest_multiplier, sets_adjustment)
+    totals = _exercise_totals.get(key)
+    if totals is None:
+        if len(_exercise_totals) >= MAX_CACHED_ADJUSTMENTS:
+            _exercise_totals.clear()
+        totals = {
+            exercise: _adjusted_total(ex_data, rest_multiplier, sets_adjustment)
+            for exercise, ex_data in EXERCISE_DURATIONS.items()
+        }
+        _exercise_totals[key] = totals
+    return totals
+
+class _AvailabilityTree:
+    """Fenwick tree over positions 0..n-1, all available until removed"""
+    
+    def __init__(self, n):
+        self.n = n
+        # Every position starts at 1; tree[i] covers (i - lowbit(i), i]
+        self.tree = [i & -i for i in range(n + 1)]
+        self.top = 1 << n.bit_length() if n else 0
+    
+    def remove(self, position):
+        i = position + 1
+        while i <= self.n:
+            self.tree[i] -= 1
+            i += i & -i
+    
+    def last_at_or_before(self, position):
+        """Largest available position <= position, or -1"""
+        if position < 0:
+            return -1
+        # Number of available positions in 0..position
+        count = 0
+        i = position + 1
+        while i > 0:
+            count += self.tree[i]
+            i -= i & -i
+        if count == 0:
+            return -1
+        # Descend to the count-th available position
+        index = 0
+        step = self.top
+        while step:
+            nxt = index + step
+            if nxt <= self.n and self.tree[nxt] < count:
+                index = nxt
+                count -= self.tree[nxt]
+            step >>= 1
+        return index
+
 def generate_workout_plan(skill_level, goal, duration_range, limitations=None, bmi_category='normal', rest_multiplier=1.0, sets_adjustment=0):
     """
     Generate a workout plan that matches the target duration
@@ -285,59 +393,61 @@ def generate_workout_plan(skill_level, goal, duration_range, limitations=None, b
     # Select exercises to fit duration
     selected_exercises = []
     current_duration = 0
+    totals = _get_exercise_totals(rest_multiplier, sets_adjustment)
     
     # Add warm-up (always first)
     warmup_exercises = [e for e in exercise_pool if e in WARMUP_EXERCISES]
     if warmup_exercises:
         warmup = warmup_exercises[0]
-        warmup_duration = EXERCISE_DURATIONS.get(warmup, {'duration': 30, 'rest': 15, 'sets': 2})
-        # Apply BMI-based adjustments
-        adjusted_rest = int(warmup_duration['rest'] * rest_multiplier)
-        adjusted_sets = max(1, warmup_duration['sets'] + sets_adjustment)
-        warmup_total = (warmup_duration['duration'] + adjusted_rest) * adjusted_sets - adjusted_rest
+        if warmup in totals:
+            warmup_total = totals[warmup]
+        else:
+            warmup_total = _adjusted_total({'duration': 30, 'rest': 15, 'sets': 2}, rest_multiplier, sets_adjustment)
         if warmup_total <= target_seconds * 0.2:  # Warm-up should be max 20% of total
             selected_exercises.append(warmup)
             current_duration += warmup_total
+            # Copy first: the pool can be one of the module-level exercise lists
+            exercise_pool = list(exercise_pool)
             exercise_pool.remove(warmup)
     
-    # Select main exercises
-    remaining_pool = exercise_pool.copy()
-    while current_duration < target_seconds * 0.8 and remaining_pool:  # Fill 80% of target
-        # Try to find exercise that fits
-        best_exercise = None
-        best_duration = 0
-        
-        for exercise in remaining_pool:
-            if exercise in EXERCISE_DURATIONS:
-                ex_data = EXERCISE_DURATIONS[exercise]
-                # Apply BMI-based adjustments
-                adjusted_rest = int(ex_data['rest'] * rest_multiplier)
-                adjusted_sets = max(1, ex_data['sets'] + sets_adjustment)
-                ex_total = (ex_data['duration'] + adjusted_rest) * adjusted_sets - adjusted_rest
-                
-                if current_duration + ex_total <= target_seconds * 1.1:  # Allow 10% over
-                    if ex_total > best_duration:
-                        best_duration = ex_total
-                        best_exercise = exercise
-        
-        if best_exercise:
-            selected_exercises.append(best_exercise)
-            current_duration += best_duration
-            remaining_pool.remove(best_exercise)
-        else:
+    # Select main exercises: repeatedly take the longest exercise that still
+    # fits (earliest in the pool on ties). Candidates are sorted by total
+    # duration once; a Fenwick tree over that order tracks which are still
+    # available, so each pick is a bisect plus an O(log n) search and removal.
+    candidates = sorted(
+        ((totals[exercise], -position) for position, exercise in enumerate(exercise_pool) if exercise in totals)
+    )
+    candidate_totals = [total for total, _ in candidates]
+    available = _AvailabilityTree(len(candidates))
+    taken = set()
+    limit = target_seconds * 1.1  # Allow 10% over
+    
+    while current_duration < target_seconds * 0.8 and len(taken) < len(candidates):  # Fill 80% of target
+        # Last candidate whose total fits, then the last one of those still available
+        k = bisect.bisect_right(candidate_totals, limit - current_duration) - 1
+        while k + 1 < len(candidates) and current_duration + candidate_totals[k + 1] <= limit:
+            k += 1
+        while k >= 0 and current_duration + candidate_totals[k] > limit:
+            k -= 1
+        k = available.last_at_or_before(k)
+        if k < 0:
             # No exercise fits, break
             break
+        
+        available.remove(k)
+        position = -candidates[k][1]
+        taken.add(position)
+        selected_exercises.append(exercise_pool[position])
+        current_duration += candidate_totals[k]
+    
+    remaining_pool = [exercise for position, exercise in enumerate(exercise_pool) if position not in taken]
     
     # If we're still under target, add shorter exercises
     if current_duration < target_seconds * 0.7:
         for exercise in remaining_pool[:3]:  # Add up to 3 more
-            if exercise in EXERCISE_DURATIONS:
-                ex_data = EXERCISE_DURATIONS[exercise]
-                # Apply BMI-based adjustments
-                adjusted_rest = int(ex_data['rest'] * rest_multiplier)
-                adjusted_sets = max(1, ex_data['sets'] + sets_adjustment)
-                ex_total = (ex_data['duration'] + adjusted_rest) * adjusted_sets - adjusted_rest
-                if current_duration + ex_total <= target_seconds * 1.1:
+            if exercise in totals:
+                ex_total = totals[exercise]
+                if current_duration + ex_total <= limit:
                     selected_exercises.append(exercise)
                     current_duration += ex_total
     